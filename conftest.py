@@ -0,0 +1,2 @@
+# Makes pytest put the repository directory on sys.path, so that the tests
+# import ooidac and configuration.py from the working tree
@@ -0,0 +1,299 @@
+"""Header-only catalogue of the Slocum data files of a deployment.
+
+Each data file (ascii dba or binary) is indexed once from its header by
+mission number, segment number, file type and time bounds, so that looking
+up the next segments of a file for the depth averaged velocity, or the
+science file matching a flight file, does not re-open any data file.  The
+catalogue can be saved to a JSON file; a later scan of the same files only
+reads the headers of files that are new or have changed size or modification
+time.
+
+Usage:
+    catalog = DeploymentCatalog('/path/to/catalog.json')
+    catalog.scan('/path/to/dba_dir')
+    catalog.save()
+    next_files = catalog.next_segments(dba_file, 2)
+    science_file = catalog.partner(dba_file)
+"""
+
+import os
+import glob
+import json
+import time
+import calendar
+import logging
+from ooidac.readers.segment_cache import parse_data_file_header
+from ooidac.readers.slocum_binary import is_binary_dbd
+
+logger = logging.getLogger(os.path.basename(__name__))
+
+# bump when the catalogue entry format changes to re-read all headers
+CATALOG_VERSION = 1
+
+# flight (glider) file types and their science file types
+FLIGHT_SCIENCE_TYPES = {'dbd': 'ebd', 'sbd': 'tbd', 'mbd': 'nbd'}
+SCIENCE_FLIGHT_TYPES = {
+    sci_type: flight_type
+    for flight_type, sci_type in FLIGHT_SCIENCE_TYPES.items()}
+
+# bytes read from the end of an ascii file to find the last data line
+_TAIL_BYTES = 65536
+
+
+class DeploymentCatalog(object):
+    """Index of the data files of a deployment keyed by file type, mission
+    number and segment number"""
+    def __init__(self, catalog_file=None):
+        """
+        :param catalog_file: Optional, JSON file the catalogue is loaded from
+            (if it exists) and saved to.  Default is an in-memory catalogue.
+        """
+        self.catalog_file = catalog_file
+        self._entries = {}
+        self._segments = {}
+        if catalog_file and os.path.isfile(catalog_file):
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, data_file):
+        return os.path.realpath(data_file) in self._entries
+
+    def __repr__(self):
+        return "<DeploymentCatalog({:d} files)>".format(len(self._entries))
+
+    def scan(self, data_files, pattern='*'):
+        """Add data files to the catalogue, reading only the headers of the
+        files that are not already catalogued with the same size and
+        modification time.  Catalogued files that no longer exist are
+        removed.
+
+        :param data_files: directory of data files or a list of data files
+        :param pattern: glob pattern of the data files when `data_files` is a
+            directory
+        :return: number of files whose headers were read
+        """
+        if isinstance(data_files, str):
+            data_files = glob.glob(os.path.join(data_files, pattern))
+
+        for path in [path for path in self._entries
+                     if not os.path.isfile(path)]:
+            self._remove(path)
+
+        num_read = 0
+        for data_file in data_files:
+            path = os.path.realpath(data_file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                logger.warning('Invalid data file: {:s}'.format(data_file))
+                continue
+            entry = self._entries.get(path)
+            if (
+                    entry and entry['size'] == stat.st_size
+                    and entry['mtime_ns'] == stat.st_mtime_ns
+            ):
+                continue
+            entry = _catalog_entry(path, stat)
+            num_read += 1
+            if entry is None:
+                continue
+            self._add(entry)
+
+        logger.debug('Read {:d} of {:d} data file headers'.format(
+            num_read, len(self._entries)))
+        return num_read
+
+    def save(self, catalog_file=None):
+        """Write the catalogue to `catalog_file` or the file it was created
+        with"""
+        catalog_file = catalog_file or self.catalog_file
+        if not catalog_file:
+            logger.warning('No catalog file to save to')
+            return
+        catalog = {'version': CATALOG_VERSION,
+                   'files': list(self._entries.values())}
+        with open(catalog_file, 'w') as fid:
+            json.dump(catalog, fid)
+
+    def get(self, data_file):
+        """Return the catalogue entry of a data file or None if it is not
+        catalogued"""
+        return self._entries.get(os.path.realpath(data_file))
+
+    def header(self, data_file):
+        """Return a copy of the header of a catalogued data file or None"""
+        entry = self.get(data_file)
+        if entry is None:
+            return
+        return entry['header'].copy()
+
+    def segment(self, file_type, mission_num, segment_num):
+        """Return the path of the `file_type` data file of a segment or
+        None"""
+        return self._segments.get((file_type, mission_num, segment_num))
+
+    def next_segments(self, data_file, num_segments=2):
+        """Return the catalogued data files of the same type and mission as
+        `data_file` for the next `num_segments` segment numbers, in segment
+        order.  Missing segments are skipped.
+
+        :param data_file: catalogued data file
+        :param num_segments: number of following segment numbers to check
+        :return: list of data file paths
+        """
+        entry = self.get(data_file)
+        if entry is None:
+            return []
+        next_files = []
+        for seg_step in range(1, num_segments + 1):
+            next_file = self.segment(
+                entry['file_type'], entry['mission_num'],
+                entry['segment_num'] + seg_step)
+            if next_file:
+                next_files.append(next_file)
+        return next_files
+
+    def partner(self, data_file):
+        """Return the science data file of a flight data file, or the flight
+        data file of a science data file, for the same segment, or None.
+        E.g. the .ebd file of a .dbd file."""
+        entry = self.get(data_file)
+        if entry is None:
+            return
+        file_type = entry['file_type']
+        partner_type = (
+            FLIGHT_SCIENCE_TYPES.get(file_type)
+            or SCIENCE_FLIGHT_TYPES.get(file_type))
+        if not partner_type:
+            return
+        return self.segment(
+            partner_type, entry['mission_num'], entry['segment_num'])
+
+    def files(self, file_type=None):
+        """Return the catalogued data files, optionally only those of
+        `file_type`, sorted by start time, mission number and segment
+        number"""
+        entries = [
+            entry for entry in self._entries.values()
+            if file_type is None or entry['file_type'] == file_type]
+        entries.sort(key=lambda entry: (
+            entry['start_time'] or 0., entry['mission_num'],
+            entry['segment_num']))
+        return [entry['path'] for entry in entries]
+
+    def _add(self, entry):
+        if entry['path'] in self._entries:
+            self._remove(entry['path'])
+        self._entries[entry['path']] = entry
+        key = (entry['file_type'], entry['mission_num'], entry['segment_num'])
+        if key in self._segments and self._segments[key] != entry['path']:
+            logger.debug('Duplicate {:s} segment {:04d}{:04d}: {:s}'.format(
+                entry['file_type'], entry['mission_num'],
+                entry['segment_num'], entry['path']))
+        self._segments[key] = entry['path']
+
+    def _remove(self, path):
+        entry = self._entries.pop(path)
+        key = (entry['file_type'], entry['mission_num'], entry['segment_num'])
+        if self._segments.get(key) == path:
+            del self._segments[key]
+
+    def _load(self):
+        try:
+            with open(self.catalog_file, 'r') as fid:
+                catalog = json.load(fid)
+        except (IOError, ValueError) as e:
+            logger.warning('Unreadable catalog file {:s}: {}'.format(
+                self.catalog_file, e))
+            return
+        if catalog.get('version') != CATALOG_VERSION:
+            logger.info('Catalog version changed, rescanning {:s}'.format(
+                self.catalog_file))
+            return
+        for entry in catalog['files']:
+            self._add(entry)
+
+
+def _catalog_entry(path, stat):
+    """Read the header of a data file into a catalogue entry"""
+    header = parse_data_file_header(path)
+    if not header or 'the8x3_filename' not in header:
+        logger.warning('Not a Slocum data file: {:s}'.format(path))
+        return
+    try:
+        mission_num = int(header['the8x3_filename'][:4])
+        segment_num = int(header['the8x3_filename'][4:])
+    except ValueError:
+        logger.warning('Bad the8x3_filename header {:s}: {:s}'.format(
+            header['the8x3_filename'], path))
+        return
+
+    start_time = _fileopen_time(header.get('fileopen_time', ''))
+    end_time = None
+    if not is_binary_dbd(path):
+        bounds = _dba_time_bounds(path, header)
+        if bounds:
+            start_time, end_time = bounds
+
+    return {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'file_type': header.get('filename_extension', '').lower(),
+            'mission_num': mission_num, 'segment_num': segment_num,
+            'mission_name': header.get('mission_name', ''),
+            'start_time': start_time, 'end_time': end_time,
+            'header': header}
+
+
+def _fileopen_time(fileopen_time):
+    """Convert a `fileopen_time` header, e.g. Thu_Jan__1_00:00:00_1970, to
+    unix time or None"""
+    try:
+        time_struct = time.strptime(
+            ' '.join(fileopen_time.split('_')), '%a %b %d %H:%M:%S %Y')
+    except ValueError:
+        return
+    return float(calendar.timegm(time_struct))
+
+
+def _dba_time_bounds(dba_file, header):
+    """Return the first and last m_present_time (or sci_m_present_time) of an
+    ascii dba file by reading the label lines, the first data line and the
+    end of the file, or None"""
+    try:
+        num_ascii_tags = int(header['num_ascii_tags'])
+        num_label_lines = int(header['num_label_lines'])
+        with open(dba_file, 'rb') as fid:
+            for _ in range(num_ascii_tags):
+                fid.readline()
+            sensor_names = fid.readline().decode().split()
+            for _ in range(num_label_lines - 1):
+                fid.readline()
+            first_line = fid.readline()
+            fid.seek(0, os.SEEK_END)
+            fid.seek(max(fid.tell() - _TAIL_BYTES, 0))
+            tail_lines = fid.read().splitlines()
+    except (IOError, KeyError, ValueError, UnicodeDecodeError):
+        return
+
+    for time_sensor in ['m_present_time', 'sci_m_present_time']:
+        if time_sensor in sensor_names:
+            col = sensor_names.index(time_sensor)
+            break
+    else:
+        return
+
+    # the last line may be truncated, take the last one with all columns
+    last_values = None
+    for line in reversed(tail_lines):
+        values = line.split()
+        if len(values) == len(sensor_names):
+            last_values = values
+            break
+    first_values = first_line.split()
+    if last_values is None or len(first_values) != len(sensor_names):
+        return
+    try:
+        return float(first_values[col]), float(last_values[col])
+    except ValueError:
+        return
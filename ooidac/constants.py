@@ -21,6 +21,13 @@ SLOCUM_REALTIME_MODE_EXTENSIONS = ['sbd',
 SLOCUM_TIMESTAMP_SENSORS = ['m_present_time',
                             'sci_m_present_time']
 
+# Storage types of Slocum sensors by the number of bytes the glider stores
+# them in (the `bytes` sensor attribute), used by compact GliderData storage
+SLOCUM_BYTES_TYPES = {1: 'i1',
+                      2: 'i2',
+                      4: 'f4',
+                      8: 'f8'}
+
 # Slocum native pressure sensors
 SLOCUM_PRESSURE_SENSORS = ['sci_water_pressure',
                            'm_water_pressure',
@@ -59,3 +66,23 @@ M_CTD_SENSORS = ['llat_latitude',
                  'llat_pressure',
                  'm_water_temp',
                  'm_water_cond']
+
+# Depth averaged velocity sensor pairs, in order of preference
+DAV_SENSORS = [('m_final_water_vx', 'm_final_water_vy'),
+               ('m_water_vx', 'm_water_vy'),
+               ('m_initial_water_vx', 'm_initial_water_vy')]
+
+# Native glider sensors read by the ooidac.processing steps
+PROCESSING_SENSORS = ['m_gps_lat',
+                      'm_gps_lon',
+                      'm_pitch',
+                      'm_roll',
+                      'm_depth_state',
+                      'sci_oxy4_oxygen',
+                      'sci_oxy4_calphase',
+                      'sci_oxy4_temp',
+                      'sci_flbbcd_chlor_sig',
+                      'sci_flbbcd_chlor_units',
+                      'sci_flbbcd_bb_units',
+                      'sci_bsipar_sensor_volts',
+                      'sci_bsipar_par']
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 
+import numpy as np
 from gsw import SP_from_C, SA_from_SP, CT_from_t, rho, z_from_p
 from gsw.density import sound_speed
 
+# the products of calculate_ctd_products
+CTD_PRODUCTS = [
+    'salinity', 'absolute_salinity', 'conservative_temperature', 'density',
+    'potential_density', 'sound_speed']
+
 
 def create_practical_salinity_sensor(reader):
 
@@ -105,6 +111,64 @@ def calculate_sound_speed(temperature, pressure, salinity, latitude, longitude):
     return speed
 
 
+def calculate_ctd_products(conductivity, temperature, pressure, latitude,
+                           longitude, chunk_size=262144):
+    """Calculates practical salinity, absolute salinity, conservative
+    temperature, in-situ density, potential density (referenced to 0 dbar)
+    and sound speed in one pass, only at the rows where conductivity,
+    temperature and pressure are all finite.  The rows are processed in
+    chunks of `chunk_size`, so the memory used by the intermediate results
+    is bounded for the concatenated data of a whole deployment.
+
+    The products are the same as calculate_practical_salinity,
+    calculate_density and calculate_sound_speed.
+
+    Parameters:
+        conductivity (S/m), temperature (C), pressure (dbar),
+        latitude and longitude (decimal degrees), arrays or scalars, e.g. the
+        mean position of the data,
+        chunk_size, optional number of rows calculated at a time
+
+    Returns:
+        dictionary of the CTD_PRODUCTS arrays, NaN where the CTD data is
+        not finite:
+        salinity (psu PSS-78), absolute_salinity (g/kg),
+        conservative_temperature (C), density (kg/m**3),
+        potential_density (kg/m**3), sound_speed (m s-1)
+    """
+    conductivity, temperature, pressure = np.broadcast_arrays(
+        conductivity, temperature, pressure)
+    latitude = np.broadcast_to(latitude, conductivity.shape)
+    longitude = np.broadcast_to(longitude, conductivity.shape)
+    rows = np.flatnonzero(
+        np.isfinite(conductivity) & np.isfinite(temperature)
+        & np.isfinite(pressure))
+    products = {
+        product: np.full(conductivity.shape, np.nan)
+        for product in CTD_PRODUCTS}
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        pres = pressure[chunk]
+        temp = temperature[chunk]
+        salinity = calculate_practical_salinity(
+            conductivity[chunk], temp, pres)
+        absolute_salinity = SA_from_SP(
+            salinity, pres, longitude[chunk], latitude[chunk])
+        conservative_temperature = CT_from_t(absolute_salinity, temp, pres)
+        products['salinity'][chunk] = salinity
+        products['absolute_salinity'][chunk] = absolute_salinity
+        products['conservative_temperature'][chunk] = conservative_temperature
+        products['density'][chunk] = rho(
+            absolute_salinity, conservative_temperature, pres)
+        products['potential_density'][chunk] = rho(
+            absolute_salinity, conservative_temperature, 0.)
+        products['sound_speed'][chunk] = sound_speed(
+            absolute_salinity, conservative_temperature, pres)
+
+    return products
+
+
 def calculate_depth(pressure, latitude):
     """Calculates depth from pressure (dbar) and latitude.  By default, gsw returns depths as negative.  This routine
     returns the absolute values for positive depths.
@@ -4,7 +4,7 @@ import numpy as np
 
 from configuration import DATA_CONFIG_LIST, REQUIRED_SENSORS
 from configuration import MIN_DATA_VALS, MIN_DIVE_DEPTH
-from ooidac.constants import SLOCUM_SALINITY_SENSORS
+from ooidac.constants import SLOCUM_SALINITY_SENSORS, DAV_SENSORS
 
 logger = logging.getLogger(os.path.basename(__name__))
 
@@ -44,13 +44,8 @@ def check_required_sensors(gldata):
 
 def check_for_dav_sensors(gldata):
     sensor_names = gldata.sensor_names
-    dav_sensors = [
-        ('m_final_water_vx', 'm_final_water_vy'),
-        ('m_water_vx', 'm_water_vy'),
-        ('m_initial_water_vx', 'm_initial_water_vy')
-    ]
     check = []
-    for vx, vy in dav_sensors:
+    for vx, vy in DAV_SENSORS:
         if vx in sensor_names and vy in sensor_names:
             check.append((vx, vy))
     if len(check) > 0:
@@ -73,8 +68,7 @@ def check_for_any_sci_data(gldata):
     data_exists = False
     for sensor in DATA_CONFIG_LIST:
         if sensor in gldata.sensor_names:
-            data = gldata.getdata(sensor)
-            if len(np.flatnonzero(np.isfinite(data))) > MIN_DATA_VALS:
+            if len(gldata.finite_indices(sensor)) > MIN_DATA_VALS:
                 data_exists = True
                 break
     return data_exists
@@ -84,8 +78,7 @@ def sci_data_available(gldata):
     sci_sensors = []
     for sensor in DATA_CONFIG_LIST:
         if sensor in gldata.sensor_names:
-            data = gldata.getdata(sensor)
-            if len(np.flatnonzero(np.isfinite(data))) > MIN_DATA_VALS:
+            if len(gldata.finite_indices(sensor)) > MIN_DATA_VALS:
                 # config
                 sci_sensors.append(sensor)
             else:
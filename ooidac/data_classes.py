@@ -1,11 +1,19 @@
 import os
 import logging
 import numpy as np
-from ooidac.readers.slocum import parse_dba
-from ooidac.utilities import cluster_index
+from ooidac.readers.segment_cache import (
+    parse_data_file, parse_data_file_sensors)
+from ooidac.utilities import index_runs, runs_to_indices, TimeInterpolator
+from ooidac.constants import (
+    NC_FILL_VALUES, SLOCUM_BYTES_TYPES, SLOCUM_TIMESTAMP_SENSORS)
 
 logger = logging.getLogger(os.path.basename(__name__))
 
+# DbaData attributes that are set when the data table is loaded
+_LAZY_ATTRIBUTES = {
+    '_columns', 'N', 'ts', 'depth', 'dive_runs', 'underwater_indices',
+    'pre_dive_indices', 'post_dive_indices', 'surface_indices'}
+
 
 class GliderDataParticle(object):
     def __init__(self):
@@ -13,10 +21,58 @@ class GliderDataParticle(object):
 
 
 class GliderData(object):
-    """
+    """Glider data stored as one 1-D array per sensor in `_columns`, in the
+    order of `sensor_names`.  The columns of the initial data table are views
+    into that table, and adding a sensor appends its array to the column
+    list, so the table is never copied to add a sensor.
+
+    The stored columns are read-only, so the arrays returned by `getdata`
+    and in data particles (`gldata[sensor]['data']`) cannot be modified in
+    place by accident.  Use `copydata` for a modifiable copy of a sensor and
+    `update_data` to change stored values.
+
+    With `compact` storage, sensors stored by the glider in 1, 2 or 4 bytes
+    (the `bytes` sensor attribute) are kept as 8 or 16 bit integers, with
+    missing values set to the NetCDF fill value of the type, or as float32
+    instead of float64.  The time sensors and the sensors calculated by the
+    processing, added with `add_data` or `add_derived`, stay float64.
+    `getdata` returns the integer sensors as float32 with NaN for the
+    missing values, and the storage type is set as the `type` of the sensor
+    definition so that it is used for the NetCDF variable.
+
+    With `sparse` storage, sensors that are mostly NaN, e.g. the science
+    sensors in merged flight and science data or the GPS fixes, are stored as
+    their finite values and the row indices of those values when that takes
+    less memory.  `getdata` returns the full length array, and
+    `finite_indices` and `getfinite` return the stored rows and values
+    without scanning the full length array.
 
+    Derived sensors added with `add_derived` are calculated from their input
+    sensors the first time their data is used, e.g. by `getdata` or the
+    NetCDF writer, and kept until one of the inputs is changed with
+    `update_data`.  Slices of the instance calculate a derived sensor from
+    all of the rows of this instance, so the result does not depend on how
+    the data is sliced.
     """
-    def __init__(self, metadata, sensor_names, sensors, data):
+    def __init__(self, metadata, sensor_names, sensors, data, num_rows=None,
+                 compact=False, sparse=False):
+        """
+        :param metadata: file metadata dictionary
+        :param sensor_names: list of sensor names in column order
+        :param sensors: dictionary of sensor definitions
+        :param data: N x m data array, or a list of m 1-D column arrays
+        :param num_rows: Optional, N when `data` is an empty column list
+        :param compact: Optional, store the sensors in the type given by
+            their `bytes` attribute instead of float64.  Default is False.
+        :param sparse: Optional, store mostly NaN sensors as their finite
+            values and row indices.  Default is False.
+        """
+        self.compact = compact
+        self.sparse = sparse
+        self._set_metadata(metadata, sensor_names, sensors)
+        self._set_data(data, num_rows)
+
+    def _set_metadata(self, metadata, sensor_names, sensors):
         self.file_metadata = metadata
         # for key in metadata:
         #     self.__setattr__(key, metadata[key])
@@ -24,10 +80,15 @@ class GliderData(object):
             self.source_file = metadata['source_file']
         else:
             self.source_file = ""
-        self._data = data
         self._sensor_names = sensor_names
-        self.sensors = sensors
-        self.N = len(self._data)
+        # column index of every sensor name, kept in sync with _sensor_names
+        self._sensor_index = {
+            name: ii for ii, name in enumerate(sensor_names)}
+        # the definitions of the sensors, in a dictionary of this instance
+        # so that replacing a definition does not change the parsed ones
+        self.sensors = dict(sensors)
+        # calculation function and input sensors of each derived sensor
+        self._derived = {}
         # config is meant to be a container for attaching any configuration
         # object data required to keep with the glider data
         # E.g. dictionary of deployment info, list of special variables, etc.
@@ -37,6 +98,17 @@ class GliderData(object):
         self.pressuresensorname = None
         self.ballastname = None
         self.scitimesensorname = None
+
+    def _set_data(self, data, num_rows=None):
+        if isinstance(data, list):
+            columns = data
+            self.N = len(data[0]) if data else (num_rows or 0)
+        else:
+            columns = [data[:, ii] for ii in range(data.shape[1])]
+            self.N = len(data)
+        self._columns = [
+            self._store_column(sensor, column)
+            for sensor, column in zip(self._sensor_names, columns)]
         self.depth = None
         self.ts = None
         self.set_ts()
@@ -81,9 +153,113 @@ class GliderData(object):
     def sensor_names(self):
         # This is a wrapper to the private attribute just so a new sensor
         # name cannot be added without adding the corresponding data to the end
-        # of the self._data array.
+        # of the self._columns list.
         return self._sensor_names
 
+    @property
+    def _data(self):
+        """N x m array of all the sensor data, assembled from the columns"""
+        if not self._columns:
+            return np.empty((self.N, 0))
+        return np.column_stack(
+            [_expand_column(self._column(idx))
+             for idx in range(len(self._columns))])
+
+    def _column(self, idx):
+        """Return the stored column number `idx`, calculating it first if
+        it is a derived sensor that has not been calculated yet"""
+        column = self._columns[idx]
+        if not isinstance(column, _DerivedColumn):
+            return column
+        sensor = self._sensor_names[idx]
+        if column.gldata is self:
+            function = self._derived[sensor][0]
+            data = np.ascontiguousarray(function(self)).reshape(self.N)
+        else:
+            # a derived sensor of the instance this one was sliced from
+            source = column.gldata
+            data = source._column(source._sensor_index[column.sensor])
+            if column.rows is not None:
+                data = data[column.rows]
+        column = self._store_column(sensor, data, calculated=True)
+        self._columns[idx] = column
+        return column
+
+    def _store_column(self, sensor, column, calculated=False):
+        """Return the read-only array that the data of `sensor` is stored
+        as, in the compact type of the sensor if compact storage is used and
+        as a _SparseColumn if sparse storage is used and takes less memory.
+
+        :param calculated: Optional, True for a sensor calculated by the
+            processing instead of parsed from the data files.  It is stored
+            in float64 with compact storage too, even if its definition is
+            a copy of its source's with a `bytes` attribute.  Default is
+            False.
+        """
+        if isinstance(column, (_SparseColumn, _DerivedColumn)):
+            # already stored, e.g. a column of a slice of a sparse instance
+            return column
+        if not self.compact and not self.sparse:
+            return _read_only(column)
+        sensor_def = self.sensors.get(sensor, {})
+        if calculated and self.compact and column.dtype.kind == 'f':
+            # e.g. calculated from compact float32 sensors
+            column = column.astype(np.float64, copy=False)
+        nc_type = None
+        # columns that are not float64 are already compact, e.g. the
+        # columns of a slice of a compact instance
+        if (
+                self.compact and not calculated
+                and column.dtype == np.float64
+                and sensor not in SLOCUM_TIMESTAMP_SENSORS
+        ):
+            nc_type = SLOCUM_BYTES_TYPES.get(
+                sensor_def.get('attrs', {}).get('bytes'), 'f8')
+            if nc_type == 'f8':
+                nc_type = None
+
+        finites = None
+        if (
+                self.sparse and column.dtype.kind == 'f'
+                and sensor not in SLOCUM_TIMESTAMP_SENSORS
+        ):
+            finites = np.flatnonzero(np.isfinite(column))
+            value_size = np.dtype(nc_type or column.dtype).itemsize
+            index_type = _index_type(len(column))
+            if (
+                    len(finites) * (value_size + index_type.itemsize)
+                    >= len(column) * value_size
+            ):
+                finites = None
+
+        if finites is not None:
+            values = column[finites]
+            if nc_type:
+                values = _compact_column(values, nc_type)
+            column = _SparseColumn(
+                values, finites.astype(index_type), len(column))
+        elif nc_type:
+            column = _compact_column(column, nc_type)
+        else:
+            # copy a strided column of a row-major table, so that the table
+            # is not kept in memory by the column
+            column = _read_only(np.ascontiguousarray(column))
+        if column.dtype != np.float64 and sensor in self.sensors:
+            # replace the definition instead of changing it, it is shared
+            # with the parsed file, the segment cache and sliced instances
+            self.sensors[sensor] = dict(
+                sensor_def, type=column.dtype.str[1:])
+        return _read_only(column)
+
+    def _calculated_sensor_def(self, sensor_def):
+        """Return `sensor_def` without the compact storage type copied from
+        the definition of the sensor it is calculated from, as calculated
+        sensors are stored in float64"""
+        if self.compact and sensor_def.get('type') in ('i1', 'i2', 'f4'):
+            return {key: value for key, value in sensor_def.items()
+                    if key != 'type'}
+        return sensor_def
+
     def add_data(self, sensor_particle, key=None):
         if not isinstance(sensor_particle, dict):
             logger.warning(
@@ -112,7 +288,7 @@ class GliderData(object):
         elif not key:
             key = sensor_particle['sensor_name']
 
-        if key in self.sensor_names:
+        if key in self._sensor_index:
             logger.warning((
                 'Data already exists, Not adding new data {:s}.').format(key)
             )
@@ -125,50 +301,175 @@ class GliderData(object):
             )
             return
         data = sensor_particle.pop('data')
-        self._data = np.append(self._data, data.reshape((self.N, 1)), axis=1)
-        self.sensors[key] = sensor_particle
+        self.sensors[key] = self._calculated_sensor_def(sensor_particle)
+        self._columns.append(self._store_column(
+            key, np.ascontiguousarray(data).reshape(self.N),
+            calculated=True))
+        self._sensor_index[key] = len(self._sensor_names)
+        self._sensor_names.append(key)
+
+    def add_derived(self, sensor_def, function, inputs):
+        """Add a derived sensor that is calculated by `function` the first
+        time its data is used.
+
+        :param sensor_def: sensor definition with the keys 'sensor_name' and
+            'attrs', i.e. a data particle without 'data'
+        :param function: function taking this instance and returning the
+            data array of the sensor
+        :param inputs: names of the sensors the calculation uses.  The
+            derived sensor is calculated again if any of them is changed.
+        """
+        key = sensor_def['sensor_name']
+        if key in self._sensor_index:
+            logger.warning((
+                'Data already exists, Not adding new data {:s}.').format(key)
+            )
+            return
+        missing = [sensor for sensor in inputs
+                   if sensor not in self._sensor_index]
+        if missing:
+            logger.warning(
+                'Sensors {:s} needed for derived sensor {:s} are not '
+                'available'.format(', '.join(missing), key))
+            return
+        self.sensors[key] = self._calculated_sensor_def(sensor_def)
+        self._derived[key] = (function, list(inputs))
+        self._columns.append(_DerivedColumn(self, key, None, self.N))
+        self._sensor_index[key] = len(self._sensor_names)
         self._sensor_names.append(key)
 
+    def _invalidate(self, changed):
+        """Set the derived sensors calculated from the `changed` sensors,
+        directly or through other derived sensors, to be calculated again"""
+        changed = set(changed)
+        # derived sensors are registered after their inputs, so one pass in
+        # registration order finds the indirect dependencies too
+        for sensor, (_, inputs) in self._derived.items():
+            if changed.intersection(inputs):
+                changed.add(sensor)
+                self._columns[self._sensor_index[sensor]] = _DerivedColumn(
+                    self, sensor, None, self.N)
+
+    def set_derived_data(self, sensor, data):
+        """Store the data of derived sensor `sensor` calculated together
+        with another derived sensor, so that it is not calculated again
+        until one of its inputs changes.  Sensors that are not derived
+        sensors of this instance, or that are already calculated, are not
+        changed."""
+        if sensor not in self._derived:
+            return
+        idx = self._sensor_index[sensor]
+        if isinstance(self._columns[idx], _DerivedColumn):
+            self._columns[idx] = self._store_column(
+                sensor, np.ascontiguousarray(data).reshape(self.N),
+                calculated=True)
+
+    def derived_sensors(self):
+        """Return the names of the derived sensors of this instance added
+        with `add_derived`, in the order they were added"""
+        return list(self._derived)
+
+    def wrap_derived(self, sensor, wrapper):
+        """Replace the calculation function of derived sensor `sensor` with
+        `wrapper(function)`, e.g. to time or log the calculation.  Data that
+        is already calculated is kept.
+
+        :param sensor: name of a derived sensor of this instance
+        :param wrapper: function taking the calculation function and
+            returning the function to use instead
+        """
+        if sensor not in self._derived:
+            raise SensorError(
+                "Sensor {:s} is not a derived sensor".format(sensor))
+        function, inputs = self._derived[sensor]
+        self._derived[sensor] = (wrapper(function), inputs)
+
     def getdata(self, item):
-        if item in self._sensor_names:
-            idx = self._sensor_names.index(item)
-            return self._data[:, idx]
+        """Return the read-only data array of sensor `item`"""
+        idx = self._sensor_index.get(item)
+        if idx is None:
+            raise SensorError("Sensor {:s} is not available".format(item))
+        return _expand_column(self._column(idx))
+
+    def finite_indices(self, item):
+        """Return the read-only array of the rows where sensor `item` is
+        finite"""
+        idx = self._sensor_index.get(item)
+        if idx is None:
+            raise SensorError("Sensor {:s} is not available".format(item))
+        column = self._column(idx)
+        if isinstance(column, _SparseColumn):
+            return column.indices
+        if column.dtype.kind == 'i':
+            finites = column != NC_FILL_VALUES[column.dtype.str[1:]]
         else:
+            finites = np.isfinite(column)
+        return _read_only(np.flatnonzero(finites))
+
+    def getfinite(self, item):
+        """Return the rows where sensor `item` is finite and the read-only
+        data array of the sensor at those rows"""
+        idx = self._sensor_index.get(item)
+        if idx is None:
             raise SensorError("Sensor {:s} is not available".format(item))
+        column = self._column(idx)
+        if isinstance(column, _SparseColumn):
+            return column.indices, _expand_column(column.values)
+        indices = self.finite_indices(item)
+        return indices, _read_only(_expand_column(column)[indices])
+
+    def copydata(self, item):
+        """Return a modifiable copy of the data array of sensor `item`"""
+        return self.getdata(item).copy()
 
     def getdataslice(self, items):
         if isinstance(items, str):
             items = [items]
         idxs = []
         for item in items:
-            if item in self._sensor_names:
-                idx = self._sensor_names.index(item)
-                idxs.append(idx)
+            if item in self._sensor_index:
+                idxs.append(self._sensor_index[item])
             else:
                 raise SensorError("Sensor {:s} is not available".format(item))
         if len(idxs) == 1:
-            idxs = idxs[0]
-        return self._data[:, idxs]
+            return _expand_column(self._column(idxs[0]))
+        return np.column_stack(
+            [_expand_column(self._column(idx)) for idx in idxs])
 
     def update_data(self, items, row_indices, values):
         row_indices = np.atleast_1d(row_indices)
         col_idxs = []
         for item in items:
-            if item in self._sensor_names:
-                idx = self._sensor_names.index(item)
-                col_idxs.append(idx)
+            if item in self._sensor_index:
+                col_idxs.append(self._sensor_index[item])
             else:
                 raise SensorError("Sensor {:s} is not available".format(item))
-        col_idxs = np.atleast_1d(col_idxs)
         # Don't want a try statement here, I want the np.array error to raise
         # if `values` does not fit into the indices given
-        self._data[row_indices.reshape(len(row_indices), 1), col_idxs] = values
+        values = np.broadcast_to(values, (len(row_indices), len(col_idxs)))
+        for ii, col_idx in enumerate(col_idxs):
+            # copy on write, the old column may be shared with a slice of
+            # this instance or with another sensor
+            column = np.array(_expand_column(self._column(col_idx)))
+            column[row_indices] = values[:, ii]
+            sensor = self._sensor_names[col_idx]
+            # compact columns are expanded to float32, so the float64
+            # columns are the sensors that are not stored compact
+            self._columns[col_idx] = self._store_column(
+                sensor, column, calculated=column.dtype == np.float64)
+            # an updated derived sensor keeps the new values
+            self._derived.pop(sensor, None)
+        self._invalidate(items)
 
     def _get_dataparticle(self, item):
-        if item in self._sensor_names:
+        if item in self._sensor_index:
             data_particle = self.sensors[item].copy()
-            idx = self._sensor_names.index(item)
-            data_particle['data'] = self._data[:, idx]
+            # copy attrs too so changing the particle's attributes does not
+            # change the sensor definition
+            if 'attrs' in data_particle:
+                data_particle['attrs'] = data_particle['attrs'].copy()
+            idx = self._sensor_index[item]
+            data_particle['data'] = _expand_column(self._column(idx))
             return_item = data_particle
         else:
             # return_item = None
@@ -185,21 +486,34 @@ class GliderData(object):
             col_inds = []
             for sensor in sensors:
                 sensor_defs[sensor] = self.sensors[sensor].copy()
-                col_inds.append(self._sensor_names.index(sensor))
+                col_inds.append(self._sensor_index[sensor])
         else:
             sensor_names = self._sensor_names.copy()
             sensor_defs = self.sensors.copy()
-            col_inds = slice(None)
+            col_inds = range(len(self._sensor_names))
 
-        if indices is not None and sensors is not None:
-            row_inds = np.array(indices)[:, np.newaxis]
-        elif indices is not None and sensors is None:
-            row_inds = np.array(indices)
-        else:
+        if indices is None:
             row_inds = slice(None)
+        elif isinstance(indices, slice):
+            row_inds = indices
+        else:
+            row_inds = np.array(indices)
+            # a contiguous range of rows, e.g. a profile, is sliced instead
+            row_inds = _contiguous_slice(row_inds) or row_inds
 
-        data = self._data[row_inds, col_inds]
-        return GliderData(self.file_metadata, sensor_names, sensor_defs, data)
+        # basic slicing gives views into this instance's read-only columns
+        columns = [self._columns[col_ind][row_inds] for col_ind in col_inds]
+        if isinstance(row_inds, slice):
+            num_rows = len(range(self.N)[row_inds])
+        else:
+            num_rows = len(np.arange(self.N)[row_inds])
+        # the columns are already in their storage types, the float64
+        # columns of a compact instance are the sensors that stay float64
+        sliced = GliderData(
+            self.file_metadata, sensor_names, sensor_defs, columns,
+            num_rows, sparse=self.sparse)
+        sliced.compact = self.compact
+        return sliced
 
     def set_ts(self, timesensor=None):
         """Set the .ts timestamp attribute with the desired time sensor.
@@ -241,56 +555,502 @@ class GliderData(object):
                 interpolate and np.any(np.isfinite(depth))
                 and self.ts is not None
         ):
-            finites = np.flatnonzero(np.isfinite(depth))
-            self.depth = np.interp(
-                self.ts, self.ts[finites], depth[finites],
-                left=depth[finites[0]], right=depth[finites[-1]])
+            self.depth = TimeInterpolator(self.ts, self.ts).resample(depth)
         else:
             self.depth = depth
 
 
 class DbaData(GliderData):
+    """Slocum data file.  Only the header and sensor definitions are parsed
+    when the instance is created.  The data table and the attributes derived
+    from it (`N`, `ts`, `depth` and the dive indices) are loaded the first
+    time one of them is used, so files that are skipped based on their
+    metadata are never fully parsed.
     """
+    _lazy_attributes = _LAZY_ATTRIBUTES
 
-    """
-    def __init__(self, dba_file):
-        # self.file_metadata = None
-        # self._data = np.array([])
-        dba = parse_dba(dba_file)
+    def __init__(self, dba_file, cac_dir=None, sensors=None, compact=False,
+                 sparse=False):
+        """Parse a Slocum data file into a GliderData instance
+
+        :param dba_file: ascii dba or Slocum binary data file to parse
+        :param cac_dir: Optional, directory of the binary `.cac` sensor list
+            cache files
+        :param sensors: Optional list of sensor names to load.  All other
+            sensors in the file are skipped while parsing.  Default loads all
+            sensors.
+        :param compact: Optional, use compact storage (see GliderData).
+            Default is False.
+        :param sparse: Optional, use sparse storage (see GliderData).
+            Default is False.
+
+        The file is read from the parsed segment cache if it has been enabled
+        with `ooidac.readers.segment_cache.enable_cache`.
+        """
+        self._dba_file = dba_file
+        self._cac_dir = cac_dir
+        self._parse_sensors = sensors
+        self.compact = compact
+        self.sparse = sparse
+        # binary Slocum files (dbd, ebd, sbd, tbd, ...) are parsed directly,
+        # anything else is treated as an ascii dba table
+        dba = parse_data_file_sensors(dba_file, cac_dir=cac_dir, sensors=sensors)
+        if dba is None:
+            # unreadable file, behaves as an empty data file
+            self._set_metadata({}, [], {})
+            self._data_loaded = True
+            self._columns = []
+            self.N = 0
+            self.ts = None
+            self.depth = None
+            self._reset_indices()
+            return
+        self._set_metadata(
+            dba['header'], dba['sensor_names'], dba['sensor_defs'])
+        self._data_loaded = False
+
+    def __getattr__(self, name):
+        # only called when the attribute is not set, i.e. before the data
+        # table is loaded
+        if (
+                name in self._lazy_attributes
+                and not self.__dict__.get('_data_loaded', True)
+        ):
+            self._load_data()
+            return getattr(self, name)
+        raise AttributeError("'{:s}' object has no attribute '{:s}'".format(
+            type(self).__name__, name))
+
+    def _load_data(self):
+        """Parse the data table and set the attributes derived from it"""
+        self._data_loaded = True
+        self._reset_indices()
+        dba = parse_data_file(
+            self._dba_file, cac_dir=self._cac_dir, sensors=self._parse_sensors)
         if dba is None:
+            self._set_data(np.empty((0, len(self._sensor_names))))
             return
-        GliderData.__init__(
-            self,
-            dba['header'], dba['sensor_names'],
-            dba['sensor_defs'], dba['data']
-        )
+        if dba['sensor_names'] != self._sensor_names:
+            logger.warning(
+                'Sensors of {:s} changed since the header was read'.format(
+                    self.source_file))
+            self._sensor_names = dba['sensor_names']
+            self._sensor_index = {
+                name: ii for ii, name in enumerate(self._sensor_names)}
+            self.sensors = dict(dba['sensor_defs'])
+        self._set_data(dba['data'])
+        self.get_indices()
+
+    def _reset_indices(self):
+        self.dive_runs = None
         self.underwater_indices = None
         self.pre_dive_indices = None
         self.post_dive_indices = None
         self.surface_indices = None
-        self.get_indices()
 
     def get_indices(self):
         """ Determine the indices for when the glider is underwater, at the
         surface, and if the glider dives, the pre-dive and post dive indices.
+
+        The underwater and surface rows are kept as a run table in
+        `dive_runs` (see DiveRuns), the index arrays are expanded from it.
         """
         if self.depth is None:
             return
-        underwater_indices = np.flatnonzero(self.depth > 2.0)
-        # max_depth = self.depth.max()
-        clusters, cluster_ids = cluster_index(underwater_indices, ids=True)
-        for cluster_id in cluster_ids:
-            cluster = np.flatnonzero(clusters == cluster_id)
-            if len(cluster) < 5:
-                clusters = np.delete(clusters, cluster)
-                underwater_indices = np.delete(underwater_indices, cluster)
-        self.underwater_indices = underwater_indices
-        self.surface_indices = np.setdiff1d(
-            np.arange(self.N), underwater_indices)  # order matters
-        if len(underwater_indices > 0):
-            self.pre_dive_indices = np.arange(underwater_indices[0])
+        self.dive_runs = DiveRuns.from_depth(self.depth)
+        self.underwater_indices = self.dive_runs.underwater_indices()
+        self.surface_indices = self.dive_runs.surface_indices()
+        if self.dive_runs.num_dives > 0:
+            self.pre_dive_indices = np.arange(
+                self.dive_runs.first_underwater_row)
             self.post_dive_indices = np.arange(
-                underwater_indices[-1]+1, self.N)
+                self.dive_runs.last_underwater_row + 1, self.N)
+
+
+class DiveRuns(object):
+    """Run-length encoded underwater and surface rows of a data file.
+
+    Each underwater run is a block of consecutive rows deeper than the
+    underwater depth, every other row is at the surface.  Rows are looked up
+    with a binary search of the run starts instead of set operations on the
+    index arrays.
+    """
+
+    def __init__(self, starts, stops, num_rows):
+        """
+        :param starts: increasing array of the first row of each underwater
+            run
+        :param stops: array of one past the last row of each underwater run
+        :param num_rows: total number of rows of the data file
+        """
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        self.N = num_rows
+
+    @classmethod
+    def from_depth(cls, depth, underwater_depth=2.0, min_rows=5):
+        """Build the run table from a depth array.
+
+        :param depth: depth array of the data file
+        :param underwater_depth: depth below which the glider is underwater
+        :param min_rows: underwater runs shorter than this many rows are
+            counted as surface rows
+        :return: DiveRuns instance
+        """
+        starts, stops = index_runs(np.flatnonzero(depth > underwater_depth))
+        long_runs = stops - starts >= min_rows
+        return cls(starts[long_runs], stops[long_runs], len(depth))
+
+    @property
+    def num_dives(self):
+        """Number of underwater runs"""
+        return len(self.starts)
+
+    @property
+    def first_underwater_row(self):
+        """First underwater row or None if the glider never dives"""
+        if self.num_dives == 0:
+            return None
+        return self.starts[0]
+
+    @property
+    def last_underwater_row(self):
+        """Last underwater row or None if the glider never dives"""
+        if self.num_dives == 0:
+            return None
+        return self.stops[-1] - 1
+
+    def surface_runs(self):
+        """Return the starts and stops of the surface runs"""
+        starts = np.concatenate(([0], self.stops))
+        stops = np.concatenate((self.starts, [self.N]))
+        not_empty = stops > starts
+        return starts[not_empty], stops[not_empty]
+
+    def underwater_indices(self):
+        """Return the array of the underwater rows"""
+        return runs_to_indices(self.starts, self.stops)
+
+    def surface_indices(self):
+        """Return the array of the surface rows"""
+        return runs_to_indices(*self.surface_runs())
+
+    def is_underwater(self, rows):
+        """Return a boolean array that is True for each of `rows` that is
+        in an underwater run"""
+        rows = np.asarray(rows)
+        if self.num_dives == 0:
+            return np.zeros(rows.shape, dtype=bool)
+        run = np.searchsorted(self.starts, rows, side='right') - 1
+        return (run >= 0) & (rows < self.stops[run])
+
+    def underwater_mask(self):
+        """Return a boolean array of length N that is True for the
+        underwater rows"""
+        mask = np.zeros(self.N, dtype=bool)
+        mask[self.underwater_indices()] = True
+        return mask
+
+
+
+class DeploymentData(DbaData):
+    """The Slocum data files of a deployment concatenated into one
+    GliderData instance, so that processing that needs the data before or
+    after a segment (GPS interpolation, the depth averaged velocities of
+    the following segments, profiles across a segment boundary) can run
+    once over the whole deployment.
+
+    Only the file headers are parsed when the instance is created.  The
+    sensors are the union of the sensors of all the files, in the order they
+    first appear, and a sensor that is missing from a file is NaN for the
+    rows of that file.  The data files are parsed and concatenated the first
+    time the data is used.  `segment_offsets` holds the first row of each
+    data file and the total number of rows, so the rows of data file `ii`
+    are `segment_offsets[ii]:segment_offsets[ii + 1]`.
+    """
+    _lazy_attributes = _LAZY_ATTRIBUTES | {'segment_offsets'}
+
+    def __init__(self, data_files, cac_dir=None, sensors=None, compact=False,
+                 sparse=False, catalog=None):
+        """
+        :param data_files: list of ascii dba or Slocum binary data files of
+            the deployment, in time order
+        :param cac_dir: Optional, directory of the binary `.cac` sensor list
+            cache files
+        :param sensors: Optional list of sensor names to load.  Default loads
+            all sensors.
+        :param compact: Optional, use compact storage (see GliderData).
+            Default is False.
+        :param sparse: Optional, use sparse storage (see GliderData).
+            Default is False.
+        :param catalog: Optional DeploymentCatalog of the data files, used to
+            sort the data files by their start time
+        """
+        if catalog is not None:
+            data_files = sorted(data_files, key=lambda data_file: (
+                (catalog.get(data_file) or {}).get('start_time') or 0.))
+        self._cac_dir = cac_dir
+        self._parse_sensors = sensors
+        self.compact = compact
+        self.sparse = sparse
+        self.segment_files = []
+        self.segment_metadata = []
+        sensor_names = []
+        sensor_defs = {}
+        for data_file in data_files:
+            dba = parse_data_file_sensors(
+                data_file, cac_dir=cac_dir, sensors=sensors)
+            if dba is None:
+                logger.warning(
+                    'Skipping unreadable data file: {:s}'.format(data_file))
+                continue
+            self.segment_files.append(data_file)
+            self.segment_metadata.append(dba['header'])
+            for sensor in dba['sensor_names']:
+                if sensor not in sensor_defs:
+                    sensor_names.append(sensor)
+                    sensor_defs[sensor] = dba['sensor_defs'][sensor]
+
+        metadata = self.segment_metadata[0] if self.segment_metadata else {}
+        self._set_metadata(metadata.copy(), sensor_names, sensor_defs)
+        self._data_loaded = False
+
+    def __repr__(self):
+        return "<DeploymentData({:d} segments)>".format(
+            len(self.segment_files))
+
+    @property
+    def num_segments(self):
+        return len(self.segment_files)
+
+    def _load_data(self):
+        """Parse and concatenate the data tables of the data files"""
+        self._data_loaded = True
+        self._reset_indices()
+        pieces = [[] for _ in self._sensor_names]
+        num_rows = []
+        for data_file in self.segment_files:
+            dba = parse_data_file(
+                data_file, cac_dir=self._cac_dir, sensors=self._parse_sensors)
+            if dba is None:
+                num_rows.append(0)
+                continue
+            file_index = {
+                name: ii for ii, name in enumerate(dba['sensor_names'])}
+            for sensor in file_index:
+                if sensor not in self._sensor_index:
+                    logger.warning(
+                        'Skipping sensor {:s} of {:s} not in the file '
+                        'header'.format(sensor, data_file))
+            rows = len(dba['data'])
+            num_rows.append(rows)
+            for sensor, ii in self._sensor_index.items():
+                if sensor in file_index:
+                    pieces[ii].append(dba['data'][:, file_index[sensor]])
+                else:
+                    pieces[ii].append(np.full(rows, np.nan))
+        self.segment_offsets = np.cumsum([0] + num_rows)
+        self._set_data(
+            [np.concatenate(column) if column else np.empty(0)
+             for column in pieces],
+            num_rows=int(self.segment_offsets[-1]))
+        self.get_indices()
+
+    def segment_rows(self, segment):
+        """Return the slice of the rows of data file number `segment`"""
+        return slice(
+            int(self.segment_offsets[segment]),
+            int(self.segment_offsets[segment + 1]))
+
+    def row_segments(self, rows):
+        """Return the data file number of each row in `rows`"""
+        return np.searchsorted(self.segment_offsets, rows, side='right') - 1
+
+    def segment(self, segment):
+        """Return the data of data file number `segment` as a GliderData
+        instance"""
+        return self.slicedata(indices=self.segment_rows(segment))
+
+    def time_slice(self, start_time=None, end_time=None):
+        """Return the rows with `start_time` <= m_present_time < `end_time`
+        as a GliderData instance.  The timestamps must be increasing, i.e.
+        the data files must be in time order.
+
+        :param start_time: Optional, unix time of the first row.  Default is
+            the start of the deployment.
+        :param end_time: Optional, unix time after the last row.  Default is
+            the end of the deployment.
+        :return: GliderData instance
+        """
+        start = 0
+        stop = self.N
+        if start_time is not None:
+            start = int(np.searchsorted(self.ts, start_time, side='left'))
+        if end_time is not None:
+            stop = int(np.searchsorted(self.ts, end_time, side='left'))
+        return self.slicedata(indices=slice(start, max(start, stop)))
+
+    def slicedata(self, sensors=None, indices=None):
+        """Slice the data like GliderData.slicedata.  The file metadata of
+        the returned instance is that of the data file of its first row."""
+        sliced = super(DeploymentData, self).slicedata(
+            sensors=sensors, indices=indices)
+        if sliced is None or sliced.N == 0 or indices is None:
+            return sliced
+        if isinstance(indices, slice):
+            first_row = range(self.N)[indices][0]
+        else:
+            first_row = np.asarray(indices)[0]
+        metadata = self.segment_metadata[int(self.row_segments(first_row))]
+        sliced.file_metadata = metadata
+        sliced.source_file = metadata.get('source_file', '')
+        return sliced
+
+
+def _contiguous_slice(indices):
+    """Return the slice equivalent of an array of row indices if they are a
+    contiguous increasing range, otherwise None"""
+    if indices.ndim != 1 or len(indices) == 0 or indices.dtype.kind not in 'iu':
+        return
+    start = int(indices[0])
+    stop = int(indices[-1]) + 1
+    if start < 0 or stop - start != len(indices):
+        return
+    if len(indices) > 1 and not np.all(np.diff(indices) == 1):
+        return
+    return slice(start, stop)
+
+
+def _compact_column(column, nc_type):
+    """Return float64 `column` as an array of type `nc_type`.  Integer types
+    are used only if all the finite values are integers in the range of the
+    type, with the missing values set to the NetCDF fill value of the type,
+    otherwise the column is stored as float32."""
+    if nc_type in ('i1', 'i2'):
+        finites = np.isfinite(column)
+        values = column[finites]
+        int_info = np.iinfo(nc_type)
+        fill_value = NC_FILL_VALUES[nc_type]
+        if (
+                len(values) == 0
+                or np.all(values == np.round(values))
+                and values.min() >= int_info.min
+                and values.max() <= int_info.max
+                and not np.any(values == fill_value)
+        ):
+            return np.where(finites, column, fill_value).astype(nc_type)
+    return column.astype(np.float32)
+
+
+def _expand_column(column):
+    """Return a compact integer column as float32 with NaN for the missing
+    values, a _SparseColumn as the full length array, or any other column as
+    is"""
+    if isinstance(column, _SparseColumn):
+        return column.dense()
+    if column.dtype.kind != 'i':
+        return column
+    expanded = column.astype(np.float32)
+    expanded[column == NC_FILL_VALUES[column.dtype.str[1:]]] = np.nan
+    return _read_only(expanded)
+
+
+def _index_type(num_rows):
+    """Return the smallest integer type for the row indices of a column of
+    `num_rows` rows"""
+    if num_rows < np.iinfo(np.int32).max:
+        return np.dtype(np.int32)
+    return np.dtype(np.int64)
+
+
+def _read_only(array):
+    """Return a read-only view of `array`, or `array` if it is read-only"""
+    if isinstance(array, _SparseColumn) or not array.flags.writeable:
+        return array
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class _SparseColumn(object):
+    """The finite values of a sensor and their row indices, in increasing
+    row order, for a column of `size` rows"""
+    __slots__ = ('values', 'indices', 'size')
+
+    def __init__(self, values, indices, size):
+        self.values = _read_only(values)
+        self.indices = _read_only(indices)
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.indices.nbytes
+
+    def dense(self):
+        """Return the read-only full length array with NaN for the rows
+        without a value"""
+        values = _expand_column(self.values)
+        dense = np.full(self.size, np.nan, dtype=values.dtype)
+        dense[self.indices] = values
+        return _read_only(dense)
+
+    def __getitem__(self, rows):
+        """Return the _SparseColumn of a slice or an array of row indices"""
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.size)
+            if step == 1:
+                stop = max(start, stop)
+                first, last = np.searchsorted(self.indices, [start, stop])
+                return _SparseColumn(
+                    self.values[first:last],
+                    self.indices[first:last] - self.indices.dtype.type(start),
+                    stop - start)
+            rows = np.arange(start, stop, step)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = np.where(rows < 0, rows + self.size, rows)
+        positions = np.searchsorted(self.indices, rows)
+        positions[positions == len(self.indices)] = 0
+        found = np.flatnonzero(
+            (self.indices[positions] == rows) if len(self.indices)
+            else np.zeros(len(rows), dtype=bool))
+        return _SparseColumn(
+            self.values[positions[found]],
+            found.astype(_index_type(len(rows))), len(rows))
+
+
+class _DerivedColumn(object):
+    """Column of derived sensor `sensor` of the GliderData instance
+    `gldata` that has not been calculated yet.  `rows` are the rows of the
+    calculated column of `gldata` in this column, None for all of them."""
+    __slots__ = ('gldata', 'sensor', 'rows', 'size')
+
+    def __init__(self, gldata, sensor, rows, size):
+        self.gldata = gldata
+        self.sensor = sensor
+        self.rows = rows
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, rows):
+        """Return the _DerivedColumn of a slice or an array of row
+        indices"""
+        size = len(np.arange(self.size)[rows])
+        if self.rows is not None:
+            rows = np.arange(self.gldata.N)[self.rows][rows]
+        elif not isinstance(rows, slice):
+            rows = np.asarray(rows)
+        return _DerivedColumn(self.gldata, self.sensor, rows, size)
 
 
 class SensorError(KeyError):
@@ -0,0 +1,220 @@
+"""Registry of the profile filters of profile_filters.py.
+
+Each filter declares the sensors it reads and its estimated cost in
+milliseconds per profile with the `profile_filter` decorator.  The registry
+runs the filters in the order of their observed rejection rate per unit of
+cost, so cheap filters that remove many profiles run first and the
+expensive ones only see the profiles that are left.  The removed profiles
+are the same in any order, only which filter is credited with removing a
+profile changes.  A filter whose sensors are not in the data is skipped.
+
+The number of profiles each filter evaluated and removed and the time it
+took are recorded over all of the segments of a run, along with the
+threshold parameters of the filters, to tune the thresholds in
+profile_filters.py.
+
+Usage:
+    @profile_filter(sensors=['m_present_time'], cost=0.1)
+    def filter_time_lessthan(profile_data, threshold=1):
+        ...
+
+    registry = FilterRegistry.from_module(profile_filters)
+    profiles.filter_profiles(registry=registry)
+    sys.stdout.write(registry.report())
+    registry.write('filter_stats.json')
+"""
+
+import os
+import json
+import time
+import inspect
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(os.path.basename(__name__))
+
+# estimated cost in milliseconds per profile of a filter that does not
+# declare it
+DEFAULT_COST = 1.0
+
+
+def profile_filter(sensors=(), cost=DEFAULT_COST):
+    """Decorator declaring the sensors a profile filter reads and its
+    estimated cost.  The filter function itself is not changed.
+
+    :param sensors: Optional, sensors the filter reads.  The filter is
+        skipped for data without them.
+    :param cost: Optional, estimated milliseconds per profile, used to order
+        the filters until their cost is measured
+    :return: the decorator
+    """
+    def decorator(function):
+        function.sensors = list(sensors)
+        function.cost = cost
+        return function
+    return decorator
+
+
+class ProfileFilter(object):
+    """A profile filter function, its batch version and its declarations"""
+    def __init__(self, name, function, batch_function=None, sensors=(),
+                 cost=DEFAULT_COST):
+        """
+        :param name: name of the filter used in the log messages and report
+        :param function: function taking a profile GliderData instance and
+            returning True if the profile is to be removed
+        :param batch_function: Optional, function taking the segment
+            GliderData instance and the P x 2 array of the profile row
+            ranges and returning a boolean array that is True for the
+            profiles to remove
+        :param sensors: Optional, sensors the filter reads
+        :param cost: Optional, estimated milliseconds per profile
+        """
+        self.name = name
+        self.function = function
+        self.batch_function = batch_function
+        self.sensors = list(sensors)
+        self.cost = cost
+        # the threshold parameters and their default values
+        self.parameters = {
+            parameter.name: parameter.default
+            for parameter in inspect.signature(function).parameters.values()
+            if parameter.default is not inspect.Parameter.empty}
+
+    def __repr__(self):
+        return '<ProfileFilter: {:s}>'.format(self.name)
+
+
+class FilterRegistry(object):
+    """Cost ordered profile filters and their statistics"""
+    def __init__(self, filters):
+        """
+        :param filters: list of ProfileFilter instances
+        """
+        self.filters = list(filters)
+        self.stats = {
+            profile_filter.name: {'segments': 0, 'evaluated': 0,
+                                  'removed': 0, 'skipped': 0, 'seconds': 0.0}
+            for profile_filter in self.filters}
+
+    @classmethod
+    def from_module(cls, module):
+        """Return the registry of the `filter_` functions of `module` and
+        their `batch_filter_` versions, e.g. of profile_filters.py"""
+        filters = []
+        for name in sorted(dir(module)):
+            if not name.startswith('filter'):
+                continue
+            function = getattr(module, name)
+            filters.append(ProfileFilter(
+                name, function,
+                batch_function=getattr(module, 'batch_' + name, None),
+                sensors=getattr(function, 'sensors', ()),
+                cost=getattr(function, 'cost', DEFAULT_COST)))
+        return cls(filters)
+
+    def estimated_cost(self, profile_filter):
+        """Return the milliseconds per profile of a filter, the declared
+        cost until it is replaced by the measured time"""
+        stats = self.stats[profile_filter.name]
+        return (
+            (profile_filter.cost + 1000. * stats['seconds'])
+            / (1 + stats['evaluated']))
+
+    def rejection_rate(self, profile_filter):
+        """Return the fraction of the evaluated profiles that a filter
+        removed, starting from 1/2 before any are evaluated"""
+        stats = self.stats[profile_filter.name]
+        return (stats['removed'] + 1.) / (stats['evaluated'] + 2.)
+
+    def order(self):
+        """Return the filters by decreasing rejection rate per unit of
+        cost"""
+        return sorted(
+            self.filters,
+            key=lambda profile_filter: -(
+                self.rejection_rate(profile_filter)
+                / max(self.estimated_cost(profile_filter), 1e-9)))
+
+    def run(self, gldata, ranges, batch=True):
+        """Run the filters on the profiles of a segment
+
+        :param gldata: GliderData instance of the segment
+        :param ranges: P x 2 array of the first row and the end row
+            (exclusive) of each profile, e.g. Profiles.ranges
+        :param batch: Optional, evaluate the filters that have a batch
+            version for all of the remaining profiles at once.  The
+            timestamps must be increasing.  Default is True.
+        :return: boolean array, True for the profiles to keep
+        """
+        profiles = {}
+        profiles_to_keep = np.full(len(ranges), True)
+        for profile_filter in self.order():
+            remaining = np.flatnonzero(profiles_to_keep)
+            if len(remaining) == 0:
+                break
+            stats = self.stats[profile_filter.name]
+            missing = [
+                sensor for sensor in profile_filter.sensors
+                if sensor not in gldata.sensor_names]
+            if missing:
+                logger.debug('Skipping {:s}, missing sensors {:s}'.format(
+                    profile_filter.name, ', '.join(missing)))
+                stats['skipped'] += 1
+                continue
+
+            t0 = time.perf_counter()
+            if batch and profile_filter.batch_function is not None:
+                remove_profile = np.asarray(profile_filter.batch_function(
+                    gldata, ranges[remaining]), dtype=bool)
+            else:
+                remove_profile = np.full(len(remaining), False)
+                for jj, ii in enumerate(remaining):
+                    if ii not in profiles:
+                        profiles[ii] = gldata.slicedata(
+                            indices=slice(*ranges[ii]))
+                    remove_profile[jj] = profile_filter.function(
+                        profiles[ii])
+            stats['seconds'] += time.perf_counter() - t0
+            stats['segments'] += 1
+            stats['evaluated'] += len(remaining)
+            stats['removed'] += int(np.count_nonzero(remove_profile))
+
+            for ii in remaining[remove_profile]:
+                logger.debug('Profile {:d} removed by {:s}'.format(
+                    ii, profile_filter.name))
+            profiles_to_keep[remaining[remove_profile]] = False
+        return profiles_to_keep
+
+    def to_dict(self):
+        """Return the statistics, declarations and threshold parameters of
+        the filters, in the current order"""
+        return {
+            profile_filter.name: dict(
+                self.stats[profile_filter.name],
+                sensors=profile_filter.sensors,
+                cost=profile_filter.cost,
+                ms_per_profile=self.estimated_cost(profile_filter),
+                parameters=profile_filter.parameters)
+            for profile_filter in self.order()}
+
+    def write(self, path):
+        """Write the statistics of the filters to the JSON file `path`"""
+        with open(path, 'w') as fid:
+            json.dump(self.to_dict(), fid, indent=4, default=str)
+
+    def report(self):
+        """Return a table of the profiles evaluated and removed by each
+        filter and the time it took"""
+        lines = ['{:<36s} {:>9s} {:>8s} {:>7s} {:>10s} {:>8s}'.format(
+            'filter', 'evaluated', 'removed', 'skipped', 'seconds',
+            'ms/prof')]
+        for profile_filter in self.order():
+            stats = self.stats[profile_filter.name]
+            lines.append(
+                '{:<36s} {:>9d} {:>8d} {:>7d} {:>10.4f} {:>8.3f}'.format(
+                    profile_filter.name, stats['evaluated'],
+                    stats['removed'], stats['skipped'], stats['seconds'],
+                    self.estimated_cost(profile_filter)))
+        return '\n'.join(lines) + '\n'
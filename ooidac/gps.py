@@ -1,29 +1,39 @@
 import numpy as np
 import logging
 import os
+from ooidac.utilities import TimeInterpolator
 
 logger = logging.getLogger(os.path.basename(__file__))
 
 
-def interpolate_gps(timestamps, latitude, longitude):
+def interpolate_gps(timestamps, latitude, longitude, fix_indices=None):
     """Calculates interpolated GPS coordinates between the two surfacings
     in a single glider binary data file.
 
     Parameters:
-        'dataset': An N by 3 numpy array of time, lat, lon pairs
+        'timestamps': array of the N timestamps to interpolate to
+        'latitude', 'longitude': arrays of the N GPS coordinates, NaN where
+            there is no fix, or of the fixes only if `fix_indices` is given
+        'fix_indices': Optional, the rows of `timestamps` of the GPS fixes in
+            `latitude` and `longitude`, e.g. the stored finite rows of a
+            sparse GliderData sensor
 
     Returns interpolated gps dataset over entire time domain of dataset
     """
 
+    if fix_indices is None:
+        fix_timestamps = timestamps
+    else:
+        fix_timestamps = timestamps[fix_indices]
     dataset = np.column_stack((
-        timestamps,
+        fix_timestamps,
         latitude,
         longitude
     ))
 
-    est_lat = np.empty((len(dataset))) * np.nan
-    est_lon = np.empty((len(dataset))) * np.nan
-    
+    est_lat = np.empty((len(timestamps))) * np.nan
+    est_lon = np.empty((len(timestamps))) * np.nan
+
     dataset = dataset[~np.isnan(dataset).any(axis=1), :]
     
     if len(dataset) == 0:
@@ -37,21 +47,9 @@ def interpolate_gps(timestamps, latitude, longitude):
         est_lat[:] = dataset[0, 1]
         est_lon[:] = dataset[0, 2]
     else:
-        # Interpolate data
-        est_lat = np.interp(
-            timestamps,
-            dataset[:, 0],
-            dataset[:, 1],
-            left=dataset[0, 1],
-            right=dataset[-1, 1]
-        )
-        est_lon = np.interp(
-            timestamps,
-            dataset[:, 0],
-            dataset[:, 2],
-            left=dataset[0, 2],
-            right=dataset[-1, 2]
-        )
+        # Interpolate data, holding the first and last fix outside of them
+        est_lat, est_lon = TimeInterpolator(
+            dataset[:, 0], timestamps).resample(dataset[:, 1], dataset[:, 2])
 
     return est_lat, est_lon
 
@@ -113,14 +111,12 @@ def correct_uw_dr_pos(dba):
     # gps_fixes and any dr points that are on the surface
     dr_lat[gps_indices] = np.nan
     dr_lon[gps_indices] = np.nan
-    dr_lon[dba.surface_indices] = np.nan
-    dr_lat[dba.surface_indices] = np.nan
+    surface = ~dba.dive_runs.underwater_mask()
+    dr_lon[surface] = np.nan
+    dr_lat[surface] = np.nan
 
     # remove any gps indices that are underwater ( > 2 meters)
-    gps_uw_ii = np.intersect1d(
-        gps_indices, dba.underwater_indices,
-        assume_unique=True, return_indices=True)[1]
-    gps_indices = np.delete(gps_indices, gps_uw_ii)
+    gps_indices = gps_indices[~dba.dive_runs.is_underwater(gps_indices)]
 
     # remove any remaining fixes that are half a meter deeper than the median
     # fix depth
@@ -132,8 +128,10 @@ def correct_uw_dr_pos(dba):
 
     # all below was just pasted from the terminal, but is the basis for
     # correcting lats and lons after the above adjustments.
-    pre_dive_fixes = np.intersect1d(gps_indices, dba.pre_dive_indices)
-    post_dive_fixes = np.intersect1d(gps_indices, dba.post_dive_indices)
+    pre_dive_fixes = gps_indices[
+        gps_indices < dba.dive_runs.first_underwater_row]
+    post_dive_fixes = gps_indices[
+        gps_indices > dba.dive_runs.last_underwater_row]
 
     x = [dba.ts[pre_dive_fixes[-1]], dba.ts[post_dive_fixes[0]]]
     y_lat = [gps_lat[pre_dive_fixes[-1]], gps_lat[post_dive_fixes[0]]]
@@ -184,10 +182,6 @@ def correct_uw_dr_pos(dba):
     lons[gps_indices] = gps_lon[gps_indices]
 
     positions_ii = np.union1d(gps_indices, dr_indices)
-    lats = np.interp(
-        dba.ts, dba.ts[positions_ii], lats[positions_ii],
-        left=lats[positions_ii[0]], right=lats[positions_ii[-1]])
-    lons = np.interp(
-        dba.ts, dba.ts[positions_ii], lons[positions_ii],
-        left=lons[positions_ii[0]], right=lons[positions_ii[-1]])
+    lats, lons = TimeInterpolator(dba.ts[positions_ii], dba.ts).resample(
+        lats[positions_ii], lons[positions_ii])
     return lats, lons
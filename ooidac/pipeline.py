@@ -0,0 +1,255 @@
+"""Processing pipeline of the derived sensors of a data file.
+
+Each processing step declares the sensors it reads and the sensors it adds to
+the GliderData instance.  The pipeline orders the steps so that every step
+runs after the steps producing its inputs, and only runs the steps needed for
+the wanted sensors (e.g. the sensors mapped to NetCDF variables in
+`sensor_defs.json`), along with the required steps.  A step whose input
+sensors are not in the data file is skipped, and a step returning None
+(failed) stops the processing of that data file.
+
+The wall time of every step is recorded, and while `tracemalloc` is tracing
+the number and size of the memory blocks allocated by each step are recorded
+too.  Steps that add derived sensors (see GliderData.add_derived) only
+register them, and the sensors are calculated later when their data is first
+used, e.g. by a later step or the NetCDF writer.  The time and memory of those
+calculations are charged to the step that registered the sensors, and not to
+the step or writer that used them.
+
+Usage:
+    pipeline = ProcessingPipeline(
+        [ProcessingStep('ctd_data', ctd_function,
+                        inputs=SCI_CTD_SENSORS,
+                        outputs=['salinity', 'density'],
+                        required=True),
+         ProcessingStep('backscatter_total', processing.backscatter_total,
+                        inputs=['sci_flbbcd_bb_units', 'salinity'],
+                        outputs=['backscatter'])],
+        wanted=ncw.nc_sensor_defs)
+    dba = pipeline.run(dba)
+    sys.stdout.write(pipeline.report())
+"""
+
+import os
+import time
+import logging
+import contextlib
+import tracemalloc
+
+logger = logging.getLogger(os.path.basename(__name__))
+
+
+class ProcessingStep(object):
+    """A processing function and the sensors it reads and adds"""
+    def __init__(self, name, function, inputs=(), outputs=(), required=False):
+        """
+        :param name: name of the step used in the log messages and report
+        :param function: function taking a GliderData instance and returning
+            it with the output sensors added, or None if processing failed
+        :param inputs: Optional, sensors the step reads.  The step is skipped
+            if any of them is not in the data, unless it is required.
+        :param outputs: Optional, sensors the step adds to the data
+        :param required: Optional, always run the step, even if none of its
+            outputs are wanted or some of its inputs are missing.  Default is
+            False.
+        """
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.required = required
+
+    def __repr__(self):
+        return '<ProcessingStep: {:s}>'.format(self.name)
+
+
+class ProcessingPipeline(object):
+    """Dependency ordered processing steps"""
+    def __init__(self, steps, wanted=None):
+        """
+        :param steps: list of ProcessingStep instances
+        :param wanted: Optional, sensor names whose producing steps are run.
+            Default runs all of the steps.
+        """
+        self.steps = list(steps)
+        self._producers = {}
+        for step in self.steps:
+            for output in step.outputs:
+                if output in self._producers:
+                    raise ValueError(
+                        'Sensor {:s} is produced by steps {:s} and {:s}'.format(
+                            output, self._producers[output].name, step.name))
+                self._producers[output] = step
+        self.plan = self._plan(wanted)
+        self.stats = {
+            step.name: {'runs': 0, 'skipped': 0, 'derived': 0,
+                        'seconds': 0.0, 'blocks': 0, 'bytes': 0,
+                        'peak_bytes': 0}
+            for step in self.plan}
+        # the measurements in progress, innermost last, e.g. a derived
+        # sensor calculated while a later step runs
+        self._measuring = []
+
+    def _plan(self, wanted):
+        """Return the steps needed for the `wanted` sensors in dependency
+        order"""
+        if wanted is None:
+            needed = list(self.steps)
+        else:
+            wanted = set(wanted)
+            needed = [
+                step for step in self.steps
+                if step.required or wanted.intersection(step.outputs)]
+
+        plan = []
+        visiting = set()
+
+        def visit(step):
+            if step in plan:
+                return
+            if step in visiting:
+                raise ValueError(
+                    'Processing step {:s} depends on itself'.format(step.name))
+            visiting.add(step)
+            for sensor in step.inputs:
+                producer = self._producers.get(sensor)
+                if producer is not None and producer is not step:
+                    visit(producer)
+            visiting.discard(step)
+            plan.append(step)
+
+        for step in needed:
+            visit(step)
+        return plan
+
+    def run(self, gldata):
+        """Run the planned steps on a GliderData instance
+
+        :param gldata: GliderData instance
+        :return: the processed GliderData instance or None if a step failed
+        """
+        for step in self.plan:
+            stats = self.stats[step.name]
+            if not step.required:
+                missing = [
+                    sensor for sensor in step.inputs
+                    if sensor not in gldata.sensor_names]
+                if missing:
+                    logger.debug('Skipping {:s}, missing sensors {:s}'.format(
+                        step.name, ', '.join(missing)))
+                    stats['skipped'] += 1
+                    continue
+
+            registered = set(gldata.derived_sensors())
+            with self._measure(stats) as seconds:
+                gldata = step.function(gldata)
+            stats['runs'] += 1
+            logger.debug('{:s}: {:0.4f} s'.format(step.name, seconds[0]))
+
+            if gldata is None:
+                logger.warning('Processing step {:s} failed'.format(step.name))
+                return None
+            self._charge_derived(gldata, step, registered)
+        return gldata
+
+    def _charge_derived(self, gldata, step, registered):
+        """Charge the calculation of the derived sensors that `step` added
+        to `gldata`, i.e. those not in `registered`, to the step"""
+        for sensor in gldata.derived_sensors():
+            if sensor in registered:
+                continue
+
+            def charged(function, sensor=sensor):
+                if isinstance(function, _ChargedFunction):
+                    return function
+                return _ChargedFunction(self, step, sensor, function)
+
+            gldata.wrap_derived(sensor, charged)
+
+    @contextlib.contextmanager
+    def _measure(self, stats):
+        """Add the wall time and, while tracemalloc is tracing, the memory
+        blocks allocated in the with block to `stats`, less those of the
+        measurements nested in it, which are charged to their own stats.
+        The peak memory includes the nested measurements.  The with target
+        is a list that holds the seconds of the block when it ends."""
+        tracing = tracemalloc.is_tracing()
+        measurement = {'tracing': tracing, 'seconds': 0.0, 'blocks': 0,
+                       'bytes': 0, 'peak_bytes': 0, 'start_memory': 0}
+        if tracing:
+            for outer in self._measuring:
+                # keep the peak of the outer measurements before it is reset
+                if outer['tracing']:
+                    outer['peak_bytes'] = max(
+                        outer['peak_bytes'],
+                        tracemalloc.get_traced_memory()[1]
+                        - outer['start_memory'])
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            measurement['start_memory'] = tracemalloc.get_traced_memory()[0]
+        self._measuring.append(measurement)
+        seconds = [0.0]
+        t0 = time.perf_counter()
+        try:
+            yield seconds
+        finally:
+            seconds[0] = time.perf_counter() - t0
+            self._measuring.pop()
+            stats['seconds'] += seconds[0] - measurement['seconds']
+            blocks = 0
+            size = 0
+            if tracing:
+                peak_bytes = max(
+                    measurement['peak_bytes'],
+                    tracemalloc.get_traced_memory()[1]
+                    - measurement['start_memory'])
+                differences = tracemalloc.take_snapshot().compare_to(
+                    before, 'filename')
+                blocks = sum(diff.count_diff for diff in differences)
+                size = sum(diff.size_diff for diff in differences)
+                stats['blocks'] += blocks - measurement['blocks']
+                stats['bytes'] += size - measurement['bytes']
+                stats['peak_bytes'] = max(stats['peak_bytes'], peak_bytes)
+            if self._measuring:
+                outer = self._measuring[-1]
+                outer['seconds'] += seconds[0]
+                outer['blocks'] += blocks
+                outer['bytes'] += size
+
+    def report(self):
+        """Return a table of the run count, wall time and memory allocated
+        by each step, including the calculation of the derived sensors it
+        added, and the number of those calculations"""
+        lines = [
+            '{:<24s} {:>5s} {:>7s} {:>7s} {:>10s} {:>10s} {:>10s} '
+            '{:>10s}'.format(
+                'step', 'runs', 'skipped', 'derived', 'seconds', 'blocks',
+                'MB', 'peak MB')]
+        for step in self.plan:
+            stats = self.stats[step.name]
+            lines.append(
+                '{:<24s} {:>5d} {:>7d} {:>7d} {:>10.4f} {:>10d} {:>10.2f} '
+                '{:>10.2f}'.format(
+                    step.name, stats['runs'], stats['skipped'],
+                    stats['derived'], stats['seconds'], stats['blocks'],
+                    stats['bytes'] / 1e6, stats['peak_bytes'] / 1e6))
+        return '\n'.join(lines) + '\n'
+
+
+class _ChargedFunction(object):
+    """Calculation function of a derived sensor that charges its time and
+    memory to the processing step that added the sensor"""
+    def __init__(self, pipeline, step, sensor, function):
+        self.pipeline = pipeline
+        self.step = step
+        self.sensor = sensor
+        self.function = function
+
+    def __call__(self, gldata):
+        stats = self.pipeline.stats[self.step.name]
+        with self.pipeline._measure(stats) as seconds:
+            data = self.function(gldata)
+        stats['derived'] += 1
+        logger.debug('{:s}: {:s} calculated in {:0.4f} s'.format(
+            self.step.name, self.sensor, seconds[0]))
+        return data
@@ -1,24 +1,63 @@
 
 import os
 import logging
-from copy import deepcopy
+import functools
 import gsw
 import ooidac.gps as gps
 import numpy as np
-from ooidac.data_classes import DbaData
-from ooidac.readers.slocum import parse_dba_header
-from ooidac.utilities import fwd_fill
-from ooidac.ctd import calculate_practical_salinity, calculate_density
-from ooidac.processing_dir.fluorometer import flo_bback_total
-from ooidac.processing_dir.oxygen_calculation import calc_o2, do2_SVU
+from ooidac.data_classes import GliderData, DbaData, DeploymentData
+from ooidac.readers.segment_cache import parse_data_file_header
+from ooidac.utilities import fwd_fill, TimeInterpolator
+from ooidac.ctd import CTD_PRODUCTS, calculate_ctd_products
+from ooidac.processing_dir.fluorometer import (
+    flo_bback_total, flo_zhang_scatter_table)
+from ooidac.processing_dir.oxygen_calculation import (
+    calc_o2, do2_SVU, oxygen_l1_l2)
 from ooidac.constants import (
     SLOCUM_TIMESTAMP_SENSORS,
     SLOCUM_PRESSURE_SENSORS,
-    SLOCUM_DEPTH_SENSORS)
-from configuration import DATA_CONFIG_LIST
+    SLOCUM_DEPTH_SENSORS,
+    SLOCUM_TEMPERATURE_SENSORS,
+    SLOCUM_SALINITY_SENSORS,
+    DAV_SENSORS,
+    PROCESSING_SENSORS)
+from configuration import DATA_CONFIG_LIST, REQUIRED_SENSORS
 
 logger = logging.getLogger(os.path.basename(__name__))
 
+# Number of backscatter samples from which the seawater scattering is
+# interpolated from the (temperature, salinity) lookup table of
+# flo_zhang_scatter_table instead of calculated for every sample.  The table
+# is built once per process, at about the cost of calculating 500000 samples.
+BACKSCATTER_TABLE_MIN_SAMPLES = 50000
+
+
+def processing_sensor_list(nc_sensor_defs=None):
+    """Returns the list of native glider sensors needed to process a data
+    file, for use as the sensor whitelist when parsing.  This is the union of
+    the REQUIRED_SENSORS and DATA_CONFIG_LIST configuration lists, the
+    time/pressure/depth/CTD sensors that can be auto-chosen, the depth
+    averaged velocity sensors, the sensors read by the processing steps and
+    any sensor mapped to a NetCDF variable in `nc_sensor_defs`.
+
+    :param nc_sensor_defs: Optional, sensor definitions dictionary keyed by
+        glider sensor name, e.g. NetCDFWriter.nc_sensor_defs
+    :return: sorted list of sensor names
+    """
+    sensors = set(REQUIRED_SENSORS)
+    sensors.update(DATA_CONFIG_LIST)
+    sensors.update(SLOCUM_TIMESTAMP_SENSORS)
+    sensors.update(SLOCUM_PRESSURE_SENSORS)
+    sensors.update(SLOCUM_DEPTH_SENSORS)
+    sensors.update(SLOCUM_TEMPERATURE_SENSORS)
+    sensors.update(SLOCUM_SALINITY_SENSORS)
+    sensors.update(PROCESSING_SENSORS)
+    for vx, vy in DAV_SENSORS:
+        sensors.update([vx, vy])
+    if nc_sensor_defs:
+        sensors.update(nc_sensor_defs.keys())
+    return sorted(sensors)
+
 
 def create_llat_sensors(
         dba, timesensor=None, pressuresensor=None,
@@ -106,7 +145,7 @@ def select_time_sensor(dba, timesensor=None):
     if not timesensor:
         return
 
-    time_sensor = deepcopy(dba[timesensor])
+    time_sensor = dba[timesensor]
     if not time_sensor:
         return
     time_sensor['sensor_name'] = 'llat_time'
@@ -142,7 +181,7 @@ def select_pressure_sensor(dba, pressuresensor=None):
     if not pressuresensor:
         return
 
-    pressure_sensor = deepcopy(dba[pressuresensor])
+    pressure_sensor = dba[pressuresensor]
     if not pressure_sensor:
         return
     pressure_sensor['sensor_name'] = 'llat_pressure'
@@ -178,7 +217,7 @@ def select_depth_sensor(dba, depthsensor=None):
     if not depthsensor:
         return
 
-    depth_sensor = deepcopy(dba[depthsensor])
+    depth_sensor = dba[depthsensor]
     if not depth_sensor:
         return
     depth_sensor['sensor_name'] = 'llat_depth'
@@ -192,33 +231,35 @@ def select_depth_sensor(dba, depthsensor=None):
 
 
 def lat_and_lon_coordinates(dba, time_sensor):
-    # Convert m_gps_lat to decimal degrees and create the new sensor
-    # definition
-    lat_sensor = deepcopy(dba['m_gps_lat'])
+    # Create the new sensor definitions
+    lat_sensor = dba['m_gps_lat']
     lat_sensor['sensor_name'] = 'llat_latitude'
     lat_sensor['attrs']['source_sensor'] = u'm_gps_lat'
 
-    # Skip default values (69696969)
-    # ToDo: fix this so it doesn't print a warning
-    lat_sensor['data'][lat_sensor['data'] > 9000.0] = np.nan
-    lat_sensor['data'] = gps.iso2deg(lat_sensor['data'])
-
-    # Convert m_gps_lon to decimal degrees and create the new sensor
-    # definition
-    lon_sensor = deepcopy(dba['m_gps_lon'])
+    lon_sensor = dba['m_gps_lon']
     lon_sensor['sensor_name'] = 'llat_longitude'
     lon_sensor['attrs']['source_sensor'] = u'm_gps_lon'
 
-    # Skip default values (69696969)
-    # ToDo: fix this so it doesn't print a warning
-    lon_sensor['data'][lon_sensor['data'] > 18000] = np.nan
-    lon_sensor['data'] = gps.iso2deg(lon_sensor['data'])
+    # Use only the rows of the GPS fixes, from the stored finite rows of
+    # m_gps_lat/lon, and skip default values (69696969)
+    lat_ii, lat = dba.getfinite('m_gps_lat')
+    lon_ii, lon = dba.getfinite('m_gps_lon')
+    fix_ii, lat_fix, lon_fix = np.intersect1d(
+        lat_ii, lon_ii, assume_unique=True, return_indices=True)
+    lat = lat[lat_fix]
+    lon = lon[lon_fix]
+    valid = (lat <= 9000.0) & (lon <= 18000)
+    fix_ii = fix_ii[valid]
+
+    # Convert m_gps_lat/lon to decimal degrees
+    lat = gps.iso2deg(lat[valid])
+    lon = gps.iso2deg(lon[valid])
 
     logging.info('Filling lat and lon coordinates by interpolation '
                  'between GPS fixes')
     # Interpolate llat_latitude and llat_longitude
     lat_sensor['data'], lon_sensor['data'] = gps.interpolate_gps(
-        time_sensor['data'], lat_sensor['data'], lon_sensor['data']
+        time_sensor['data'], lat, lon, fix_indices=fix_ii
     )
     lat_sensor['attrs']['comment'] = (
         u'm_gps_lat converted to decimal degrees and interpolated'
@@ -249,43 +290,57 @@ def _autochoose(dba, sensorlist, sensortype):
 
 def pitch_and_roll(dba, fill='fwd fill'):
     """adds new sensors `pitch` and `roll` to a GliderData instance from
-    `m_pitch` and `m_roll` converted to degrees from radians.
+    `m_pitch` and `m_roll` converted to degrees from radians.  They are
+    added as derived sensors, calculated when their data is first used.
 
     :param dba:  A GliderData or DbaData instance
     :param fill:
     :return: dba:  The same GliderData instance with `pitch` and `roll` added
     """
     if fill == 'fwd fill':
-        fill_function = fwd_fill
+        def fill_function(gldata, param):
+            return fwd_fill(param)
     elif fill == 'interp':
-        def fill_function(param):
-            filled_param = np.interp(
-                dba.ts, dba.ts[np.isfinite(param)], param[np.isfinite(param)])
-            return filled_param
+        def fill_function(gldata, param):
+            return TimeInterpolator(gldata.ts, gldata.ts).resample(param)
     else:
-        def fill_function(param):
+        def fill_function(gldata, param):
             return param
 
     pitch = dba['m_pitch']
+    pitch.pop('data')
     pitch['sensor_name'] = 'pitch'
     pitch['attrs']['units'] = 'degrees'
     pitch['attrs']['comment'] = (
         'm_pitch converted to degrees and forward filled')
-    pitch['data'] = fill_function(np.degrees(pitch['data']))
+    dba.add_derived(
+        pitch,
+        lambda gldata: fill_function(
+            gldata, np.degrees(gldata.getdata('m_pitch'))),
+        ['m_pitch'])
 
     roll = dba['m_roll']
+    roll.pop('data')
     roll['sensor_name'] = 'roll'
     roll['attrs']['units'] = 'degrees'
     roll['attrs']['comments'] = (
         'm_roll converted to degrees and forward filled')
-    roll['data'] = fwd_fill(np.degrees(roll['data']))
-
-    dba.add_data(pitch)
-    dba.add_data(roll)
+    dba.add_derived(
+        roll,
+        lambda gldata: fwd_fill(np.degrees(gldata.getdata('m_roll'))),
+        ['m_roll'])
 
     return dba
 
 
+# attributes of the CTD products that are not set by the netCDF writer
+CTD_PRODUCT_ATTRS = {
+    'absolute_salinity': {'units': 'g kg-1'},
+    'conservative_temperature': {'units': 'degree_Celsius'},
+    'potential_density': {'units': 'kg m-3'},
+    'sound_speed': {'units': 'm s-1'}}
+
+
 # TODO: Build a sensor defs (or separate attributes classes) that clearly
 #  read in the JSON definitions files and can use those rather than a murky
 #  singular ncw class.  Then that can be passed to this function.
@@ -316,49 +371,98 @@ def ctd_data(dba, ctd_sensors):
             )
             return
 
-    # Calculate mean llat_latitude and mean llat_longitude
-    mean_lat = np.nanmean(lat['data'])
-    mean_lon = np.nanmean(lon['data'])
-
-    # Calculate practical salinity
-    prac_sal = calculate_practical_salinity(
-        cond['data'], temp['data'], pres['data'])
-    # Add salinity to the dba
-    dba['salinity'] = {
-        'sensor_name': 'salinity',
-        'attrs': {},  # these get filled in later by the netCDF writer
-        'data': prac_sal
-    }
-
-    # Calculate density
-    density = calculate_density(
-        temp['data'], pres['data'], prac_sal, mean_lat, mean_lon)
-    # Add density to the dba
-    dba['density'] = {
-        'sensor_name': 'density',
-        'attrs': {},  # these get filled in later by the netCDF writer
-        'data': density
-    }
+    temp_sensor = temp['sensor_name']
+    cond_sensor = cond['sensor_name']
+
+    # Add the CTD products to the dba as derived sensors, all calculated
+    # and stored together when the data of one of them is first used.  The
+    # attributes of salinity and density get filled in later by the netCDF
+    # writer
+    inputs = [
+        cond_sensor, temp_sensor, 'llat_pressure', 'llat_latitude',
+        'llat_longitude']
+    for product in CTD_PRODUCTS:
+        dba.add_derived(
+            {'sensor_name': product,
+             'attrs': dict(CTD_PRODUCT_ATTRS.get(product, {}))},
+            functools.partial(_ctd_products_data, product=product,
+                              inputs=inputs),
+            inputs)
     return dba
 
 
+def _ctd_products_data(gldata, product, inputs):
+    """Calculate all of the CTD products of a GliderData instance with
+    ctd.calculate_ctd_products, using the mean llat_latitude and mean
+    llat_longitude, store the other products as calculated derived sensors
+    and return the data of `product`"""
+    cond, temp, pres, lat, lon = [
+        gldata.getdata(sensor) for sensor in inputs]
+    products = calculate_ctd_products(
+        cond, temp, pres, np.nanmean(lat), np.nanmean(lon))
+    for other in CTD_PRODUCTS:
+        if other != product:
+            gldata.set_derived_data(other, products[other])
+    return products[product]
+
+
 class CTDprocessingError(Exception):
     pass
 
 
-def get_u_and_v(dba, check_files=None):
+def get_u_and_v(dba, check_files=None, catalog=None):
+    """Return the depth averaged velocities `u` and `v` of a data file.
+
+    :param dba: DbaData instance, or a DeploymentData instance to get the
+        velocities of all its data files
+    :param check_files: Optional, the next 2 data files to look for
+        m_final_water_vx/vy in.  Not used for a DeploymentData instance,
+        whose following data files are used instead.
+    :param catalog: Optional DeploymentCatalog of the check_files
+    :return: u, v data particle dictionaries, or lists of u and v for each
+        data file of a DeploymentData instance
+    """
+    if isinstance(dba, DeploymentData):
+        return _get_deployment_uv(dba)
     if (
             dba.file_metadata['filename_extension'] == 'dbd'
             and check_files
             and 'm_final_water_vx' in dba.sensor_names
     ):
-        vx, vy = _get_final_uv(dba, check_files)
+        vx, vy = _get_final_uv(dba, check_files, catalog)
     else:
         vx, vy = _get_initial_uv(dba)
 
     return vx, vy
 
 
+def _get_deployment_uv(deployment):
+    """return lists of `u` and `v` for each data file of a DeploymentData
+    instance, with m_final_water_vx/vy taken from the next 2 data files of
+    the deployment"""
+    u_list = []
+    v_list = []
+    for ii in range(deployment.num_segments):
+        segment = deployment.segment(ii)
+        next_segments = [
+            deployment.segment(jj) for jj in range(
+                ii + 1, min(ii + 3, deployment.num_segments))]
+        if (
+                segment.file_metadata['filename_extension'] == 'dbd'
+                and next_segments
+                and 'm_final_water_vx' in segment.sensor_names
+                and np.any(np.isfinite(
+                    segment.getdata('m_final_water_vx')))
+        ):
+            vx, vy = _get_final_uv(segment, next_segments)
+        else:
+            vx, vy = _get_initial_uv(segment)
+        u_list.append(vx)
+        v_list.append(vy)
+
+    return u_list, v_list
+
+
 # ToDo: make these return an array instead?
 
 
@@ -368,12 +472,16 @@ def _get_initial_uv(dba):
     :param dba:
     :return:
     """
-    if 'm_initial_water_vx' in dba.sensor_names:
-        vx_sensor = 'm_initial_water_vx'
-        vy_sensor = 'm_initial_water_vy'
-    elif 'm_water_vx' in dba.sensor_names:
-        vx_sensor = 'm_water_vx'
-        vy_sensor = 'm_water_vy'
+    # a sensor of a DeploymentData segment may be all NaN if it is only in
+    # the other data files
+    for vx_sensor, vy_sensor in [
+            ('m_initial_water_vx', 'm_initial_water_vy'),
+            ('m_water_vx', 'm_water_vy')]:
+        if (
+                vx_sensor in dba.sensor_names
+                and np.any(np.isfinite(dba.getdata(vx_sensor)))
+        ):
+            break
     else:
         return None, None
     logger.debug('Attempting to get u & v from {:s}/vy'.format(vx_sensor))
@@ -395,7 +503,7 @@ def _get_initial_uv(dba):
     return vx, vy
 
 
-def _get_final_uv(dba, check_files):
+def _get_final_uv(dba, check_files, catalog=None):
     """return Eastward velocity `u` and Northward velocity `v` from looking
     ahead of the main glider data file into the next 2 data files given in
     the `check_files` list to retrieve `u` and `v` from the
@@ -403,7 +511,10 @@ def _get_final_uv(dba, check_files):
 
     :param dba:
     :param check_files: sorted list of the next 2 sorted data files following
-        the file being processed from the script input list.
+        the file being processed from the script input list, or of the next
+        2 data files as GliderData instances, e.g. DeploymentData segments
+    :param catalog: Optional DeploymentCatalog of the check_files to look up
+        their headers without opening the files
     :return: u, v; Eastward velocity and Northward velocity in m/s as data
         particle dictionaries with metadata attributes
     """
@@ -422,11 +533,21 @@ def _get_final_uv(dba, check_files):
 
     # check that check_files are in the same mission and next 2 segments
     for next_dba_file in check_files:
+        next_dba = None
+        if isinstance(next_dba_file, GliderData):
+            next_dba = next_dba_file
+            next_dba_file = next_dba.source_file
         logger.debug(
             "Attempting to find final vx & vy in the next data file"
             "\n\t{:s}".format(next_dba_file)
         )
-        header = parse_dba_header(next_dba_file)
+        header = None
+        if next_dba is not None:
+            header = next_dba.file_metadata
+        elif catalog is not None:
+            header = catalog.header(next_dba_file)
+        if header is None:
+            header = parse_data_file_header(next_dba_file)
         nxt_mis_num = int(header['the8x3_filename'][:4])
         nxt_seg_num = int(header['the8x3_filename'][4:])
         if (nxt_mis_num != mis_num or not (
@@ -437,9 +558,12 @@ def _get_final_uv(dba, check_files):
                 'next 2 segments'.format(next_dba_file)
             )
             continue
-        next_dba = DbaData(next_dba_file)
         if next_dba is None:
-            continue
+            next_dba = DbaData(
+                next_dba_file, sensors=[
+                    'm_present_time', 'm_depth',
+                    'm_final_water_vx', 'm_final_water_vy'],
+                compact=dba.compact)
         if 'm_final_water_vx' not in next_dba.sensor_names:
             continue
 
@@ -484,7 +608,7 @@ def get_segment_time_and_pos(dba):
     # coordinates for the depth averaged velocities
 
     a = dba.ts is None
-    b = dba.underwater_indices is None or len(dba.underwater_indices) == 0
+    b = dba.dive_runs is None or dba.dive_runs.num_dives == 0
     c = 'llat_latitude' not in dba.sensor_names
     d = 'llat_longitude' not in dba.sensor_names
     if a or b or c or d:
@@ -493,8 +617,8 @@ def get_segment_time_and_pos(dba):
     # ToDo: dba.ts has to be m_present_time for this, should I enforce this
     #  earlier, or pair dba.timesensor with it and if it is not dba.ts,
     #  then grab m_present_time, or just grab it here regardless?
-    uw_start_time = dba.ts[dba.underwater_indices[0]]
-    uw_end_time = dba.ts[dba.underwater_indices[-1]]
+    uw_start_time = dba.ts[dba.dive_runs.first_underwater_row]
+    uw_end_time = dba.ts[dba.dive_runs.last_underwater_row]
 
     # borrow the sensor `llat_time`s attributes but change the data
     # to be the calculated scalar mean segment time value
@@ -531,14 +655,30 @@ def get_segment_time_and_pos(dba):
 
 
 def backscatter_total(gldata):
-    """
+    """Adds the total backscatter `backscatter` calculated from
+    `sci_flbbcd_bb_units` as a derived sensor, calculated when its data is
+    first used.  From BACKSCATTER_TABLE_MIN_SAMPLES samples the seawater
+    scattering is interpolated from a lookup table, see
+    fluorometer.ZhangScatterTable for its error bound.
 
-    :param gldata:
-    :return:
+    :param gldata: GliderData instance
+    :return: The GliderData instance with `backscatter` added
     """
     backscatter_particle = gldata['sci_flbbcd_bb_units']
-    beta = backscatter_particle['data'].copy()
-    backscatter_particle['data'] = np.full(len(beta), np.nan)
+    backscatter_particle.pop('data')
+    backscatter_particle['sensor_name'] = 'backscatter'
+    backscatter_particle['attrs']['units'] = 'm-1'
+
+    gldata.add_derived(
+        backscatter_particle, _backscatter_total_data,
+        ['sci_flbbcd_bb_units', 'm_present_time', 'sci_water_temp',
+         'salinity'])
+    return gldata
+
+
+def _backscatter_total_data(gldata):
+    beta = gldata.getdata('sci_flbbcd_bb_units')
+    backscatter = np.full(len(beta), np.nan)
     beta_ii = np.isfinite(beta)
     timestamps = gldata.getdata('m_present_time')
     beta_ts = timestamps[beta_ii]
@@ -546,23 +686,22 @@ def backscatter_total(gldata):
     temp = gldata.getdata('sci_water_temp')
     salt = gldata.getdata('salinity')
 
-    temp_bt = np.interp(
-        beta_ts, timestamps[np.isfinite(temp)], temp[np.isfinite(temp)])
-    salt_bt = np.interp(
-        beta_ts, timestamps[np.isfinite(salt)], salt[np.isfinite(salt)])
+    temp_bt, salt_bt = TimeInterpolator(timestamps, beta_ts).resample(
+        temp, salt)
 
     theta = 124.0
     wlngth = 700.0
     xfactor = 1.076
 
-    bback = flo_bback_total(beta, temp_bt, salt_bt, theta, wlngth, xfactor)
+    scatter_table = None
+    if len(beta) >= BACKSCATTER_TABLE_MIN_SAMPLES:
+        scatter_table = flo_zhang_scatter_table(theta, wlngth)
 
-    backscatter_particle['data'][beta_ii] = bback
-    backscatter_particle['sensor_name'] = 'backscatter'
-    backscatter_particle['attrs']['units'] = 'm-1'
+    bback = flo_bback_total(beta, temp_bt, salt_bt, theta, wlngth, xfactor,
+                            scatter_table=scatter_table)
 
-    gldata.add_data(backscatter_particle)
-    return gldata
+    backscatter[beta_ii] = bback
+    return backscatter
 
 
 def reduce_to_sci_data(gldata):
@@ -587,8 +726,7 @@ def all_sci_indices(gldata):
     """
     sci_indices = np.array([], dtype=np.int64)
     for sci_sensor in DATA_CONFIG_LIST:
-        sci_data = gldata.getdata(sci_sensor)
-        sci_ii = np.flatnonzero(np.isfinite(sci_data))
+        sci_ii = gldata.finite_indices(sci_sensor)
         sci_indices = np.union1d(sci_indices, sci_ii)
     return sci_indices
 
@@ -637,7 +775,7 @@ def recalc_chlor(dba, dark_offset, scale_factor):
             "sci_flbbcd_chlor_sig is not present to recalculate chlorophyll")
         return None
     chlor_sig = dba.getdata('sci_flbbcd_chlor_sig')
-    chlor_units = deepcopy(dba['sci_flbbcd_chlor_units'])
+    chlor_units = dba['sci_flbbcd_chlor_units']
     new_chlor = scale_factor * (chlor_sig - dark_offset)
     chlor_units['data'] = new_chlor
     chlor_units['attrs']['comment'] = (
@@ -665,8 +803,8 @@ def recalc_par(dba, sensor_dark, scale_factor):
         return None
     par_volts = dba.getdata('sci_bsipar_sensor_volts')
     # remove the initialization where sensor volts == 0.0
-    par_volts[par_volts == 0.0] = np.nan
-    par_units = deepcopy(dba['sci_bsipar_par'])
+    par_volts = np.where(par_volts == 0.0, np.nan, par_volts)
+    par_units = dba['sci_bsipar_par']
     new_par = (par_volts - sensor_dark) / scale_factor
     par_units['data'] = new_par
     par_units['attrs']['comment'] = (
@@ -696,8 +834,8 @@ def check_and_recalc_o2(dba, calc_type, cal_dict):
     calphase = dba.getdata('sci_oxy4_calphase')
     oxytemp = dba.getdata('sci_oxy4_temp')
     bads = calphase == 0.0
-    calphase[bads] = np.nan
-    oxytemp[bads] = np.nan
+    calphase = np.where(bads, np.nan, calphase)
+    oxytemp = np.where(bads, np.nan, oxytemp)
     if calc_type == 'SVU':
         csv = cal_dict['SVUFoilCoef']
         conc_coef = cal_dict['ConcCoef']
@@ -715,7 +853,7 @@ def check_and_recalc_o2(dba, calc_type, cal_dict):
             "section in sensor_defs.json")
         return None
 
-    oxy_units = deepcopy(dba['sci_oxy4_oxygen'])
+    oxy_units = dba['sci_oxy4_oxygen']
     oxy_units['data'] = new_oxy
     oxy_units['attrs']['comment'] = (
         "Oxygen recalculated from signal using calibration parameters")
@@ -733,8 +871,33 @@ def o2_s_and_p_comp(dba, o2sensor='sci_oxy4_oxygen'):
         )
         return dba
 
+    # the compensated oxygen is added as a derived sensor, calculated when
+    # its data is first used
     oxygen = dba[o2sensor]
-    oxy = oxygen['data'].copy()
+    oxygen.pop('data')
+    oxygen['sensor_name'] = 'oxygen'
+    oxygen['attrs']['units'] = "umol kg-1"
+    if 'comment' in oxygen['attrs']:
+        comment = oxygen['attrs']['comment'] + "; "
+    else:
+        comment = ''
+    oxygen['attrs']['comment'] = comment + (
+        "Oxygen concentration has been compensated for salinity and "
+        "pressure, but has not been corrected for the depth offset "
+        "due to pitch of the glider and sensor offset from the CTD.")
+    inputs = [o2sensor, 'sci_m_present_time', 'salinity', 'llat_pressure',
+              'sci_water_temp', 'llat_longitude', 'llat_latitude']
+    if 'potential_density' in dba.sensor_names:
+        inputs.append('potential_density')
+    dba.add_derived(
+        oxygen, lambda gldata: _o2_s_and_p_comp_data(gldata, o2sensor),
+        inputs)
+
+    return dba
+
+
+def _o2_s_and_p_comp_data(dba, o2sensor):
+    oxy = dba.getdata(o2sensor)
     timestamps = dba.getdata('sci_m_present_time')
     sp = dba.getdata('salinity')
     p = dba.getdata('llat_pressure')
@@ -744,17 +907,21 @@ def o2_s_and_p_comp(dba, o2sensor='sci_oxy4_oxygen'):
     oxy = oxy[oxy_ii]
     oxy_ts = timestamps[oxy_ii]
 
-    sp = np.interp(oxy_ts, timestamps[np.isfinite(sp)], sp[np.isfinite(sp)])
-    p = np.interp(oxy_ts, timestamps[np.isfinite(p)], p[np.isfinite(p)])
-    t = np.interp(oxy_ts, timestamps[np.isfinite(t)], t[np.isfinite(t)])
+    interpolator = TimeInterpolator(timestamps, oxy_ts)
+    sp, p, t = interpolator.resample(sp, p, t)
 
-    lon = dba.getdata('llat_longitude')[oxy_ii]  # should already be interp'ed
-    lat = dba.getdata('llat_latitude')[oxy_ii]
+    if 'potential_density' in dba.sensor_names:
+        # potential density of the CTD products
+        pdens = interpolator.resample(dba.getdata('potential_density'))
+    else:
+        # should already be interp'ed
+        lon = dba.getdata('llat_longitude')[oxy_ii]
+        lat = dba.getdata('llat_latitude')[oxy_ii]
 
-    # density calculation from GSW toolbox
-    sa = gsw.SA_from_SP(sp, p, lon, lat)
-    ct = gsw.CT_from_t(sa, t, p)
-    pdens = gsw.rho(sa, ct, 0.0)  # potential referenced to p=0
+        # density calculation from GSW toolbox
+        sa = gsw.SA_from_SP(sp, p, lon, lat)
+        ct = gsw.CT_from_t(sa, t, p)
+        pdens = gsw.rho(sa, ct, 0.0)  # potential referenced to p=0
 
     # Convert from volume to mass units:
     do = 1000*oxy/pdens
@@ -773,20 +940,75 @@ def o2_s_and_p_comp(dba, o2sensor='sci_oxy4_oxygen'):
     bts = b0 + b1*ts + b2*ts**2 + b3*ts**3
     do = np.exp((sp-s0)*bts + c0*(sp**2-s0**2)) * do
 
+    oxygen = np.full(len(oxy_ii), np.nan)
+    oxygen[oxy_ii] = do
+    return oxygen
+
+
+def oxygen_product(dba, calc_type, cal_dict):
+    """Recalculates oxygen from calphase and the optode temperature and
+    compensates it for salinity and pressure in one pass, adding
+    `corrected_oxygen` (L1, umol/L) and `oxygen` (L2, umol/kg) to the data.
+    This gives the same result as `check_and_recalc_o2` followed by
+    `o2_s_and_p_comp(dba, 'corrected_oxygen')`, but the calculation is only
+    done at the optode samples (see oxygen_calculation.oxygen_l1_l2).
+
+    :param dba: GliderData instance
+    :param calc_type: 'SVU' or 'MkII' optode calculation
+    :param cal_dict: optode calibration coefficients
+    :return: The GliderData instance with the new parameters added
+    """
+    if 'sci_oxy4_calphase' not in dba.sensor_names:
+        logger.warning(
+            "sci_oxy4_calphase is not present to recalculate oxygen")
+        return None
+    if calc_type not in ('SVU', 'MkII'):
+        logger.warning(
+            "No oxygen calculation type configured for re-calculation.  Add "
+            "'calculation_type': 'SVU' or 'MkII' to the 'corrected_oxy' "
+            "section in sensor_defs.json")
+        return None
+
+    calphase = dba.getdata('sci_oxy4_calphase')
+    oxytemp = dba.getdata('sci_oxy4_temp')
+    oxy_ii = np.flatnonzero(
+        np.isfinite(calphase) & np.isfinite(oxytemp) & (calphase != 0.0))
+    timestamps = dba.getdata('sci_m_present_time')
+    interpolator = TimeInterpolator(timestamps, timestamps[oxy_ii])
+    sp, p, t = interpolator.resample(
+        dba.getdata('salinity'), dba.getdata('llat_pressure'),
+        dba.getdata('sci_water_temp'))
+    # use the potential density of the CTD products if they were calculated
+    pdens = None
+    if 'potential_density' in dba.sensor_names:
+        pdens = interpolator.resample(dba.getdata('potential_density'))
+    l1, l2 = oxygen_l1_l2(
+        calphase[oxy_ii], oxytemp[oxy_ii], sp, p, t,
+        dba.getdata('llat_latitude')[oxy_ii],
+        dba.getdata('llat_longitude')[oxy_ii], calc_type, cal_dict,
+        pdens=pdens)
+
+    oxy_units = dba['sci_oxy4_oxygen']
+    oxy_units['data'] = np.full(dba.N, np.nan)
+    oxy_units['data'][oxy_ii] = l1
+    oxy_units['attrs']['comment'] = (
+        "Oxygen recalculated from signal using calibration parameters")
+    oxy_units['sensor_name'] = "corrected_oxygen"
+    oxy_units['attrs']['source_sensor'] = "sci_oxy4_calphase, sci_oxy4_temp"
+
+    oxygen = dba['sci_oxy4_oxygen']
+    oxygen['attrs'] = oxy_units['attrs'].copy()
+    oxygen['data'] = np.full(dba.N, np.nan)
+    oxygen['data'][oxy_ii] = l2
     oxygen['sensor_name'] = 'oxygen'
-    oxygen['data'] = np.full(len(oxy_ii), np.nan)
-    oxygen['data'][oxy_ii] = do
     oxygen['attrs']['units'] = "umol kg-1"
-    if 'comment' in oxygen['attrs']:
-        comment = oxygen['attrs']['comment'] + "; "
-    else:
-        comment = ''
-    oxygen['attrs']['comment'] = comment + (
+    oxygen['attrs']['comment'] += "; " + (
         "Oxygen concentration has been compensated for salinity and "
         "pressure, but has not been corrected for the depth offset "
         "due to pitch of the glider and sensor offset from the CTD.")
-    dba.add_data(oxygen)
 
+    dba.add_data(oxy_units)
+    dba.add_data(oxygen)
     return dba
 
 
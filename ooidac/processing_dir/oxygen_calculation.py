@@ -613,3 +613,191 @@ def do2_salinity_correction(DO, P, T, SP, lat, lon, pref=0):
     Bts = B0 + B1*ts + B2*ts**2 + B3*ts**3
     DO = np.exp((SP-S0)*Bts + C0*(SP**2-S0**2)) * DO
     return DO
+
+
+def oxygen_l1_l2(calphase, temp, SP, P, T, lat, lon, calc_type, cal_dict,
+                 chunk_size=65536, pdens=None):
+    """
+    Calculates the uncorrected (L1) and the salinity and pressure corrected
+    (L2) oxygen concentrations from Aanderaa 4831 optode calphase and
+    temperature in one pass.  This is the same calculation as `do2_SVU` (or
+    `calc_o2`) followed by `do2_salinity_correction`, but the arrays are
+    processed in chunks of `chunk_size` samples with the intermediate
+    results written into buffers allocated once, instead of a dozen full
+    length temporary arrays for every step.
+
+    Usage
+    -----
+    l1, l2 = oxygen_l1_l2(
+        calphase, temp, SP, P, T, lat, lon, 'SVU',
+        {'SVUFoilCoef': csv, 'ConcCoef': conc_coef})
+
+    Parameters
+    ----------
+    calphase : Calibrated_phase, Array. [deg]
+        Optode raw data output parameter CALPHASE
+    temp : Temperature, Array. [deg C]
+        Optode thermistor TEMPERATURE measured near the foil
+    SP : Practical salinity, Array.  Interpolated to the optode samples.
+    P : Water pressure, Array. [dbar]  Interpolated to the optode samples.
+    T : Water temperature, Array. [deg C]  Interpolated to the optode
+        samples.
+    lat, lon : Latitude and longitude, Arrays. [degrees]
+    calc_type : 'SVU' or 'MkII', the optode calculation to use
+    cal_dict : Calibration coefficients dictionary.  'SVUFoilCoef' and
+        'ConcCoef' for SVU; 'C', 'FoilPolyDegT', 'FoilPolyDegO' and
+        'ConcCoef' for MkII.
+    chunk_size : Number of samples processed at a time, optional.
+    pdens : Potential density referenced to 0 dbar, Array, optional.
+        [kg/m^3]  Interpolated to the optode samples, e.g. from the
+        potential density of the CTD data.  Calculated from SP, P, T, lat
+        and lon when not given, in which case lat and lon are not used.
+
+    Returns
+    -------
+    A tuple of l1 and l2.
+
+    l1 : Oxygen concentration, Array. [micro-moles/L]
+        O2 concentration uncorrected for salinity and pressure, DOCONCS_L1
+    l2 : Oxygen concentration, Array. [micro-moles/kg]
+        O2 concentration corrected for salinity and pressure, DOXYGEN_L2
+    """
+    if calc_type not in ('SVU', 'MkII'):
+        raise ValueError(
+            "Unknown oxygen calculation type {}".format(calc_type))
+    calphase, temp, SP, P, T = (
+        np.asarray(arr, dtype=np.float64)
+        for arr in (calphase, temp, SP, P, T))
+    if pdens is None:
+        lat, lon = (np.asarray(arr, dtype=np.float64) for arr in (lat, lon))
+    else:
+        pdens = np.asarray(pdens, dtype=np.float64)
+    num_samples = len(calphase)
+    l1 = np.empty(num_samples)
+    l2 = np.empty(num_samples)
+    size = min(chunk_size, num_samples)
+    buffers = [np.empty(size) for _ in range(3)]
+    for start in range(0, num_samples, chunk_size):
+        chunk = slice(start, min(start + chunk_size, num_samples))
+        work = [buf[:chunk.stop - start] for buf in buffers]
+        if calc_type == 'SVU':
+            _svu_chunk(calphase[chunk], temp[chunk], cal_dict, l1[chunk],
+                       work)
+        else:
+            _mkii_chunk(calphase[chunk], temp[chunk], cal_dict, l1[chunk],
+                        work)
+        if pdens is None:
+            SA = gsw.SA_from_SP(SP[chunk], P[chunk], lon[chunk], lat[chunk])
+            pdens_chunk = gsw.rho(
+                SA, gsw.CT_from_t(SA, T[chunk], P[chunk]), 0)
+        else:
+            pdens_chunk = pdens[chunk]
+        _salinity_correction_chunk(
+            l1[chunk], P[chunk], T[chunk], SP[chunk], pdens_chunk, l2[chunk],
+            work)
+    return l1, l2
+
+
+def _svu_chunk(cph, tmp, cal_dict, out, work):
+    """do2_SVU with an optode salinity setting of 0, written into `out`"""
+    csv = np.ravel(cal_dict['SVUFoilCoef'])
+    conc_coef = np.ravel(cal_dict['ConcCoef'])
+    ksv, p0, buf = work
+    # Ksv = csv[0] + csv[1]*temp + csv[2]*(temp**2)
+    np.multiply(tmp, csv[1], out=ksv)
+    ksv += csv[0]
+    np.square(tmp, out=buf)
+    buf *= csv[2]
+    ksv += buf
+    # P0 = csv[3] + csv[4]*temp,  Pc = csv[5] + csv[6]*calphase
+    np.multiply(tmp, csv[4], out=p0)
+    p0 += csv[3]
+    np.multiply(cph, csv[6], out=buf)
+    buf += csv[5]
+    # DO = ((P0/Pc) - 1) / Ksv, the solubility factor is 1 for salinity 0
+    np.divide(p0, buf, out=out)
+    out -= 1
+    out /= ksv
+    out *= conc_coef[1]
+    out += conc_coef[0]
+
+
+def _mkii_chunk(cph, tmp, cal_dict, out, work):
+    """calc_o2 with an optode salinity setting of 0, written into `out`"""
+    C = np.ravel(cal_dict['C'])
+    M = np.ravel(cal_dict['FoilPolyDegT'])
+    N = np.ravel(cal_dict['FoilPolyDegO'])
+    cc = np.ravel(cal_dict['ConcCoef'])
+    partialpress, ts, buf = work
+    partialpress[:] = 0
+    for ii in range(len(C)):
+        np.power(tmp, M[ii], out=buf)
+        buf *= C[ii]
+        np.power(cph, N[ii], out=ts)
+        buf *= ts
+        partialpress += buf
+    # vapor pressure, buf = exp(52.57 - 6690.9/tk - 4.6810*log(tk))
+    np.add(tmp, KELVIN_OFFSET, out=ts)
+    np.divide(6690.9, ts, out=buf)
+    np.log(ts, out=ts)
+    ts *= 4.6810
+    np.subtract(52.57, buf, out=buf)
+    buf -= ts
+    np.exp(buf, out=buf)
+    # air saturation = partialpress*100 / ((NomAirPress - pvapor)*NomAirMix)
+    np.subtract(1013.25, buf, out=buf)
+    buf *= 0.20946
+    partialpress *= 100.
+    partialpress /= buf
+    # oxygen solubility from the scaled temperature
+    _scaled_temperature(tmp, ts, buf)
+    A = [2.00856, 3.22400, 3.99063, 4.80299, 9.78188e-1, 1.71069]
+    np.multiply(ts, A[5], out=out)
+    for coef in A[4:0:-1]:
+        out += coef
+        out *= ts
+    out += A[0]
+    np.exp(out, out=out)
+    out *= 44.659
+    out *= partialpress
+    out /= 100.
+    out *= cc[1]
+    out += cc[0]
+
+
+def _scaled_temperature(temp, out, buf):
+    """Ts = log((ST_K - temp) / (KELVIN_OFFSET + temp)) written into `out`"""
+    np.subtract(ST_K, temp, out=out)
+    np.add(KELVIN_OFFSET, temp, out=buf)
+    out /= buf
+    np.log(out, out=out)
+
+
+def _salinity_correction_chunk(DO, P, T, SP, pdens, out, work):
+    """do2_salinity_correction with pref=0 and the potential density
+    `pdens` written into `out`"""
+    ts, bts, buf = work
+    # Convert from volume to mass units with the potential density
+    np.multiply(DO, 1000, out=out)
+    out /= pdens
+    # Pressure correction
+    np.multiply(P, 0.032, out=buf)
+    buf /= 1000
+    buf += 1
+    out *= buf
+    # Salinity correction (Garcia and Gordon, 1992, combined fit)
+    _scaled_temperature(T, ts, buf)
+    B = [-6.24097e-3, -6.93498e-3, -6.90358e-3, -4.29155e-3]
+    C0 = -3.11680e-7
+    np.multiply(ts, B[3], out=bts)
+    bts += B[2]
+    bts *= ts
+    bts += B[1]
+    bts *= ts
+    bts += B[0]
+    bts *= SP
+    np.square(SP, out=buf)
+    buf *= C0
+    bts += buf
+    np.exp(bts, out=bts)
+    out *= bts
@@ -4,17 +4,26 @@ import numpy as np
 import logging
 import os
 
-from ooidac import boxcar_smooth_dataset
+from ooidac import (
+    boxcar_smooth_dataset, median_smooth_dataset, savgol_smooth_dataset)
 
 from ooidac.utilities import fwd_fill
 from ooidac.processing import all_sci_indices
+from ooidac.filter_registry import FilterRegistry
 import profile_filters
+from configuration import TIMESENSOR
 # import pdb
 
 # ToDo: fix the imports above
 
 logger = logging.getLogger(os.path.basename(__file__))
 
+# depth smoothers for finding the inflections in find_profiles_by_depth
+SMOOTHERS = {
+    'boxcar': boxcar_smooth_dataset,
+    'median': median_smooth_dataset,
+    'savgol': savgol_smooth_dataset}
+
 
 class Profiles(object):
     def __init__(self, dba):
@@ -26,41 +35,54 @@ class Profiles(object):
             variables added
         """
         self.dba = dba
-        self._indices = None
+        # P x 2 array of the first row and the end row (exclusive) of each
+        # profile
+        self._ranges = None
         self.inflection_times = None
         # Todo: add in some checking before proceeding.
 
     def __iter__(self):
         """makes it possible to iterate over the profiles in a for loop by
-        returning a GliderData object that is sliced by the profile indices"""
-        if self._indices is not None:
-            for profile_indices in self._indices:
-                yield self.dba.slicedata(indices=profile_indices)
+        returning a GliderData object that is sliced by the profile rows"""
+        if self._ranges is not None:
+            for start, stop in self._ranges:
+                yield self.dba.slicedata(indices=slice(start, stop))
 
     def __len__(self):
         """allows the len function to be called on a Profiles instance and it
         will return the number of profiles found"""
-        if self.indices:
-            return len(self.indices)
+        if self._ranges is not None:
+            return len(self._ranges)
         else:
             return 0
 
+    @property
+    def ranges(self):
+        """P x 2 array of the first row and the end row (exclusive) of each
+        profile"""
+        return self._ranges
+
     @property
     def indices(self):
-        return self._indices
+        """list of the row indices array of each profile"""
+        if self._ranges is None:
+            return None
+        return [np.arange(start, stop) for start, stop in self._ranges]
 
     def get_profile(self, index):
         try:
-            return self.dba.slicedata(indices=self._indices[index])
+            start, stop = self._ranges[index]
         except IndexError:
             raise ProfileIndexError("Profile index is out of range")
+        return self.dba.slicedata(indices=slice(start, stop))
 
     # TODO: fix all of the return statements in this class (maybe?), I think
     #  I meant here that sometimes the return statements return an empty
     #  list, when they could just say "return" alone.
 
     def find_profiles_by_depth(
-            self, depth_sensor='m_depth', tsint=2, winsize=10):
+            self, depth_sensor='m_depth', tsint=2, winsize=10,
+            smoother='boxcar', min_depth_change=2):
         """Discovery of profiles in a glider segment using depth and time.
 
         Profiles are discovered by smoothing the depth timeseries and using the
@@ -82,10 +104,16 @@ class Profiles(object):
         :param tsint: Time interval in seconds for filtered depth.
         This affects filtering.  Default is 2.
         :param winsize: Window size for boxcar smoothing filter.
-        :return: output is a list of profile indices in self.indices
+        :param smoother: Optional, smoothing filter of the SMOOTHERS,
+            'boxcar' (running mean), 'median' or 'savgol' (Savitzky-Golay).
+            Default is 'boxcar'.
+        :param min_depth_change: Optional, smallest depth change in meters
+            between good inflections, see `adjust_inflections`.  Default
+            is 2.
+        :return: output is the profile row ranges in self.ranges
         """
-        self._indices = []
-        depth = self.dba.getdata(depth_sensor)
+        self._ranges = _empty_ranges()
+        depth = self.dba.copydata(depth_sensor)
         time_ = self.dba.getdata('m_present_time')
 
         # Set negative depth values to NaN; using this method to avoid numpy
@@ -121,7 +149,7 @@ class Profiles(object):
         itime = np.arange(itime_start, itime_end, tsint)
         idepth = np.interp(itime, time_[depth_ii], depth[depth_ii],
                            left=depth[depth_ii[0]], right=depth[depth_ii[-1]])
-        fz = boxcar_smooth_dataset(idepth, winsize)
+        fz = SMOOTHERS[smoother](idepth, winsize)
 
         # remove the extra points with filter edge effects
         fz = fz[winsize:-winsize]
@@ -158,22 +186,16 @@ class Profiles(object):
 
         self.inflection_times = profile_switch_times
 
-        # profile_switch_times = self.adjust_inflections(depth, time_)
-        profile_switch_times = self.adjust_inflections(depth, time_)
-
-        # use the time range to gather indices for each profile
-        for ii in range(len(profile_switch_times)-1):
-            pstart = profile_switch_times[ii]
-            pend = profile_switch_times[ii+1]
-            profile_ii = np.flatnonzero(
-                np.logical_and(
-                    time_ >= pstart,
-                    time_ <= pend))  # inclusive since before the inflection
-            if len(profile_ii) == 0:
-                continue
-            self._indices.append(profile_ii)
+        profile_switch_times = self.adjust_inflections(
+            depth, time_, min_depth_change)
 
-    def adjust_inflections(self, depth, time_):
+        # use the time range to gather the rows of each profile, inclusive
+        # of both ends since they are before the inflection
+        ranges = time_ranges_to_rows(
+            time_, profile_switch_times[:-1], profile_switch_times[1:])
+        self._ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+
+    def adjust_inflections(self, depth, time_, min_depth_change=2):
         """Filters out bad inflection points.
 
         Bad inflection points are small surface, bottom of dive, or mid-profile
@@ -181,9 +203,13 @@ class Profiles(object):
         These false inflections are removed so that when profile indices are
         created, they don't separate into separate small profiles.
 
-        :param depth:
-        :param time_:
-        :return:
+        :param depth: depth of the segment rows
+        :param time_: timestamps of the segment rows
+        :param min_depth_change: Optional, depth change in meters from the
+            last good inflection that the next good inflection must reach.
+            Default is 2.
+        :return: the timestamps of the good inflections, also stored in
+            self.inflection_times
         """
         inflections = self.inflection_times
         inflection_depths = np.interp(
@@ -192,27 +218,18 @@ class Profiles(object):
         )
 
         # First remove the false diving inflections (i.e. the small wiggles) by
-        # taking the good inflection and looking ahead until an inflection depth
-        # difference greater than 2m is found
-        inflx_ii = 0
-        fwd_counter = 1
-        inflx_to_keep = np.full(len(inflections), True)
-        while inflx_ii < len(inflections):
-            ii_depth = inflection_depths[inflx_ii]  # depth of current inflection
-            # look ahead for the next true inflection change
-            if inflx_ii + fwd_counter >= len(inflections):
-                break
-            while abs(inflection_depths[inflx_ii + fwd_counter] - ii_depth) < 2:
-                inflx_to_keep[inflx_ii + fwd_counter] = False
-                fwd_counter += 1
-                if inflx_ii + fwd_counter >= len(inflections):
-                    break
-            inflx_ii = inflx_ii + fwd_counter
-            fwd_counter = 1
+        # taking the good inflection and looking ahead until an inflection
+        # depth difference of at least min_depth_change is found.  That next
+        # inflection is looked up for every inflection at once, and the good
+        # inflections are the chain of next inflections from the first one.
+        next_inflections = next_depth_changes(
+            inflection_depths, min_depth_change)
+        inflx_to_keep = chain_mask(next_inflections)
 
         # afterwards we may be left with mid profile direction changes that were
-        # greater than 2 m.  But now they can identified by not changing trend,
-        # since any of our good  inflection points left will change trend sign.
+        # greater than min_depth_change.  But now they can identified by not
+        # changing trend, since any of our good  inflection points left will
+        # change trend sign.
         good_inflx_ii = np.flatnonzero(inflx_to_keep)
         trends = np.diff(inflection_depths[good_inflx_ii])
         # find where the trends are the same by getting the diff of the sign of
@@ -340,10 +357,10 @@ class Profiles(object):
         :param tsint: Time interval in seconds for filtered depth.
         This affects filtering.  Default is 2.
         :param winsize: Window size for boxcar smoothing filter.
-        :return: output is a list of profile indices in self.indices
+        :return: output is the profile row ranges in self.ranges
         """
-        self._indices = []
-        depth = self.dba.getdata(depth_sensor)
+        self._ranges = _empty_ranges()
+        depth = self.dba.copydata(depth_sensor)
         time_ = self.dba.getdata('m_present_time')
 
         # Set negative depth values to NaN; using this method to avoid numpy
@@ -415,20 +432,11 @@ class Profiles(object):
             [time_[starting_index],
              time_[ending_index]])
 
-        # create a time range for each profile
-        profile_times = np.empty((len(profile_switch_times) - 1, 2))
-        profile_times[:, 0] = profile_switch_times[:-1]
-        profile_times[:, 1] = profile_switch_times[1:]
-
-        # use the time range to gather indices for each profile
-        for pstart, pend in profile_times:
-            profile_ii = np.flatnonzero(
-                np.logical_and(
-                    time_ >= pstart,
-                    time_ <= pend))  # inclusive since before the inflection
-            if len(profile_ii) == 0:
-                continue
-            self._indices.append(profile_ii)
+        # use the time range to gather the rows of each profile, inclusive
+        # of both ends since they are before the inflection
+        ranges = time_ranges_to_rows(
+            time_, profile_switch_times[:-1], profile_switch_times[1:])
+        self._ranges = ranges[ranges[:, 1] > ranges[:, 0]]
 
     def orig_find_profiles_by_depth(self, tsint=2, filter_winsize=10):
         """Returns the start and stop timestamps for every profile indexed from
@@ -443,8 +451,8 @@ class Profiles(object):
         Use filter_yo_extrema to remove invalid/incomplete profiles
         """
 
-        # Create list of profile indices - pearce / kerfoot method
-        self._indices = []
+        # Create the profile row ranges - pearce / kerfoot method
+        self._ranges = _empty_ranges()
 
         if 'llat_time' in self.dba.sensor_names:
             timestamps = self.dba['llat_time']
@@ -462,9 +470,9 @@ class Profiles(object):
                     self.dba.source_file)
                 )
                 return
-            depth = self.dba['llat_depth']['data']
+            depth = self.dba.copydata('llat_depth')
         else:
-            depth = self.dba['m_depth']['data']
+            depth = self.dba.copydata('m_depth')
 
         # validate_glider_args(timestamps, depth)
 
@@ -553,30 +561,17 @@ class Profiles(object):
         # works better
         self.inflection_times = inflection_times
 
-        # get the first profile indices manually so that it gets all of the
-        # data up to the first inflection including the inflection
-        profile_i = np.flatnonzero(timestamps <= inflection_times[0])
-        self._indices.append(profile_i)
-
-        # then iterate over the inflection times and get each profile indices
-        # excluding the preceding inflection and including the ending inflection
-        for ii in range(1, len(inflection_times)):
-            # Find all rows in the original yo that fall between the
-            # interpolated timestamps
-            profile_i = np.flatnonzero(
-                np.logical_and(
-                    timestamps > inflection_times[ii - 1],
-                    timestamps <= inflection_times[ii]
-                )
-            )
-            if len(profile_i) == 0:
-                continue
-            self._indices.append(profile_i)
-
-        # lastly get the last profile manually again from the last inflection
-        # time to the end of the dataset
-        profile_i = np.flatnonzero(timestamps > inflection_times[-1])
-        self._indices.append(profile_i)
+        # the first profile gets all of the data up to the first inflection
+        # including the inflection, the following profiles exclude the
+        # preceding inflection and include the ending inflection, and the last
+        # profile is from the last inflection time to the end of the dataset
+        boundaries = np.concatenate([[-np.inf], inflection_times, [np.inf]])
+        ranges = time_ranges_to_rows(
+            timestamps, boundaries[:-1], boundaries[1:], include_start=False)
+        # only the empty middle profiles are skipped
+        keep = ranges[:, 1] > ranges[:, 0]
+        keep[[0, -1]] = True
+        self._ranges = ranges[keep]
 
     def find_profiles_by_depth_state(self):
         """Returns the start and stop timestamps for every profile indexed from
@@ -590,15 +585,13 @@ class Profiles(object):
 
         Use filter_yo_extrema to remove invalid/incomplete profiles
         """
-        profile_indexes = []
-
         timestamps = self.dba['llat_time']['data']
 
         if 'm_depth_state' not in self.dba.sensor_names:
             logging.debug('Thought there was depth state, but not')
-            return profile_indexes
+            return []
 
-        depth_state = self.dba.getdata('m_depth_state')
+        depth_state = self.dba.copydata('m_depth_state')
 
         # remove any negative numbers or values greater than 3 since they are
         # not dive/climb/hover states and then fill the NaNs with the
@@ -623,49 +616,153 @@ class Profiles(object):
 
         # first profile, everything up to first depth_state change. Typically
         # this is waiting on the surface to start the dive, i.e. not a
-        # profile, but we eliminate that with the filters.
-        profile_i = np.flatnonzero(timestamps <= inflection_times[0])
-        profile_indexes.append(profile_i)
-
-        # middle profiles
-        for ii in range(1, len(inflection_times)):
-            logical = np.logical_and(
-                timestamps > inflection_times[ii - 1],
-                timestamps <= inflection_times[ii])
-            profile_i = np.flatnonzero(logical)
-            profile_indexes.append(profile_i)
-
-        # last profile
-        profile_i = np.flatnonzero(timestamps > inflection_times[-1])
-        profile_indexes.append(profile_i)
-
-        # return profiled_dataset
-        self._indices = profile_indexes
-
-    def filter_profiles(self):
+        # profile, but we eliminate that with the filters.  Then the middle
+        # profiles and the last profile after the last depth_state change.
+        boundaries = np.concatenate([[-np.inf], inflection_times, [np.inf]])
+        self._ranges = time_ranges_to_rows(
+            timestamps, boundaries[:-1], boundaries[1:], include_start=False)
+
+    def filter_profiles(self, batch=True, registry=None):
+        """Remove the profiles flagged by any of the `filter_` functions of
+        profile_filters.py.  The filters are run cheapest and most selective
+        first by a FilterRegistry (see ooidac/filter_registry.py).
+
+        :param batch: Optional, evaluate each filter that has a `batch_`
+            version for all of the remaining profiles at once from the whole
+            segment.  The other filters, or all of them if the timestamps
+            are not increasing, are run on each profile.  Default is True.
+        :param registry: Optional FilterRegistry, e.g. to order the filters
+            and collect their statistics over all of the segments of a
+            deployment.  Default uses a new registry of profile_filters.py.
         """
-        """
-        filters = [getattr(profile_filters, func) for func in dir(
-            profile_filters)
-                 if func.startswith('filter')]
-        profiles_to_remove = []
-        for ii in range(len(self.indices)):
-            profile_ii = self.indices[ii]
-            profile = self.dba.slicedata(indices=profile_ii)
-            for func in filters:
-                remove_profile = func(profile)
-                if remove_profile:
-                    profiles_to_remove.append(ii)
-                    logger.debug('Profile {:d} removed by {:s}'.format(
-                        ii, func.__name__
-                    ))
-                    break
-        # need to reverse profiles_to_remove indexes so that after a profile
-        # is removed (popped), the remaining indices are not different for
-        # the profiles_to_remove list
-        profiles_to_remove.sort(reverse=True)
-        for index in profiles_to_remove:
-            self.indices.pop(index)
+        if self._ranges is None or len(self._ranges) == 0:
+            return
+        if registry is None:
+            registry = FilterRegistry.from_module(profile_filters)
+        if batch:
+            timestamps = self.dba.getdata(TIMESENSOR)
+            batch = bool(np.all(timestamps[1:] >= timestamps[:-1]))
+        profiles_to_keep = registry.run(self.dba, self._ranges, batch=batch)
+        self._ranges = self._ranges[profiles_to_keep]
+
+
+def time_ranges_to_rows(timestamps, start_times, end_times,
+                        include_start=True):
+    """Return the rows of `timestamps` in each time range from `start_times`
+    to `end_times` as a P x 2 array of the first row and the end row
+    (exclusive) of each range.  The rows at the end times are included, and
+    the rows at the start times are included if `include_start` is True.
+
+    All of the ranges are found with one searchsorted over the timestamps
+    instead of comparing every timestamp to every range.  If the timestamps
+    are not increasing, they are searched as their running maximum, so a row
+    whose timestamp goes back in time is kept with the rows before it.
+
+    :param timestamps: timestamps of the rows, e.g. m_present_time
+    :param start_times: start time of each range
+    :param end_times: end time of each range
+    :param include_start: Optional, include the rows at the start times.
+        Default is True.
+    :return: P x 2 array of the row ranges
+    """
+    time_base = np.asarray(timestamps)
+    if not np.all(time_base[1:] >= time_base[:-1]):
+        time_base = np.fmax.accumulate(time_base)
+    starts = np.searchsorted(
+        time_base, start_times, side='left' if include_start else 'right')
+    stops = np.searchsorted(time_base, end_times, side='right')
+    return np.column_stack([starts, np.maximum(starts, stops)])
+
+
+def next_depth_changes(depths, min_depth_change):
+    """Return for every depth the index of the first later depth that
+    differs from it by at least `min_depth_change`, or len(depths) if there
+    is none.
+
+    The depths after each one are searched in blocks of 2**k depths using
+    tables of the running maximum and minimum over 2**k depths, first with
+    doubling block sizes while the whole block stays within
+    `min_depth_change`, then with halving block sizes to find the first
+    depth of the last block that does not.  All of the depths are searched
+    at once, in O(N log L) array operations for runs of L depths, instead
+    of a Python loop over the depths.  The differences are compared the same
+    way as `abs(depths[jj] - depths[ii]) < min_depth_change`.
+
+    :param depths: finite 1-D array of depths, e.g. of the inflections
+    :param min_depth_change: smallest depth difference
+    :return: integer array of the next index of each depth
+    """
+    depths = np.asarray(depths, dtype=np.float64)
+    num_depths = len(depths)
+    # running maxima and minima over 2**k depths from each index
+    maxima = [depths]
+    minima = [depths]
+
+    def advance(searching, level):
+        """Move the next index of the depths `searching` past the following
+        block of 2**level depths where the block stays within
+        min_depth_change, and return the depths that moved and the ones
+        that did not"""
+        step = 2 ** level
+        fits = next_ii[searching] + step <= num_depths
+        blocks = searching[fits]
+        if len(blocks) == 0:
+            return blocks, searching
+        while len(maxima) <= level:
+            half = 2 ** (len(maxima) - 1)
+            maxima.append(np.maximum(maxima[-1][:-half], maxima[-1][half:]))
+            minima.append(np.minimum(minima[-1][:-half], minima[-1][half:]))
+        block_ii = next_ii[blocks]
+        within = np.logical_and(
+            maxima[level][block_ii] - depths[blocks] < min_depth_change,
+            depths[blocks] - minima[level][block_ii] < min_depth_change)
+        moved = blocks[within]
+        next_ii[moved] += step
+        return moved, np.concatenate((searching[~fits], blocks[~within]))
+
+    next_ii = np.arange(1, num_depths + 1)
+    searching = np.arange(num_depths)
+    level = 0
+    while len(searching) > 0:
+        searching, stopped = advance(searching, level)
+        # the first change after the stopped depths is within their next
+        # 2**level depths
+        for smaller_level in range(level - 1, -1, -1):
+            advance(stopped, smaller_level)
+        level += 1
+    return next_ii
+
+
+def chain_mask(next_ii):
+    """Return a boolean array that is True for the indices reached by
+    following `next_ii` from index 0, e.g. the good inflections given the
+    next_depth_changes of the inflection depths.
+
+    The chain is followed by pointer doubling: each pass adds the indices
+    reached by the jumps of the previous pass and doubles the jumps, so
+    log2(N) array operations replace a Python loop along the chain.
+
+    :param next_ii: integer array of the next index of each index, greater
+        than the index and at most len(next_ii)
+    :return: boolean array of the indices on the chain
+    """
+    num_indices = len(next_ii)
+    if num_indices == 0:
+        return np.full(0, False)
+    # the index past the end jumps to itself
+    jumps = np.append(next_ii, num_indices)
+    on_chain = np.full(num_indices + 1, False)
+    on_chain[0] = True
+    chain_length = 1
+    while chain_length < num_indices:
+        on_chain[jumps[on_chain]] = True
+        jumps = jumps[jumps]
+        chain_length *= 2
+    return on_chain[:-1]
+
+
+def _empty_ranges():
+    return np.empty((0, 2), dtype=np.intp)
 
 
 def binarize_diff(data):
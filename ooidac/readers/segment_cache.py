@@ -0,0 +1,453 @@
+"""Opt-in on-disk cache of parsed Slocum data files (ascii dba or binary).
+
+Re-processing a deployment (e.g. after changing the sensor definitions or a
+calibration) re-parses every segment file.  With the cache enabled, each
+parsed segment is stored once as a memory-mappable sidecar and later parses
+of the same file are read back from it instead:
+
+    <cache_dir>/<content hash>.npy    column-major float64 data table
+    <cache_dir>/<content hash>.json   header, sensor names and sensor defs
+    <cache_dir>/index.json            data file path -> size, mtime and
+                                      content hash, plus the cached headers
+
+A data file is looked up by its real path.  If its size and modification
+time match the index the stored content hash is used directly, otherwise the
+file is hashed again, so a touched or copied file with the same content still
+hits the cache.  The complete sensor table is stored so that any sensor
+subset can be loaded from the same entry; the column-major layout means only
+the pages of the requested columns are read from the memory map.
+
+The cache is bounded by size, the least recently used entries (by the
+modification time of their `.npy` file, which is touched on every hit) are
+removed once the total exceeds `max_size_mb`.
+
+Usage:
+    enable_cache('/path/to/cache', max_size_mb=2048)
+    dba = parse_data_file(dba_file, sensors=['m_present_time', 'm_depth'])
+    header = parse_data_file_header(dba_file)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+from ooidac.readers.slocum import (
+    parse_dba, parse_dba_header, parse_dba_sensors, _project_sensors)
+from ooidac.readers.slocum_binary import (
+    parse_binary, parse_binary_header, parse_binary_sensors, is_binary_dbd)
+
+logger = logging.getLogger(os.path.basename(__name__))
+
+# bump when the parsed output of the readers changes to invalidate old caches
+CACHE_VERSION = 1
+
+_INDEX_FILE = 'index.json'
+
+# the index is rewritten after this many changes, and by flush()
+_INDEX_WRITE_INTERVAL = 50
+
+# block size used to hash the data files
+_HASH_BLOCK_SIZE = 1 << 20
+
+# the active cache used by parse_data_file and parse_data_file_header
+_cache = None
+
+
+def enable_cache(cache_dir, max_size_mb=2048):
+    """Enable the parsed segment cache for all following calls to
+    `parse_data_file` and `parse_data_file_header` (and so for `DbaData`).
+
+    Args:
+        cache_dir: directory to store the cache in, created if necessary
+        max_size_mb: maximum total size of the cached data in megabytes
+
+    Returns:
+        The active SegmentCache
+    """
+    global _cache
+    _cache = SegmentCache(cache_dir, max_size_mb)
+    return _cache
+
+
+def disable_cache():
+    """Disable the parsed segment cache"""
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """Return the active SegmentCache or None if the cache is not enabled"""
+    return _cache
+
+
+def parse_data_file(data_file, cac_dir=None, sensors=None):
+    """Parse a Slocum ascii dba or binary data file, using the parsed segment
+    cache if it is enabled.
+
+    Args:
+        data_file: ascii dba or binary Slocum data file to parse
+        cac_dir: directory of the binary `.cac` sensor list cache files
+        sensors: optional list of sensor names to keep.  Default is to keep
+            all sensors.
+
+    Returns: A dictionary containing the file metadata, sensor defintions
+    and data
+    """
+    if _cache is None:
+        return _parse(data_file, cac_dir, sensors)
+
+    dba = _cache.load(data_file, sensors)
+    if dba is not None:
+        return dba
+
+    # store the complete sensor table so any later sensor subset is a hit
+    dba = _parse(data_file, cac_dir)
+    if dba is None:
+        return
+    _cache.store(data_file, dba)
+    if sensors is None:
+        return dba
+    return _project(dba, sensors, data_file)
+
+
+def parse_data_file_sensors(data_file, cac_dir=None, sensors=None):
+    """Parse only the header and sensor definitions of a Slocum ascii dba or
+    binary data file, using the parsed segment cache if it is enabled.
+
+    Args:
+        data_file: ascii dba or binary Slocum data file to parse
+        cac_dir: directory of the binary `.cac` sensor list cache files
+        sensors: optional list of sensor names to keep
+
+    Returns: A dictionary containing the file metadata and sensor
+    defintions, the same as parse_data_file without the 'data' item
+    """
+    if _cache is not None:
+        dba = _cache.load(data_file, sensors, data=False)
+        if dba is not None:
+            return dba
+    if is_binary_dbd(data_file):
+        return parse_binary_sensors(data_file, cac_dir=cac_dir, sensors=sensors)
+    return parse_dba_sensors(data_file, sensors=sensors)
+
+
+def parse_data_file_header(data_file):
+    """Parse the header of a Slocum ascii dba or binary data file, using the
+    parsed segment cache if it is enabled.
+
+    Args:
+        data_file: ascii dba or binary Slocum data file
+
+    Returns:
+        A dictionary containing the file metadata
+    """
+    if _cache is not None:
+        header = _cache.load_header(data_file)
+        if header is not None:
+            return header
+    if is_binary_dbd(data_file):
+        return parse_binary_header(data_file)
+    return parse_dba_header(data_file)
+
+
+class SegmentCache(object):
+    """Directory of parsed segment sidecar files with a path index"""
+    def __init__(self, cache_dir, max_size_mb=2048):
+        """
+        :param cache_dir: directory to store the cache in
+        :param max_size_mb: maximum total size of the cached data in MB
+        """
+        self.cache_dir = os.path.realpath(cache_dir)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index_file = os.path.join(self.cache_dir, _INDEX_FILE)
+        self._files = {}
+        self._entries = {}
+        # content hash of the last hashed file, a miss hashes the file in
+        # load and again in store otherwise
+        self._last_hashed = (None, None)
+        self._index_changes = 0
+        self._read_index()
+
+    def __repr__(self):
+        return "<SegmentCache({:s}, {:d} entries)>".format(
+            self.cache_dir, len(self._entries))
+
+    def load(self, data_file, sensors=None, data=True):
+        """Load a parsed data file from the cache.
+
+        :param data_file: data file to load
+        :param sensors: optional list of sensor names to load
+        :param data: Optional, False to load only the header and sensor
+            definitions
+        :return: the parsed data file dictionary or None if it is not cached
+        """
+        content_hash = self._lookup(data_file, rehash=data)
+        if content_hash is None:
+            return
+        npy_file, json_file = self._entry_files(content_hash)
+        try:
+            with open(json_file, 'r') as fid:
+                meta = json.load(fid)
+            if data:
+                # copy-on-write so the data can still be modified in memory
+                meta['data'] = np.load(npy_file, mmap_mode='c')
+        except (IOError, ValueError) as e:
+            logger.warning('Bad cache entry for {:s}: {}'.format(
+                data_file, e))
+            self._remove_entry(content_hash)
+            return
+        os.utime(npy_file)
+
+        meta['header'] = self._file_header(meta['header'], data_file)
+        logger.debug('Loaded {:s} from the segment cache'.format(data_file))
+        if sensors is None:
+            return meta
+        return _project(meta, sensors, data_file)
+
+    def load_header(self, data_file):
+        """Return the cached header of a data file or None if the data file
+        is not cached.  Only the path index is checked, reading the header
+        from the file is cheaper than hashing it."""
+        content_hash = self._lookup(data_file, rehash=False)
+        if content_hash is None:
+            return
+        return self._file_header(
+            self._entries[content_hash]['header'], data_file)
+
+    def store(self, data_file, dba):
+        """Store a parsed data file in the cache and evict the least recently
+        used entries if the cache is over its size limit.
+
+        :param data_file: the parsed data file
+        :param dba: parsed data file dictionary with all sensors
+        """
+        file_key = self._file_key(data_file)
+        if file_key is None:
+            return
+        content_hash = self._hash(file_key, data_file)
+        npy_file, json_file = self._entry_files(content_hash)
+        try:
+            meta = json.dumps({'header': dba['header'],
+                               'sensor_names': dba['sensor_names'],
+                               'sensor_defs': dba['sensor_defs']})
+            _atomic_write(
+                npy_file, lambda fid: np.save(
+                    fid, np.asfortranarray(dba['data'], dtype=np.float64)))
+            _atomic_write(json_file, lambda fid: fid.write(meta.encode()))
+        except (IOError, TypeError) as e:
+            logger.warning('Could not cache {:s}: {}'.format(data_file, e))
+            return
+
+        self._files[file_key[0]] = {
+            'size': file_key[1], 'mtime_ns': file_key[2],
+            'hash': content_hash}
+        self._entries[content_hash] = {
+            'header': dba['header'],
+            'size_bytes': (
+                os.path.getsize(npy_file) + os.path.getsize(json_file))}
+        self._evict(keep=content_hash)
+        self._index_changed()
+
+    def flush(self):
+        """Write any pending changes of the path index to disk"""
+        if self._index_changes:
+            self._write_index()
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        for content_hash in list(self._entries):
+            self._remove_entry(content_hash)
+        self._files = {}
+        self._write_index()
+
+    @property
+    def size_bytes(self):
+        return sum(entry['size_bytes'] for entry in self._entries.values())
+
+    def _lookup(self, data_file, rehash=True):
+        """Return the content hash of a cached data file or None.  With
+        `rehash` a file that is not in the path index or has changed size or
+        modification time is hashed to look it up by content."""
+        file_key = self._file_key(data_file)
+        if file_key is None:
+            return
+        path, size, mtime_ns = file_key
+        indexed = self._files.get(path)
+        if (
+                indexed and indexed['size'] == size
+                and indexed['mtime_ns'] == mtime_ns
+        ):
+            content_hash = indexed['hash']
+        elif not rehash:
+            return
+        else:
+            # new or touched file, check the content against the cache
+            content_hash = self._hash(file_key, data_file)
+            if content_hash in self._entries:
+                self._files[path] = {
+                    'size': size, 'mtime_ns': mtime_ns, 'hash': content_hash}
+                self._index_changed()
+        if content_hash not in self._entries:
+            return
+        return content_hash
+
+    def _hash(self, file_key, data_file):
+        if self._last_hashed[0] != file_key:
+            self._last_hashed = (file_key, _hash_file(data_file))
+        return self._last_hashed[1]
+
+    @staticmethod
+    def _file_key(data_file):
+        try:
+            stat = os.stat(data_file)
+        except OSError:
+            return
+        return os.path.realpath(data_file), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _file_header(header, data_file):
+        """Return a copy of a cached header with the file names of
+        `data_file`, which may differ from the file the entry was made from
+        """
+        header = header.copy()
+        header['full_path'] = os.path.realpath(data_file)
+        header['source_file'] = os.path.basename(data_file)
+        return header
+
+    def _entry_files(self, content_hash):
+        return (os.path.join(self.cache_dir, content_hash + '.npy'),
+                os.path.join(self.cache_dir, content_hash + '.json'))
+
+    def _evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in
+        max_size_bytes"""
+        total = self.size_bytes
+        if total <= self.max_size_bytes:
+            return
+        last_used = {}
+        for content_hash in self._entries:
+            try:
+                last_used[content_hash] = os.path.getmtime(
+                    self._entry_files(content_hash)[0])
+            except OSError:
+                last_used[content_hash] = 0.
+        for content_hash in sorted(last_used, key=last_used.get):
+            if total <= self.max_size_bytes:
+                break
+            if content_hash == keep:
+                continue
+            total -= self._entries[content_hash]['size_bytes']
+            self._remove_entry(content_hash)
+            logger.debug('Evicted {:s} from the segment cache'.format(
+                content_hash))
+
+    def _remove_entry(self, content_hash):
+        for entry_file in self._entry_files(content_hash):
+            try:
+                os.remove(entry_file)
+            except OSError:
+                pass
+        self._entries.pop(content_hash, None)
+        self._files = {
+            path: indexed for path, indexed in self._files.items()
+            if indexed['hash'] != content_hash}
+
+    def _read_index(self):
+        if not os.path.isfile(self._index_file):
+            return
+        try:
+            with open(self._index_file, 'r') as fid:
+                index = json.load(fid)
+        except (IOError, ValueError) as e:
+            logger.warning('Unreadable segment cache index {:s}: {}'.format(
+                self._index_file, e))
+            return
+        if index.get('version') != CACHE_VERSION:
+            logger.info('Segment cache version changed, clearing {:s}'.format(
+                self.cache_dir))
+            self._entries = index.get('entries', {})
+            self.clear()
+            return
+        self._files = index['files']
+        # drop entries whose sidecar files were removed outside the cache and
+        # sidecar files that never made it into the index
+        cache_files = set(os.listdir(self.cache_dir))
+        self._entries = {
+            content_hash: entry
+            for content_hash, entry in index['entries'].items()
+            if all(os.path.basename(entry_file) in cache_files
+                   for entry_file in self._entry_files(content_hash))}
+        self._files = {
+            path: indexed for path, indexed in self._files.items()
+            if indexed['hash'] in self._entries}
+        for cache_file in cache_files:
+            content_hash, ext = os.path.splitext(cache_file)
+            if ext in ('.npy', '.json') and content_hash not in self._entries:
+                if cache_file == _INDEX_FILE:
+                    continue
+                os.remove(os.path.join(self.cache_dir, cache_file))
+
+    def _index_changed(self):
+        self._index_changes += 1
+        if self._index_changes >= _INDEX_WRITE_INTERVAL:
+            self._write_index()
+
+    def _write_index(self):
+        index = {'version': CACHE_VERSION,
+                 'files': self._files,
+                 'entries': self._entries}
+        try:
+            _atomic_write(
+                self._index_file,
+                lambda fid: fid.write(json.dumps(index).encode()))
+            self._index_changes = 0
+        except IOError as e:
+            logger.warning('Could not write segment cache index {:s}: {}'.format(
+                self._index_file, e))
+
+
+def _parse(data_file, cac_dir=None, sensors=None):
+    if is_binary_dbd(data_file):
+        return parse_binary(data_file, cac_dir=cac_dir, sensors=sensors)
+    return parse_dba(data_file, sensors=sensors)
+
+
+def _project(dba, sensors, data_file):
+    """Reduce a parsed data file dictionary, with or without data, to the
+    sensors in `sensors`"""
+    sensor_names, sensor_defs, usecols = _project_sensors(
+        sensors, dba['sensor_names'], dba['sensor_defs'])
+    if not usecols:
+        logger.warning(
+            'None of the requested sensors are in data file: {:s}'.format(
+                data_file))
+        return
+    projected = {'header': dba['header'], 'sensor_names': sensor_names,
+                 'sensor_defs': sensor_defs}
+    if 'data' in dba:
+        projected['data'] = dba['data'][:, usecols]
+    return projected
+
+
+def _hash_file(data_file):
+    """Return the sha1 hex digest of the contents of `data_file`"""
+    sha1 = hashlib.sha1()
+    with open(data_file, 'rb') as fid:
+        for block in iter(lambda: fid.read(_HASH_BLOCK_SIZE), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _atomic_write(file_name, write):
+    """Call `write` with a temporary binary file object and move it to
+    `file_name` so readers never see a partially written file"""
+    tmp_file = '{:s}.{:d}.tmp'.format(file_name, os.getpid())
+    try:
+        with open(tmp_file, 'wb') as fid:
+            write(fid)
+        os.replace(tmp_file, file_name)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
@@ -5,40 +5,117 @@ dba2_glider_data"""
 
 import os
 import logging
+import warnings
 import numpy as np
 import time
 
 logger = logging.getLogger(os.path.basename(__name__))
 
+# byte values of the ascii table whitespace characters
+_NEWLINE = ord('\n')
+_RETURN = ord('\r')
+_SPACE = ord(' ')
+_TAB = ord('\t')
+
+# number of table lines converted at a time, bounds the temporary memory
+# used when only a few columns are kept
+_ROW_CHUNK = 2048
+
 
 # ToDo: bring comments up to date if necessary
-def parse_dba(dba_file, fast=False):
+def parse_dba(dba_file, sensors=None):
     """Parse a Slocum dba ascii table file.
 
     Args:
         dba_file: dba file to parse
+        sensors: optional list of sensor names to keep.  Columns of any other
+            sensors are skipped and never converted to floats.  Sensors in
+            the list that are not in the file are ignored.  Default is to
+            keep all sensors.
 
     Returns: A dictionary containing the file metadata, sensor defintions
     and data
     """
+    t0 = time.time()
+    metadata = _parse_dba_metadata(dba_file, sensors)
+    if metadata is None:
+        return
+    dba_headers, sensors, sensor_defs, usecols, total_header_lines = metadata
+    table_columns = int(dba_headers['sensors_per_cycle'])
+    num_columns = len(sensors)
+
+    # Parse the ascii table portion of the dba file
+    data = _load_dba_data(
+        dba_file, total_header_lines, table_columns, usecols)
+    if data is None:
+        return
+    elif len(data) == 0:
+        logger.info('Data length is 0 in dba file: {:s}'.format(
+            dba_file))
+        return
+    elif num_columns != data.shape[1]:
+        logger.warning(
+            'Glider data file does not have the same'
+            'number of columns as described in header.\n'
+            'described {:d}, actual {:d}'.format(
+                num_columns, data.shape[1])
+        )
+    t1 = time.time()
+    logger.debug("Time elapsed for parser, {:0.0f}".format(t1 - t0))
+
+    dba = {'header': dba_headers, 'sensor_names': sensors,
+           'sensor_defs': sensor_defs, 'data': data}
+    return dba
+
+
+def parse_dba_sensors(dba_file, sensors=None):
+    """Parse only the header and sensor definitions of a Slocum dba ascii
+    table file, without loading the data table.
+
+    Args:
+        dba_file: dba file to parse
+        sensors: optional list of sensor names to keep
+
+    Returns: A dictionary containing the file metadata and sensor
+    defintions, the same as parse_dba without the 'data' item
+    """
+    metadata = _parse_dba_metadata(dba_file, sensors)
+    if metadata is None:
+        return
+    dba_headers, sensors, sensor_defs, _, _ = metadata
+    return {'header': dba_headers, 'sensor_names': sensors,
+            'sensor_defs': sensor_defs}
+
+
+def _parse_dba_metadata(dba_file, sensors=None):
+    """Parse the header and sensor definitions of a dba file and project
+    them down to `sensors`.
+
+    Returns:
+        The header dictionary, the sensor names, the sensor definitions, the
+        table column indices of the sensors (None for all columns) and the
+        number of lines before the data table, or None on failure
+    """
     if not os.path.isfile(dba_file):
         logging.error('Invalid dba file: {:s}'.format(dba_file))
         return
-    t0 = time.time()
     try:
         with open(dba_file, 'r') as dbafid:
             # Parse the dba header
             dba_headers = _parse_dba_header(dbafid)
+            if not dba_headers:
+                return
             # Parse the dba sensor definitions
-            sensors, sensor_defs = _parse_dba_sensor_defs(dbafid)
+            parsed_sensor_defs = _parse_dba_sensor_defs(dbafid)
 
     except IOError as e:
         logging.error('Error opening {:s} dba file: {}'.format(
             dba_file, e))
         return
 
-    if not dba_headers or not sensor_defs:
+    if not parsed_sensor_defs:
         return
+    all_sensors, sensor_defs = parsed_sensor_defs
 
     # Figure out what line the data table begins on using the header's
     # num_ascii_tags + num_lable_lines
@@ -48,34 +125,23 @@ def parse_dba(dba_file, fast=False):
         return
     num_header_lines = int(dba_headers['num_ascii_tags'])
     num_label_lines = int(dba_headers['num_label_lines'])
-    num_columns = int(dba_headers['sensors_per_cycle'])
     # Total number of header lines before the data matrix starts
     total_header_lines = num_header_lines + num_label_lines
 
-    # Parse the ascii table portion of the dba file
-    if fast:
-        data = _fast_load_dba_data(dba_file, total_header_lines)
+    # Project the columns down to the requested sensors
+    usecols = None
+    if sensors is not None:
+        sensors, sensor_defs, usecols = _project_sensors(
+            sensors, all_sensors, sensor_defs)
+        if not usecols:
+            logger.warning(
+                'None of the requested sensors are in dba file: {:s}'.format(
+                    dba_file))
+            return
     else:
-        data = _load_dba_data(dba_file, total_header_lines)
-    if data is None:
-        return
-    elif len(data) == 0:
-        logger.info('Data length is 0 in dba file: {:s}'.format(
-            dba_file))
-        return
-    elif num_columns != data.shape[1]:
-        logger.warning(
-            'Glider data file does not have the same'
-            'number of columns as described in header.\n'
-            'described {:d}, actual {:d}'.format(
-                num_columns, data.shape[1])
-        )
-    t1 = time.time()
-    logger.debug("Time elapsed for parser, {:0.0f}".format(t1 - t0))
+        sensors = all_sensors
 
-    dba = {'header': dba_headers, 'sensor_names': sensors,
-           'sensor_defs': sensor_defs, 'data': data}
-    return dba
+    return dba_headers, sensors, sensor_defs, usecols, total_header_lines
 
 
 def _parse_dba_header(fid):
@@ -176,54 +242,195 @@ def _parse_dba_sensor_defs(fid):
     return sensors, sensor_defs
 
 
-def _load_dba_data(dba_file, num_header_lines=17):
+def _project_sensors(keep_sensors, sensors, sensor_defs):
+    """Reduce the sensor list and sensor definitions to the sensors in
+    `keep_sensors`, keeping the file column order.
+
+    Args:
+        keep_sensors: sensor names to keep
+        sensors: list of sensor names in file column order
+        sensor_defs: dictionary of sensor definitions keyed by sensor name
+
+    Returns:
+        The projected sensor list, the projected sensor definitions and the
+        file column indices of the projected sensors
+    """
+    keep_sensors = set(keep_sensors)
+    usecols = [ii for ii, sensor in enumerate(sensors)
+               if sensor in keep_sensors]
+    projected_sensors = [sensors[ii] for ii in usecols]
+    projected_defs = {
+        sensor: sensor_defs[sensor] for sensor in projected_sensors}
+    return projected_sensors, projected_defs, usecols
+
+
+def _load_dba_data(dba_file, num_header_lines=17, num_columns=None,
+                   usecols=None):
+    """Load the ascii data table of a dba file into a float64 array.
+
+    When `usecols` is given, only those columns are converted, by
+    np.loadtxt (see _load_table_columns).  Otherwise, or if that fails on a
+    bad line, the data block is read as bytes in one call and converted in
+    chunks of rows with numpy's C string parser into a preallocated array
+    sized from the number of lines and `num_columns`.
+    Lines with the wrong number of values (e.g. a truncated final line) or
+    unparseable values are skipped with a warning.  Blank lines are ignored.
+
+    Args:
+        dba_file: dba file to load
+        num_header_lines: total number of header and label lines before the
+            data table
+        num_columns: number of columns in the table (the `sensors_per_cycle`
+            header).  Default is to count the columns of the first data line.
+        usecols: optional list of column indices to keep
+
+    Returns:
+        An N rows x m columns array
+    """
+    t0 = time.time()
+    if usecols is not None and num_columns is not None:
+        data = _load_table_columns(
+            dba_file, num_header_lines, num_columns, usecols)
+        if data is not None:
+            logger.debug('DBD parsed in {:0.2f} seconds'.format(
+                time.time() - t0))
+            return data
 
-    # Use numpy.loadtxt to load the ascii table, skipping header rows and
-    # requiring a 2-D output array
     try:
-        t0 = time.time()
-        data_table = np.loadtxt(dba_file, skiprows=num_header_lines,
-                                ndmin=2)
-        t1 = time.time()
-        elapsed_time = t1 - t0
-        logger.debug('DBD parsed in {:0.0f} seconds'.format(
-            elapsed_time))
-    except ValueError as e:
-        logger.warning('Error parsing {:s} ascii data table: {:s}'.format(
+        with open(dba_file, 'rb') as fid:
+            for _ in range(num_header_lines):
+                fid.readline()
+            block = fid.read()
+    except IOError as e:
+        logger.warning('Error reading {:s} ascii data table: {}'.format(
             dba_file, e))
         return
 
-    return data_table
+    raw = np.frombuffer(block, dtype=np.uint8)
+    line_ends = np.flatnonzero(raw == _NEWLINE)
+    if len(raw) > 0 and raw[-1] != _NEWLINE:
+        # final line without a newline, e.g. a truncated file
+        line_ends = np.append(line_ends, len(raw))
+    line_starts = np.empty_like(line_ends)
+    line_starts[:1] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+
+    if num_columns is None:
+        first = next(
+            (block[a:b].split() for a, b in zip(line_starts, line_ends)
+             if block[a:b].strip()), [])
+        num_columns = len(first)
+    if usecols is None:
+        usecols = np.arange(num_columns)
+    else:
+        usecols = np.asarray(usecols, dtype=np.int64)
+
+    data = np.empty((len(line_ends), len(usecols)))
+    num_rows = 0
+    for chunk_start in range(0, len(line_ends), _ROW_CHUNK):
+        chunk_ends = line_ends[chunk_start:chunk_start + _ROW_CHUNK]
+        chunk_starts = line_starts[chunk_start:chunk_start + _ROW_CHUNK]
+        rows = _parse_table_chunk(
+            block, raw, chunk_starts, chunk_ends, num_columns, dba_file)
+        if rows is None:
+            continue
+        data[num_rows:num_rows + len(rows)] = rows[:, usecols]
+        num_rows += len(rows)
+
+    if num_rows < len(data):
+        data = data[:num_rows].copy()
+
+    elapsed_time = time.time() - t0
+    logger.debug('DBD parsed in {:0.2f} seconds'.format(elapsed_time))
+
+    return data
+
+
+def _load_table_columns(dba_file, num_header_lines, num_columns, usecols):
+    """Convert only the `usecols` columns of the data table with
+    np.loadtxt, which skips the other values without converting them, so a
+    few sensors of a wide table load faster than converting every value.
+
+    Only the final line is checked for `num_columns` values.  None is
+    returned if it does not have them, i.e. a truncated file, or if any line
+    is missing a kept column or has an unparseable kept value, for the
+    chunked parser to skip the bad lines instead.
+    """
+    try:
+        with open(dba_file, 'rb') as fid:
+            # the final line is within the last bytes of the file
+            fid.seek(0, os.SEEK_END)
+            fid.seek(max(0, fid.tell() - 64 * (num_columns + 16)))
+            tail = fid.read().rstrip()
+    except IOError:
+        return
+    last_start = tail.rfind(b'\n')
+    if last_start < 0 or len(tail[last_start:].split()) != num_columns:
+        return
+    try:
+        with warnings.catch_warnings():
+            # an empty table is returned as an empty array
+            warnings.simplefilter('ignore', UserWarning)
+            return np.loadtxt(
+                dba_file, dtype=np.float64, comments=None,
+                skiprows=num_header_lines, usecols=usecols, ndmin=2)
+    except ValueError:
+        return
 
 
-def _fast_load_dba_data(dba_file, num_header_lines=17):
+def _parse_table_chunk(block, raw, line_starts, line_ends, num_columns,
+                       dba_file):
+    """Parse the lines of the byte `block` between `line_starts` and
+    `line_ends` into a rows x `num_columns` array, skipping blank lines and
+    lines that do not have `num_columns` values."""
+    chunk = block[line_starts[0]:line_ends[-1]]
 
-    # Use numpy.loadtxt to load the ascii table, skipping header rows and
-    # requiring a 2-D output array
+    # fast path, every line has num_columns values.  dbd2asc writes complete
+    # lines, so a matching value count means the chunk is aligned
     try:
-        t0 = time.time()
-        # read each row of data & use np.array's ability to grab a
-        # column of an array
-        data = []
-        # pdb.set_trace()
-        line_num = 1
-        with open(dba_file, 'r') as dba_fid:
-            for line in dba_fid.readlines():
-                if line_num > num_header_lines:
-                    data.append(line.split())
-                line_num += 1
-        t1 = time.time()
-        elapsed_time = t1 - t0
-        logger.debug('DBD parsed in {:0.0f} seconds'.format(
-            elapsed_time))
-        data_array = np.array(
-            data, dtype=np.float)  # NOTE: this is an array of strings
-    except ValueError as e:
-        logger.warning('Error parsing {:s} ascii data table: {:s}'.format(
-            dba_file, e))
+        values = np.fromstring(chunk, dtype=np.float64, sep=' ')
+    except ValueError:
+        values = None
+    if values is not None and len(values) == len(line_ends) * num_columns:
+        return values.reshape((len(line_ends), num_columns))
+
+    # count the values on every line by finding where each token starts
+    chunk_raw = raw[line_starts[0]:line_ends[-1]]
+    is_space = (
+        (chunk_raw == _SPACE) | (chunk_raw == _TAB)
+        | (chunk_raw == _NEWLINE) | (chunk_raw == _RETURN)
+    )
+    token_starts = np.flatnonzero(~is_space & np.concatenate(
+        ([True], is_space[:-1])))
+    line_of_token = np.searchsorted(
+        line_ends - line_starts[0], token_starts, side='right')
+    counts = np.bincount(line_of_token, minlength=len(line_ends))
+    if (
+            values is not None
+            and np.all((counts == num_columns) | (counts == 0))
+            and len(values) == np.count_nonzero(counts) * num_columns
+    ):
+        # only blank lines in this chunk
+        return values.reshape((-1, num_columns))
+
+    # slow path, a ragged line or unparseable value exists in this chunk
+    rows = []
+    for start, end, count in zip(line_starts, line_ends, counts):
+        if count == 0:
+            continue
+        if count != num_columns:
+            logger.warning(
+                'Skipping dba line with {:d} of {:d} values in {:s}'.format(
+                    count, num_columns, dba_file))
+            continue
+        try:
+            rows.append(np.array(block[start:end].split(), dtype=np.float64))
+        except ValueError:
+            logger.warning('Skipping unparseable dba line in {:s}'.format(
+                dba_file))
+    if not rows:
         return
-
-    return data_array
+    return np.vstack(rows)
 
 
 def parse_dba_header(dba_file):
@@ -0,0 +1,471 @@
+"""Routines for parsing Slocum glider binary data files (.dbd, .ebd, .sbd,
+.tbd, .mbd, .nbd) directly, without first converting them to ascii dba tables
+with the Teledyne Webb Research shoreside executable `dbd2asc`.  The parsed
+output is the same dictionary returned by `ooidac.readers.slocum.parse_dba`
+so it can be used anywhere a parsed dba file is used.
+
+Binary file layout:
+    1. ascii header of `num_ascii_tags` "key: value" lines
+    2. ascii sensor list of `total_num_sensors` lines, unless the sensor list
+       is factored out (`sensor_list_factored: 1`), in which case it is read
+       from the `<sensor_list_crc>.cac` file in the cache directory
+    3. 16 known bytes used to determine the byte order of the file
+    4. data cycles, each beginning with the tag 'd', followed by
+       `state_bytes_per_cycle` bytes of 2-bit sensor states and then the
+       values of the sensors with new values
+    5. the end of file tag 'X'
+"""
+
+import os
+import re
+import logging
+import time
+import numpy as np
+from ooidac.readers.slocum import _project_sensors
+
+logger = logging.getLogger(os.path.basename(__name__))
+
+BINARY_DBD_LABEL = 'DBD(dinkum_binary_data)file'
+
+# 2-bit sensor states in the cycle state bytes
+_STATE_NOT_UPDATED = 0
+_STATE_SAME_VALUE = 1
+_STATE_NEW_VALUE = 2
+
+# numpy data types for the possible sensor byte sizes (without byte order)
+_BYTE_TYPES = {1: 'i1', 2: 'i2', 4: 'f4', 8: 'f8'}
+
+_SENSOR_LINE_REGEX = re.compile(
+    r'^s:\s+([TF])\s+(\d+)\s+(-?\d+)\s+(\d+)\s+(\S+)\s+(\S+)')
+
+# number of cycles decoded at a time, bounds the size of the temporary
+# offset arrays
+_CYCLE_CHUNK = 4096
+
+
+def is_binary_dbd(data_file):
+    """Check if a Slocum data file is a binary file rather than an ascii dba
+    table by reading the `dbd_label` of the first header line.
+
+    Args:
+        data_file: Slocum data file to check
+
+    Returns:
+        True if the file is a binary Slocum data file, False otherwise
+    """
+    try:
+        with open(data_file, 'rb') as fid:
+            first_line = fid.readline(128)
+    except IOError:
+        return False
+    return BINARY_DBD_LABEL.encode('ascii') in first_line
+
+
+def parse_binary(dbd_file, cac_dir=None, sensors=None):
+    """Parse a Slocum binary data file.
+
+    Args:
+        dbd_file: binary data file to parse
+        cac_dir: directory containing the `.cac` sensor list cache files.
+            Only required if the sensor list is factored out of the file.
+            Defaults to a `cache` directory next to the data file.
+        sensors: optional list of sensor names to keep.  Values of any other
+            sensors are skipped and never decoded.  Sensors in the list that
+            are not in the file are ignored.  Default is to keep all sensors.
+
+    Returns: A dictionary containing the file metadata, sensor defintions
+    and data
+    """
+    if not os.path.isfile(dbd_file):
+        logger.error('Invalid binary data file: {:s}'.format(dbd_file))
+        return
+    t0 = time.time()
+    try:
+        with open(dbd_file, 'rb') as fid:
+            buf = fid.read()
+    except IOError as e:
+        logger.error('Error opening {:s} binary data file: {}'.format(
+            dbd_file, e))
+        return
+
+    headers, pos = _parse_binary_header(buf, dbd_file)
+    if not headers:
+        return
+
+    num_sensors = int(headers['total_num_sensors'])
+    if int(headers.get('sensor_list_factored', 0)):
+        sensor_lines = _read_cac_file(
+            headers['sensor_list_crc'], dbd_file, cac_dir)
+    else:
+        sensor_lines, pos = _read_lines(buf, pos, num_sensors)
+    sensor_list = _parse_sensor_list(headers, sensor_lines, dbd_file, sensors)
+    if sensor_list is None:
+        return
+    sensors, sensor_defs, sensor_bytes, usecols = sensor_list
+
+    byte_order = _get_byte_order(buf, pos)
+    if byte_order is None:
+        logger.warning('Bad known bytes cycle: {:s}'.format(dbd_file))
+        return
+    pos += 16
+
+    data = _decode_cycles(
+        buf, pos, sensor_bytes, int(headers['state_bytes_per_cycle']),
+        byte_order, dbd_file, usecols)
+    if len(data) == 0:
+        logger.info('Data length is 0 in binary data file: {:s}'.format(
+            dbd_file))
+        return
+    t1 = time.time()
+    logger.debug("Time elapsed for binary parser, {:0.2f}".format(t1 - t0))
+
+    dba = {'header': headers, 'sensor_names': sensors,
+           'sensor_defs': sensor_defs, 'data': data}
+    return dba
+
+
+def parse_binary_sensors(dbd_file, cac_dir=None, sensors=None):
+    """Parse only the header and sensor list of a Slocum binary data file,
+    without decoding the data cycles.
+
+    Args:
+        dbd_file: binary data file to parse
+        cac_dir: directory containing the `.cac` sensor list cache files
+        sensors: optional list of sensor names to keep
+
+    Returns: A dictionary containing the file metadata and sensor
+    defintions, the same as parse_binary without the 'data' item
+    """
+    if not os.path.isfile(dbd_file):
+        logger.error('Invalid binary data file: {:s}'.format(dbd_file))
+        return
+    with open(dbd_file, 'rb') as fid:
+        buf = fid.read(4096)
+        headers, pos = _parse_binary_header(buf, dbd_file)
+        if not headers:
+            return
+        num_sensors = int(headers['total_num_sensors'])
+        if int(headers.get('sensor_list_factored', 0)):
+            sensor_lines = _read_cac_file(
+                headers['sensor_list_crc'], dbd_file, cac_dir)
+        else:
+            fid.seek(pos)
+            sensor_lines = [
+                fid.readline().decode('ascii', 'replace').strip()
+                for _ in range(num_sensors)]
+    sensor_list = _parse_sensor_list(headers, sensor_lines, dbd_file, sensors)
+    if sensor_list is None:
+        return
+    sensors, sensor_defs, _, _ = sensor_list
+    return {'header': headers, 'sensor_names': sensors,
+            'sensor_defs': sensor_defs}
+
+
+def parse_binary_header(dbd_file):
+    """Parse only the ascii header of a Slocum binary data file.
+
+    Args:
+        dbd_file: binary data file to parse
+
+    Returns:
+        A dictionary containing the file metadata
+    """
+    if not os.path.isfile(dbd_file):
+        logger.error('Invalid binary data file: {:s}'.format(dbd_file))
+        return
+    with open(dbd_file, 'rb') as fid:
+        # headers are well under 1 kB, but read more to be safe
+        buf = fid.read(4096)
+    headers, _ = _parse_binary_header(buf, dbd_file)
+    return headers
+
+
+def _read_lines(buf, pos, num_lines):
+    """Read `num_lines` ascii lines from the byte buffer starting at `pos`.
+
+    Returns:
+        A list of the stripped lines and the byte position after the lines
+    """
+    lines = []
+    for _ in range(num_lines):
+        end = buf.find(b'\n', pos)
+        if end < 0:
+            return None, pos
+        lines.append(buf[pos:end].decode('ascii', 'replace').strip())
+        pos = end + 1
+    return lines, pos
+
+
+def _parse_binary_header(buf, dbd_file):
+    """Parse the ascii header at the start of a binary data file buffer.
+    All header lines of the format 'key: value' are parsed.
+
+    Returns:
+        A dictionary containing the file metadata and the byte position
+        after the header
+    """
+    headers = {}
+    pos = 0
+    num_ascii_tags = None
+    while num_ascii_tags is None or len(headers) < num_ascii_tags:
+        lines, new_pos = _read_lines(buf, pos, 1)
+        if not lines:
+            break
+        tokens = lines[0].split(':', 1)
+        if len(tokens) != 2:
+            break
+        key = tokens[0].strip()
+        headers[key] = tokens[1].strip()
+        pos = new_pos
+        if key == 'num_ascii_tags':
+            num_ascii_tags = int(headers[key])
+
+    if not headers:
+        logger.warning('No headers parsed: {:s}'.format(dbd_file))
+        return None, pos
+
+    if num_ascii_tags is None:
+        logger.warning('num_ascii_tags header line missing: {:s}'.format(
+            dbd_file))
+        return None, pos
+    if len(headers) != num_ascii_tags:
+        logger.warning(
+            'Unexpected number of header fields: {:s}'.format(dbd_file))
+        return None, pos
+
+    for required in ['total_num_sensors', 'sensors_per_cycle',
+                     'state_bytes_per_cycle']:
+        if required not in headers:
+            logger.warning('{:s} header line missing: {:s}'.format(
+                required, dbd_file))
+            return None, pos
+
+    # Add the full path to the data file
+    headers['full_path'] = os.path.realpath(dbd_file)
+    headers['source_file'] = os.path.basename(dbd_file)
+    # Add the data file size
+    headers['file_size_bytes'] = os.stat(dbd_file).st_size
+
+    return headers, pos
+
+
+def _read_cac_file(sensor_list_crc, dbd_file, cac_dir=None):
+    """Read the sensor list lines from a `.cac` sensor list cache file"""
+    if cac_dir is None:
+        cac_dir = os.path.join(
+            os.path.dirname(os.path.realpath(dbd_file)), 'cache')
+    cac_file = os.path.join(cac_dir, '{:s}.cac'.format(sensor_list_crc.lower()))
+    if not os.path.isfile(cac_file):
+        cac_file = os.path.join(
+            cac_dir, '{:s}.CAC'.format(sensor_list_crc.upper()))
+    if not os.path.isfile(cac_file):
+        logger.warning(
+            'Sensor list is factored and cache file {:s}.cac not found in '
+            '{:s}: {:s}'.format(sensor_list_crc, cac_dir, dbd_file))
+        return
+    with open(cac_file, 'r') as fid:
+        return [line.strip() for line in fid if line.strip()]
+
+
+def _parse_sensor_list(headers, sensor_lines, dbd_file, sensors=None):
+    """Parse the sensor list lines and project them down to `sensors`.
+
+    Returns:
+        The sensor names, the sensor definitions, the number of bytes of
+        every sensor in the cycles and the cycle indices of the sensors, or
+        None on failure
+    """
+    if not sensor_lines:
+        return
+
+    all_sensors, sensor_defs, sensor_bytes = _parse_binary_sensor_defs(
+        sensor_lines)
+    if not all_sensors:
+        logger.warning(
+            'No sensor definitions parsed: {:s}'.format(dbd_file))
+        return
+    if len(all_sensors) != int(headers['sensors_per_cycle']):
+        logger.warning(
+            'Binary data file does not have the same number of cycle sensors '
+            'as described in header.\ndescribed {:s}, actual {:d}'.format(
+                headers['sensors_per_cycle'], len(all_sensors))
+        )
+        return
+
+    # Project the columns down to the requested sensors
+    if sensors is not None:
+        sensors, sensor_defs, usecols = _project_sensors(
+            sensors, all_sensors, sensor_defs)
+        if not usecols:
+            logger.warning(
+                'None of the requested sensors are in binary data file: '
+                '{:s}'.format(dbd_file))
+            return
+    else:
+        sensors = all_sensors
+        usecols = np.arange(len(all_sensors))
+
+    return sensors, sensor_defs, sensor_bytes, usecols
+
+
+def _parse_binary_sensor_defs(sensor_lines):
+    """Parse the binary sensor list lines of the format:
+        s: T    0    0 8 m_present_time timestamp
+    with fields: in this file (T/F), sensor number, index in the cycle,
+    bytes, sensor name, units.
+
+    Returns:
+        The list of sensor names in cycle order, the sensor definitions
+        dictionary and an array of the number of bytes for each sensor
+    """
+    cycle_sensors = []
+    for line in sensor_lines:
+        match = _SENSOR_LINE_REGEX.search(line)
+        if not match:
+            logger.warning('Invalid sensor line: {:s}'.format(line))
+            continue
+        in_file, _, cycle_index, num_bytes, name, units = match.groups()
+        if in_file != 'T' or int(cycle_index) < 0:
+            continue
+        cycle_sensors.append((int(cycle_index), name, units, int(num_bytes)))
+    cycle_sensors.sort()
+
+    sensors = []
+    sensor_defs = {}
+    sensor_bytes = np.empty(len(cycle_sensors), dtype=np.int64)
+    for ii, (_, name, units, num_bytes) in enumerate(cycle_sensors):
+        sensors.append(name)
+        sensor_bytes[ii] = num_bytes
+        sensor_defs[name] = {
+            'sensor_name': name,
+            'attrs': {
+                'units': units, 'bytes': num_bytes,
+                'source_sensor': name, 'long_name': name
+            },
+        }
+    return sensors, sensor_defs, sensor_bytes
+
+
+def _get_byte_order(buf, pos):
+    """Determine the byte order from the known bytes cycle, which is the tag
+    's', the tag 'a', the int16 0x1234, the float32 123.456 and the float64
+    123456789.12345
+
+    Returns:
+        '>' for big endian, '<' for little endian or None if the known bytes
+        are not found
+    """
+    if buf[pos:pos + 2] != b'sa':
+        return
+    for byte_order in ['>', '<']:
+        if np.frombuffer(buf, byte_order + 'i2', 1, pos + 2)[0] == 0x1234:
+            known_double = np.frombuffer(buf, byte_order + 'f8', 1, pos + 8)[0]
+            if abs(known_double - 123456789.12345) < 1e-3:
+                return byte_order
+    return
+
+
+def _decode_cycles(
+        buf, pos, sensor_bytes, state_bytes, byte_order, dbd_file, usecols):
+    """Decode the bit-packed data cycles into an N cycles x m sensors float64
+    array of the sensor columns in `usecols`.  Sensors not updated in a cycle
+    are NaN and sensors updated with the same value are filled with their
+    previous value, as `dbd2asc` does.
+    """
+    num_sensors = len(sensor_bytes)
+    usecols = np.asarray(usecols)
+    use_bytes = sensor_bytes[usecols]
+    raw = np.frombuffer(buf, dtype=np.uint8)
+
+    # For each state byte position, a lookup table of the number of data bytes
+    # contributed by each possible state byte value.  Each state byte holds the
+    # 2-bit states of 4 sensors, most significant bits first.
+    padded_bytes = np.zeros(state_bytes * 4, dtype=np.int64)
+    padded_bytes[:num_sensors] = sensor_bytes
+    byte_values = np.arange(256)
+    shifts = np.array([6, 4, 2, 0])
+    new_values = ((byte_values[:, None] >> shifts) & 3) == _STATE_NEW_VALUE
+    cycle_length_lut = new_values.astype(np.int64) @ padded_bytes.reshape(
+        state_bytes, 4).T  # 256 x state_bytes
+    cycle_length_lut = np.ascontiguousarray(cycle_length_lut.T)
+    state_positions = np.arange(state_bytes)
+
+    # Walk the cycles to find where each cycle's state bytes begin, since the
+    # cycle length depends on its state bytes
+    cycle_starts = []
+    end = len(buf)
+    while pos < end:
+        tag = buf[pos]
+        if tag == 0x64:  # 'd'
+            state_start = pos + 1
+            if state_start + state_bytes > end:
+                logger.warning(
+                    'Truncated data cycle in {:s}'.format(dbd_file))
+                break
+            cycle_length = int(cycle_length_lut[
+                state_positions,
+                raw[state_start:state_start + state_bytes]].sum())
+            if state_start + state_bytes + cycle_length > end:
+                logger.warning(
+                    'Truncated data cycle in {:s}'.format(dbd_file))
+                break
+            cycle_starts.append(state_start)
+            pos = state_start + state_bytes + cycle_length
+        elif tag == 0x58:  # 'X'
+            break
+        else:
+            logger.warning(
+                'Unexpected cycle tag {!r} at byte {:d} in {:s}'.format(
+                    chr(tag), pos, dbd_file))
+            break
+
+    num_cycles = len(cycle_starts)
+    data = np.full((num_cycles, len(usecols)), np.nan)
+    if num_cycles == 0:
+        return data
+    cycle_starts = np.array(cycle_starts, dtype=np.int64)
+    states = np.empty((num_cycles, len(usecols)), dtype=np.uint8)
+    byte_offsets = np.arange(state_bytes)
+
+    for chunk_start in range(0, num_cycles, _CYCLE_CHUNK):
+        chunk = slice(chunk_start, chunk_start + _CYCLE_CHUNK)
+        starts = cycle_starts[chunk]
+        bits = np.unpackbits(raw[starts[:, None] + byte_offsets], axis=1)
+        chunk_states = (bits[:, 0::2] << 1 | bits[:, 1::2])[:, :num_sensors]
+        states[chunk] = chunk_states[:, usecols]
+
+        # byte offset of every new value within the file buffer.  All
+        # sensors are needed for the offsets, but only the kept sensors are
+        # decoded.
+        new_value = chunk_states == _STATE_NEW_VALUE
+        sizes = np.where(new_value, sensor_bytes, 0)
+        offsets = np.cumsum(sizes, axis=1)
+        offsets -= sizes
+        offsets = offsets[:, usecols]
+        offsets += (starts + state_bytes)[:, None]
+        new_value = new_value[:, usecols]
+
+        for num_bytes, type_str in _BYTE_TYPES.items():
+            rows, cols = np.nonzero(
+                new_value & (use_bytes == num_bytes)[None, :])
+            if len(rows) == 0:
+                continue
+            value_bytes = raw[
+                offsets[rows, cols][:, None] + np.arange(num_bytes)]
+            values = value_bytes.view(byte_order + type_str).ravel()
+            data[rows + chunk_start, cols] = values
+
+    # Fill the sensors updated with the same value with the previous value
+    same_cols = np.flatnonzero(np.any(states == _STATE_SAME_VALUE, axis=0))
+    if len(same_cols) > 0:
+        col_states = states[:, same_cols]
+        last_new = np.where(
+            col_states == _STATE_NEW_VALUE,
+            np.arange(num_cycles)[:, None], -1)
+        np.maximum.accumulate(last_new, axis=0, out=last_new)
+        rows, cols = np.nonzero(
+            (col_states == _STATE_SAME_VALUE) & (last_new >= 0))
+        data[rows, same_cols[cols]] = data[last_new[rows, cols],
+                                           same_cols[cols]]
+
+    return data
@@ -82,6 +82,188 @@ def cluster_index(indices, ids=False):
     return index
 
 
+def index_runs(indices):
+    """Run-length encode the runs of consecutive values in an increasing
+    integer array, e.g. the rows where a condition is True.
+
+    :param indices: increasing array of integers
+    :return: arrays of the first value of each run and of one past its last
+        value, e.g. [1, 2, 3, 7, 8] gives [1, 7] and [4, 9]
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    clusters = cluster_index(indices)
+    run_firsts = np.flatnonzero(np.diff(clusters)) + 1
+    starts = indices[np.concatenate(([0], run_firsts))]
+    stops = indices[np.concatenate((run_firsts - 1, [len(indices) - 1]))] + 1
+    return starts, stops
+
+
+def runs_to_indices(starts, stops):
+    """Return the increasing array of all the integers in the runs
+    `starts[ii]` to `stops[ii]` (exclusive), the inverse of `index_runs`"""
+    lengths = stops - starts
+    if len(lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = starts - np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.arange(lengths.sum()) + np.repeat(offsets, lengths)
+
+
+def indices_in_ranges(indices, ranges):
+    """Return the positions in the increasing array `indices` of the indices
+    in each of the row `ranges`, concatenated in range order, and the offsets
+    of each range in the positions, so the positions of range `ii` are
+    `positions[offsets[ii]:offsets[ii + 1]]`.
+
+    :param indices: increasing array of row indices, e.g.
+        GliderData.finite_indices
+    :param ranges: P x 2 array of the first row and the end row (exclusive)
+        of each range, e.g. Profiles.ranges
+    :return: positions, offsets
+    """
+    ranges = np.asarray(ranges).reshape(-1, 2)
+    lows = np.searchsorted(indices, ranges[:, 0])
+    highs = np.searchsorted(indices, ranges[:, 1])
+    offsets = np.concatenate(([0], np.cumsum(highs - lows)))
+    return runs_to_indices(lows, highs), offsets
+
+
+def reduce_ranges(ufunc, values, ranges, empty=np.nan):
+    """Reduce `values` over each of the `ranges` with `ufunc`, e.g.
+    `np.add` for the sums or `np.fmax` for the NaN ignoring maxima, with one
+    `ufunc.reduceat` call.  The ranges may overlap and may be empty.
+
+    :param ufunc: binary numpy ufunc
+    :param values: 1-D array
+    :param ranges: P x 2 array of the first and the end (exclusive) index of
+        each range
+    :param empty: Optional, result of the empty ranges.  Default is NaN.
+    :return: array of the P reductions
+    """
+    values = np.asarray(values)
+    ranges = np.asarray(ranges).reshape(-1, 2)
+    result = np.full(len(ranges), empty, dtype=np.result_type(values, empty))
+    nonempty = ranges[:, 1] > ranges[:, 0]
+    if np.any(nonempty):
+        # reduceat reduces from each index to the next one, so the start and
+        # end of every range are interleaved and every other result is used.
+        # The padding keeps the end of a range at the last value in bounds.
+        padded = np.concatenate((values, values[-1:]))
+        result[nonempty] = ufunc.reduceat(padded, ranges[nonempty].ravel())[::2]
+    return result
+
+
+class TimeInterpolator(object):
+    """Linearly interpolate columns sampled at `source_times` onto
+    `target_times`, the same as
+    `np.interp(target_times, source_times[finites], column[finites])`
+    for each column, where `finites` are the rows where both the column and
+    the source time are finite.
+
+    The binary search of the target times is done once per pattern of
+    finite rows and reused for every column with that pattern, and the
+    columns sharing a pattern are interpolated together as one 2-D array.
+    Results of read-only columns (e.g. from `GliderData.getdata`) are cached
+    by column identity, so resampling the same column again is free.
+
+    E.G.
+    > interp = TimeInterpolator(timestamps, oxy_ts)
+    > sp, p, t = interp.resample(sp, p, t)
+    """
+
+    def __init__(self, source_times, target_times):
+        """
+        :param source_times: increasing timestamps of the columns to resample
+        :param target_times: timestamps to resample the columns onto
+        """
+        self.source_times = np.asarray(source_times, dtype=np.float64)
+        self.target_times = np.asarray(target_times, dtype=np.float64)
+        self._source_finites = np.isfinite(self.source_times)
+        self._searches = {}
+        self._results = {}
+
+    def resample(self, *columns):
+        """Interpolate each column onto the target times.  Target times
+        outside of the finite data of a column get its first or last finite
+        value and a column without finite data resamples to all NaNs.
+
+        :param columns: arrays the same length as the source times
+        :return: the resampled array, or a list of them if more than one
+            column is given
+        """
+        resampled = [None] * len(columns)
+        groups = {}
+        for ii, column in enumerate(columns):
+            column = np.asarray(column)
+            cached = self._results.get(id(column))
+            if cached is not None and cached[0] is column:
+                resampled[ii] = cached[1]
+                continue
+            finites = np.isfinite(column) & self._source_finites
+            key = np.packbits(finites).tobytes()
+            groups.setdefault(key, (finites, []))[1].append(ii)
+
+        for key, (finites, members) in groups.items():
+            values = np.array([
+                np.asarray(columns[ii], dtype=np.float64)[finites]
+                for ii in members])
+            for ii, result in zip(members, self._interp(key, finites, values)):
+                column = np.asarray(columns[ii])
+                if not column.flags.writeable:
+                    result.flags.writeable = False
+                    self._results[id(column)] = (column, result)
+                resampled[ii] = result
+
+        if len(resampled) == 1:
+            return resampled[0]
+        return resampled
+
+    def _search(self, key, finites):
+        """Return the search results of the target times in the finite source
+        times, cached by the pattern of finite rows"""
+        search = self._searches.get(key)
+        if search is not None:
+            return search
+        xp = self.source_times[finites]
+        x = self.target_times
+        search = {'num_points': len(xp)}
+        if len(xp) >= 2:
+            # xp[j] <= x < xp[j + 1], clipped to the first and last interval
+            j = np.clip(
+                np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 2)
+            search.update(
+                j=j,
+                dx=x - xp[j],
+                dxp=xp[j + 1] - xp[j],
+                exact=x == xp[j],
+                first=x < xp[0],
+                last=x >= xp[-1],
+                nans=np.isnan(x))
+        self._searches[key] = search
+        return search
+
+    def _interp(self, key, finites, values):
+        search = self._search(key, finites)
+        num_targets = len(self.target_times)
+        if search['num_points'] == 0:
+            return np.full((len(values), num_targets), np.nan)
+        if search['num_points'] == 1:
+            return np.repeat(values, num_targets, axis=1)
+        j = search['j']
+        fp_j = values[:, j]
+        # repeated source times only give zero width intervals outside of
+        # the source time range, which are replaced below
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (values[:, j + 1] - fp_j) / search['dxp']
+            resampled = np.where(
+                search['exact'], fp_j, slope * search['dx'] + fp_j)
+        resampled[:, search['first']] = values[:, :1]
+        resampled[:, search['last']] = values[:, -1:]
+        resampled[:, search['nans']] = np.nan
+        return resampled
+
+
 def nan_array_equal(arr1, arr2):
     finites1 = np.isfinite(arr1)
     finites2 = np.isfinite(arr2)
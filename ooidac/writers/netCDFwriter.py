@@ -1126,6 +1126,13 @@ class NetCDFWriter(object):
                 'NetCDF variable {:s} not created'.format(var_name))
             return
 
+        # NaN can not be stored in integer variables, mask them so they are
+        # written as the _FillValue
+        if datatype['type'][:1] in ('i', 'u'):
+            finites = np.isfinite(var_data)
+            var_data = np.ma.array(
+                np.where(finites, var_data, 0), mask=~finites)
+
         # Add the variable data
         try:
             self._nc.variables[datatype['nc_var_name']][:] = var_data
@@ -1272,6 +1279,23 @@ class NetCDFWriter(object):
             self.update_sensor_def(sensor, sensor_defs[sensor],
                                    override=override)
 
+            # the storage type of a compact GliderData sensor is used as the
+            # NetCDF variable type, unless a fill value is configured for
+            # the variable's type
+            data_type = sensor_defs[sensor].get('type')
+            nc_sensor_def = self._nc_sensor_defs[sensor]
+            if (
+                    data_type in NC_FILL_VALUES
+                    and data_type != nc_sensor_def.get('type')
+                    and not nc_sensor_def.get('attrs', {}).get('_FillValue')
+                    and not nc_sensor_def.get('attrs', {}).get(
+                        'missing_value')
+            ):
+                self._logger.debug(
+                    'Using data file type {:s} for {:s}'.format(
+                        data_type, sensor))
+                nc_sensor_def['type'] = data_type
+
     def _update_sensor_defs(self):
         """Updates the sensor definition dicts in self._default_sensor_defs
         with key,value pairs in self._config_sensor_defs if the key is missing
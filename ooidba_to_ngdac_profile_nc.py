@@ -8,6 +8,8 @@ import shutil
 # import pdb
 import glob
 import json
+import functools
+import tracemalloc
 # temporary addition to test this script -SP 2019-01-30 to be able to load
 # gncutils -SP 2019-03-11 Maybe don't need after all.  We'll see.
 # sys.path.append('C:\\Users\\spearce\\code\\python\\gliderdac\\')
@@ -18,10 +20,16 @@ from ooidac.validate import validate_sensors, validate_ngdac_var_names
 
 import ooidac.processing as processing
 from ooidac.data_classes import DbaData
+from ooidac.readers import segment_cache
+from ooidac.catalog import DeploymentCatalog
 from ooidac.profiles import Profiles
+from ooidac.filter_registry import FilterRegistry
+from ooidac.pipeline import ProcessingStep, ProcessingPipeline
 from ooidac.data_checks import check_file_goodness, check_for_dav_sensors
 from ooidac.constants import SCI_CTD_SENSORS
+from ooidac.ctd import CTD_PRODUCTS
 from dba_file_sorter import sort_function
+import profile_filters
 
 
 def main(args):
@@ -131,6 +139,25 @@ def main(args):
         sys.stdout.write('{}\n'.format(ncw))
         return 0
 
+    # Only parse the sensors that are processed or written to the NetCDF
+    # files, unless all sensors are requested
+    if args.all_sensors:
+        parse_sensors = None
+    else:
+        parse_sensors = processing.processing_sensor_list(ncw.nc_sensor_defs)
+
+    # Reuse parsed data files from earlier runs
+    if args.segment_cache:
+        segment_cache.enable_cache(
+            args.segment_cache, max_size_mb=args.segment_cache_size)
+
+    # Index the data files by mission and segment number from their headers
+    # to look up the following segments of each file
+    catalog = DeploymentCatalog(args.catalog)
+    catalog.scan(dba_files)
+    if args.catalog:
+        catalog.save()
+
     # update the logging format so that indentation can show log statements
     # sub-level to the file being processed after an initial processing file
     # statement
@@ -140,23 +167,16 @@ def main(args):
     source_dba_files = []
     processed_dbas = []
 
-    # Pre-processing
-    # ToDo: clean this up
-    if 'corrected_oxygen' in ncw.config_sensor_defs:
-        calc_type = ncw.config_sensor_defs['corrected_oxygen']['attrs'][
-            'calculation_type']
-        cal_dict = ncw.config_sensor_defs['corrected_oxygen']['attrs'].pop(
-            'cal_coefs')
-    if 'corrected_chlor' in ncw.config_sensor_defs:
-        darkoffset = ncw.config_sensor_defs['corrected_chlor']['attrs'][
-            'dark_offset']
-        sf = ncw.config_sensor_defs['corrected_chlor']['attrs'][
-            'scale_factor']
-    if 'corrected_par' in ncw.config_sensor_defs:
-        sensor_dark = ncw.config_sensor_defs['corrected_par']['attrs'][
-            'sensor_dark']
-        sf = ncw.config_sensor_defs['corrected_par']['attrs'][
-            'scale_factor']
+    # The processing steps that add derived sensors to each data file, see
+    # ooidac/pipeline.py.  Only the steps producing sensors mapped in
+    # sensor_defs.json (and the steps they depend on) are run
+    pipeline = build_pipeline(ncw)
+    if args.profile_steps:
+        tracemalloc.start()
+
+    # The profile filters of profile_filters.py, ordered by their observed
+    # rejection rate per unit of cost over the data files of this run
+    filter_registry = FilterRegistry.from_module(profile_filters)
 
     for dba_file in dba_files:
         # change to non-indented log format (see above)
@@ -172,18 +192,21 @@ def main(args):
         logmanager.update_format(run_log_format)
 
         # Parse the dba file
-        dba = DbaData(dba_file)
+        dba = DbaData(
+            dba_file, cac_dir=args.cac_dir, sensors=parse_sensors,
+            compact=args.compact, sparse=args.sparse)
 
-        if dba is None or dba.N == 0:
-            logging.warning('Skipping empty data file: {:s}'.format(dba_file))
-            continue
-        mission = dba.file_metadata['mission_name'].upper()
+        # check the mission before the data table is loaded by dba.N
+        mission = dba.file_metadata.get('mission_name', '').upper()
         if (
                 mission == 'STATUS.MI'
                 or mission == 'LASTGASP.MI'
                 or mission == 'INITIAL.MI'):
             logging.info('Skipping {:s} data file'.format(mission))
             continue
+        if dba.N == 0:
+            logging.warning('Skipping empty data file: {:s}'.format(dba_file))
+            continue
 
         # check the data file for the required sensors and that science data
         # exists in the file.  True or False returned.  See data_checks.py
@@ -211,73 +234,13 @@ def main(args):
         dba = processing.replace_missing_sensors(
             dba,file_check.avail_sci_data)
 
-        # This processing step adds time dependent coordinate variables
-        # (designated by the prefix llat [lat, lon, altitude, time]) which are
-        # created and added to the data instance with metadata attributes.
-        # This step is required before the other processing module steps.  The
-        # variable llat_time is derived from `m_present_time`,
-        # llat_latitude/longitude are filled by linear interpolation from
-        # `m_gps_lat/lon`, llat_pressure is derived from converting
-        # `sci_water_pressure` to dbar, and llat_depth is derived from
-        # `llat_pressure` converted to depth using the Python TEOS-10 GSW
-        # package
-        dba = processing.create_llat_sensors(dba)
+        # Add the derived sensors (llat coordinates, pitch and roll,
+        # salinity and density, oxygen, ...), see build_pipeline below
+        dba = pipeline.run(dba)
         if dba is None:
             continue
 
-        # Convert m_pitch and m_roll variables to degrees, and add back to
-        # the data instance with metadata attributes
-        if 'm_pitch' in dba.sensor_names and 'm_roll' in dba.sensor_names:
-            dba = processing.pitch_and_roll(dba)
-            if dba is None:
-                continue
-
-        # Convert `sci_water_cond/temp/ & pressure` to `salinity` and `density`
-        # and adds them back to the data instance with metadata attributes.
-        # Requires `llat_latitude/longitude` variables are in the data
-        # instance from the `create_llat_sensors` method
-        dba = processing.ctd_data(dba, SCI_CTD_SENSORS)
-        if dba is None:
-            continue
-
-        # Process `sci_oxy4_oxygen` to OOI L2 compensated for salinity and
-        # pressure and converted to umol/kg.
-        if 'corrected_oxygen' in ncw.config_sensor_defs:
-            calc_type = ncw.config_sensor_defs['corrected_oxygen']['attrs'][
-                'calculation_type']
-            dba = processing.check_and_recalc_o2(dba, calc_type, cal_dict)
-            dba = processing.o2_s_and_p_comp(dba, 'corrected_oxygen')
-        elif 'sci_oxy4_oxygen' in dba.sensor_names:
-            dba = processing.o2_s_and_p_comp(dba)
-            if dba is None:
-                continue
-
-        # Re_calculate chlorophyll
-        if 'corrected_chlor' in ncw.config_sensor_defs:
-            darkoffset = ncw.config_sensor_defs['corrected_chlor']['attrs'][
-                'dark_offset']
-            sf = ncw.config_sensor_defs['corrected_chlor']['attrs'][
-                'scale_factor']
-            dba = processing.recalc_chlor(
-                dba, dark_offset=darkoffset, scale_factor=sf)
-            if dba is None:
-                continue
-
-        # Re_calculate PAR
-        if 'corrected_par' in ncw.config_sensor_defs:
-            sensor_dark = ncw.config_sensor_defs['corrected_par']['attrs'][
-                'sensor_dark']
-            sf = ncw.config_sensor_defs['corrected_par']['attrs'][
-                'scale_factor']
-            dba = processing.recalc_par(
-                dba, sensor_dark=sensor_dark, scale_factor=sf)
-            if dba is None:
-                continue
-
-        if 'sci_flbbcd_bb_units' in dba.sensor_names:
-            dba = processing.backscatter_total(dba)
-            if dba is None:
-                continue
+        if 'backscatter' in dba.sensor_names:
             radiation_wavelength = {
                 'data': 700,
                 'attrs': {'units': 'nm'},
@@ -301,9 +264,9 @@ def main(args):
             # the calculation occurs, if it cannot, it will get either
             # `m_initial_water_vx/vy` or `m_water_vx/vy` from the current
             # segement file.
-            dba_index = dba_files.index(dba_file)
-            next2files = dba_files[dba_index + 1:dba_index + 3]
-            vx, vy = processing.get_u_and_v(dba, check_files=next2files)
+            next2files = catalog.next_segments(dba_file, 2)
+            vx, vy = processing.get_u_and_v(
+                dba, check_files=next2files, catalog=catalog)
 
             scalars.extend([seg_time, seg_lat, seg_lon, vx, vy])
 
@@ -322,9 +285,9 @@ def main(args):
         profiles.find_profiles_by_depth()
 
         # See profile_filters.py for which filters are applied
-        profiles.filter_profiles()
+        profiles.filter_profiles(registry=filter_registry)
 
-        if len(profiles.indices) == 0:
+        if len(profiles) == 0:
             logging.info('No profiles indexed: {:s}'.format(dba_file))
             continue
 
@@ -365,6 +328,21 @@ def main(args):
             ncw.tmp_dir)
         )
 
+    if args.segment_cache:
+        segment_cache.get_cache().flush()
+
+    if args.profile_steps:
+        tracemalloc.stop()
+        sys.stdout.write('Processing steps:\n')
+        sys.stdout.write(pipeline.report())
+
+    if args.filter_stats:
+        logging.debug('Writing profile filter statistics to {:s}'.format(
+            args.filter_stats))
+        filter_registry.write(args.filter_stats)
+        sys.stdout.write('Profile filters:\n')
+        sys.stdout.write(filter_registry.report())
+
     # write the processed files and last profile id to status.json
     logging.debug('Writing run status to status.json')
     status['next_profile_id'] = ncw.profile_id
@@ -382,6 +360,91 @@ def main(args):
     return 0
 
 
+def build_pipeline(ncw):
+    """Return the ProcessingPipeline of the derived sensors written to the
+    NetCDF files configured in `ncw`
+
+    :param ncw: NetCDFWriter instance
+    :return: ProcessingPipeline instance
+    """
+    steps = [
+        # Adds the time dependent coordinate variables (designated by the
+        # prefix llat [lat, lon, altitude, time]).  llat_time is derived from
+        # `m_present_time`, llat_latitude/longitude are filled by linear
+        # interpolation from `m_gps_lat/lon`, llat_pressure is derived from
+        # converting `sci_water_pressure` to dbar, and llat_depth is derived
+        # from `llat_pressure` converted to depth using the Python TEOS-10
+        # GSW package
+        ProcessingStep(
+            'create_llat_sensors', processing.create_llat_sensors,
+            outputs=LLAT_SENSORS, required=True),
+        # Convert m_pitch and m_roll variables to degrees
+        ProcessingStep(
+            'pitch_and_roll', processing.pitch_and_roll,
+            inputs=['m_pitch', 'm_roll'], outputs=['pitch', 'roll']),
+        # Convert `sci_water_cond/temp/ & pressure` to `salinity`, `density`,
+        # `sound_speed` and the other CTD products, calculated together and
+        # reused by the oxygen compensation
+        ProcessingStep(
+            'ctd_data',
+            functools.partial(
+                processing.ctd_data, ctd_sensors=SCI_CTD_SENSORS),
+            inputs=SCI_CTD_SENSORS,
+            outputs=CTD_PRODUCTS,
+            required=True),
+    ]
+
+    # Process `sci_oxy4_oxygen` to OOI L2 compensated for salinity and
+    # pressure and converted to umol/kg.  If calibration coefficients are
+    # configured, the L1 oxygen is recalculated from calphase and
+    # compensated in one pass instead
+    oxygen_inputs = [
+        'sci_oxy4_oxygen', 'sci_m_present_time', 'salinity', 'llat_pressure',
+        'sci_water_temp', 'llat_latitude', 'llat_longitude']
+    if 'corrected_oxygen' in ncw.config_sensor_defs:
+        attrs = ncw.config_sensor_defs['corrected_oxygen']['attrs']
+        steps.append(ProcessingStep(
+            'oxygen_product',
+            functools.partial(
+                processing.oxygen_product,
+                calc_type=attrs['calculation_type'],
+                cal_dict=attrs.pop('cal_coefs')),
+            inputs=['sci_oxy4_calphase', 'sci_oxy4_temp'] + oxygen_inputs,
+            outputs=['corrected_oxygen', 'oxygen']))
+    else:
+        steps.append(ProcessingStep(
+            'o2_s_and_p_comp', processing.o2_s_and_p_comp,
+            inputs=oxygen_inputs, outputs=['oxygen']))
+
+    # Re-calculate chlorophyll and PAR from the raw signals
+    if 'corrected_chlor' in ncw.config_sensor_defs:
+        attrs = ncw.config_sensor_defs['corrected_chlor']['attrs']
+        steps.append(ProcessingStep(
+            'recalc_chlor',
+            functools.partial(
+                processing.recalc_chlor, dark_offset=attrs['dark_offset'],
+                scale_factor=attrs['scale_factor']),
+            inputs=['sci_flbbcd_chlor_sig', 'sci_flbbcd_chlor_units'],
+            outputs=['corrected_chlor']))
+    if 'corrected_par' in ncw.config_sensor_defs:
+        attrs = ncw.config_sensor_defs['corrected_par']['attrs']
+        steps.append(ProcessingStep(
+            'recalc_par',
+            functools.partial(
+                processing.recalc_par, sensor_dark=attrs['sensor_dark'],
+                scale_factor=attrs['scale_factor']),
+            inputs=['sci_bsipar_sensor_volts', 'sci_bsipar_par'],
+            outputs=['corrected_par']))
+
+    steps.append(ProcessingStep(
+        'backscatter_total', processing.backscatter_total,
+        inputs=['sci_flbbcd_bb_units', 'm_present_time', 'sci_water_temp',
+                'salinity'],
+        outputs=['backscatter']))
+
+    return ProcessingPipeline(steps, wanted=ncw.nc_sensor_defs)
+
+
 class LogManager:
 
     def __init__(self, log_format, log_level, **kwargs):
@@ -408,7 +471,9 @@ if __name__ == '__main__':
                             help='Location of deployment configuration files')
 
     arg_parser.add_argument('dba_files',
-                            help='Source ASCII dba files to process',
+                            help=(
+                                'Source ASCII dba or Slocum binary data '
+                                'files to process'),
                             nargs='+')
 
     arg_parser.add_argument('--ctd_sensor_prefix',
@@ -418,6 +483,69 @@ if __name__ == '__main__':
                             choices=['sci', 'm'],
                             default='sci')
 
+    arg_parser.add_argument('--cac_dir',
+                            help=(
+                                'Directory of the .cac sensor list cache '
+                                'files for Slocum binary data files with '
+                                'factored sensor lists. Defaults to a cache '
+                                'directory next to each data file'))
+
+    arg_parser.add_argument('-a', '--all_sensors',
+                            help=(
+                                'Parse every sensor in the data files instead '
+                                'of only the sensors that are processed or '
+                                'mapped in sensor_defs.json'),
+                            action='store_true')
+
+    arg_parser.add_argument('--compact',
+                            help=(
+                                'Store the sensors in the 8 or 16 bit integer '
+                                'or float32 type the glider records them in '
+                                'instead of float64, and use that type for '
+                                'the NetCDF variables'),
+                            action='store_true')
+
+    arg_parser.add_argument('--sparse',
+                            help=(
+                                'Store mostly missing sensors as their '
+                                'finite values and row indices to reduce '
+                                'memory'),
+                            action='store_true')
+
+    arg_parser.add_argument('--profile_steps',
+                            help=(
+                                'Print the wall time and memory allocated '
+                                'by each processing step'),
+                            action='store_true')
+
+    arg_parser.add_argument('--filter_stats',
+                            help=(
+                                'JSON file to write the number of profiles '
+                                'evaluated and removed by each profile '
+                                'filter, its run time and its thresholds '
+                                'to, for tuning profile_filters.py'))
+
+    arg_parser.add_argument('--catalog',
+                            help=(
+                                'JSON file to save the data file header '
+                                'catalog to, so later runs only read the '
+                                'headers of new data files'))
+
+    arg_parser.add_argument('--segment_cache',
+                            help=(
+                                'Directory of the parsed data file cache. '
+                                'Parsed data files are stored there and '
+                                'reused by later runs instead of parsing '
+                                'the files again. Disabled if not specified'))
+
+    arg_parser.add_argument('--segment_cache_size',
+                            help=(
+                                'Maximum size of the parsed data file cache '
+                                'in MB, least recently used files are removed '
+                                'first'),
+                            type=float,
+                            default=2048)
+
     arg_parser.add_argument('-p', '--start_profile_id',
                             help=(
                                 'Integer specifying the beginning profile '
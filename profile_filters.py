@@ -5,10 +5,13 @@ import numpy as np
 import logging
 import os
 from ooidac import processing
+from ooidac.utilities import indices_in_ranges, reduce_ranges
+from ooidac.filter_registry import profile_filter
 from configuration import DATA_CONFIG_LIST, TIMESENSOR
 logger = logging.getLogger(os.path.basename(__name__))
 
 
+@profile_filter(sensors=DATA_CONFIG_LIST, cost=0.2)
 def filter_no_data(profile_data):
     """Profile filter that will remove a profile if all of the relevant science
     sensors' data (listed by the SCI_DATA_PROFILE_LIST configuration parameter)
@@ -23,8 +26,7 @@ def filter_no_data(profile_data):
     allbad_scidata = []
 
     for scidata_sensor in DATA_CONFIG_LIST:
-        data = profile_data.getdata(scidata_sensor)
-        any_data = np.all(np.isnan(data))
+        any_data = len(profile_data.finite_indices(scidata_sensor)) == 0
         # if there isn't any CTD pressure data at all, we don't want the profile
         if scidata_sensor == 'sci_water_pressure' and any_data:
             remove_profile = True
@@ -37,6 +39,7 @@ def filter_no_data(profile_data):
     return remove_profile
 
 
+@profile_filter(sensors=[TIMESENSOR] + DATA_CONFIG_LIST, cost=0.6)
 def filter_small_data_ratio(profile_data, threshold=.1, data_pts_threshold=4):
     """Profile filter that will remove a profile if all of the relevant science
     sensors ( listed by the SCI_DATA_PROFILE_LIST configuration parameter)
@@ -54,10 +57,8 @@ def filter_small_data_ratio(profile_data, threshold=.1, data_pts_threshold=4):
     total_profile_time = timestamps[-1] - timestamps[0]
 
     for scidata_sensor in DATA_CONFIG_LIST:
-        data = profile_data.getdata(scidata_sensor)
-
         # data_ratio uses ratio of data record time vs total profile time
-        finites = np.flatnonzero(np.isfinite(data))
+        finites = profile_data.finite_indices(scidata_sensor)
         if len(finites) >= data_pts_threshold:
             good_data_length = cum_data_time_sum(timestamps[finites])
         else:
@@ -72,6 +73,7 @@ def filter_small_data_ratio(profile_data, threshold=.1, data_pts_threshold=4):
     return remove_profile
 
 
+@profile_filter(sensors=[TIMESENSOR], cost=0.1)
 def filter_time_lessthan(profile_data, threshold=1):
     """Profile filter that will remove a profile if the elapsed time for
     the profile is less than `threshold` minutes.
@@ -93,6 +95,7 @@ def filter_time_lessthan(profile_data, threshold=1):
     return remove_profile
 
 
+@profile_filter(sensors=[TIMESENSOR] + DATA_CONFIG_LIST, cost=0.6)
 def filter_datatime_lessthan(profile_data, threshold=1, data_pts_threshold=4):
     """Profile filter that will remove a profile if the elapsed time for
     the data collected in a profile is less than `threshold` minutes.
@@ -118,6 +121,8 @@ def filter_datatime_lessthan(profile_data, threshold=1, data_pts_threshold=4):
     return remove_profile
 
 
+@profile_filter(
+    sensors=[TIMESENSOR, 'sci_water_pressure'] + DATA_CONFIG_LIST, cost=1.0)
 def filter_no_data_at_profile_start(profile_data, threshold=1):
     """ Profile filter that will remove a profile if there is no science data at
      the beginning (defined as the first 10%) of the profile with extra
@@ -138,8 +143,6 @@ def filter_no_data_at_profile_start(profile_data, threshold=1):
     if 'rtime' in profile_data.source_file:
         return remove_profile
     timestamps = profile_data.getdata(TIMESENSOR)
-    # ToDo: change explicit pressure here to a PRESSURESENSOR variable
-    pres = profile_data.getdata('sci_water_pressure')
     first_portion_of_dive = list(range(int(len(timestamps)/10)))
     time_len = (
             timestamps[first_portion_of_dive][-1]
@@ -152,7 +155,8 @@ def filter_no_data_at_profile_start(profile_data, threshold=1):
             timestamps < timestamps[0]+60*threshold)
 
     data_indices = processing.all_sci_indices(profile_data)
-    pressure_ii = np.flatnonzero(np.isfinite(pres))
+    # ToDo: change explicit pressure here to a PRESSURESENSOR variable
+    pressure_ii = profile_data.finite_indices('sci_water_pressure')
     if len(np.intersect1d(pressure_ii, first_portion_of_dive)) == 0:
         remove_profile = True
     elif len(np.intersect1d(data_indices, first_portion_of_dive)) == 0:
@@ -161,6 +165,7 @@ def filter_no_data_at_profile_start(profile_data, threshold=1):
     return remove_profile
 
 
+@profile_filter(sensors=['m_depth', 'llat_pressure'], cost=0.3)
 def filter_small_data_depth_ratio(
         profile_data, threshold=.1, data_pts_threshold=4):
     """Profile filter that will remove a profile if the ratio of
@@ -174,11 +179,9 @@ def filter_small_data_depth_ratio(
     remove_profile = False
     depth = profile_data.getdata('m_depth')
     total_profile_depth = np.nanmax(depth) - np.nanmin(depth)
-    pres = profile_data.getdata('llat_pressure')
+    pres_ii, pres = profile_data.getfinite('llat_pressure')
 
-    if (
-            np.count_nonzero(np.isfinite(pres)) > data_pts_threshold
-            and total_profile_depth > 0):
+    if len(pres_ii) > data_pts_threshold and total_profile_depth > 0:
         sum_pres_depth = abs(cum_depth_sum(pres))
 
         depth_ratio = sum_pres_depth / total_profile_depth
@@ -190,6 +193,147 @@ def filter_small_data_depth_ratio(
     return remove_profile
 
 
+# Batch versions of the filters.  `batch_<filter name>` evaluates the filter
+# for all of the profiles of a segment at once, from the whole segment
+# GliderData instance and the P x 2 array of the first row and the end row
+# (exclusive) of each profile (Profiles.ranges), and returns a boolean array
+# that is True for the profiles to remove.  The per profile statistics are
+# segment reductions (see ooidac.utilities.reduce_ranges), so the results
+# are the same as the filter's up to the rounding of the sums.  A filter
+# without a batch version is run on each profile instead.
+
+
+def batch_filter_no_data(segment, ranges):
+    """Batch version of filter_no_data"""
+    remove_profile = np.zeros(len(ranges), dtype=bool)
+    allbad_scidata = []
+
+    for scidata_sensor in DATA_CONFIG_LIST:
+        _, offsets = indices_in_ranges(
+            segment.finite_indices(scidata_sensor), ranges)
+        no_data = np.diff(offsets) == 0
+        # if there isn't any CTD pressure data at all, we don't want the
+        # profile
+        if scidata_sensor == 'sci_water_pressure':
+            remove_profile |= no_data
+        allbad_scidata.append(no_data)
+
+    return remove_profile | np.all(allbad_scidata, axis=0)
+
+
+def batch_filter_small_data_ratio(
+        segment, ranges, threshold=.1, data_pts_threshold=4):
+    """Batch version of filter_small_data_ratio, also removing empty
+    profiles"""
+    timestamps = segment.getdata(TIMESENSOR)
+    starts, stops = _nonempty_ranges(ranges).T
+    total_profile_time = timestamps[stops - 1] - timestamps[starts]
+    data_ratios_too_small = []
+
+    for scidata_sensor in DATA_CONFIG_LIST:
+        # data_ratio uses ratio of data record time vs total profile time
+        finites = segment.finite_indices(scidata_sensor)
+        positions, offsets = indices_in_ranges(finites, ranges)
+        good_data_length = cum_data_time_sums(
+            timestamps[finites[positions]], offsets)
+        good_data_length[np.diff(offsets) < data_pts_threshold] = 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data_ratio = good_data_length / total_profile_time
+        data_ratios_too_small.append(data_ratio < threshold)
+
+    return (
+        np.all(data_ratios_too_small, axis=0)
+        | (ranges[:, 1] <= ranges[:, 0]))
+
+
+def batch_filter_time_lessthan(segment, ranges, threshold=1):
+    """Batch version of filter_time_lessthan, also removing empty
+    profiles"""
+    timestamps = segment.getdata(TIMESENSOR)
+    starts, stops = _nonempty_ranges(ranges).T
+    minutes_of_profile = (timestamps[stops - 1] - timestamps[starts]) / 60.
+    return (minutes_of_profile < threshold) | (ranges[:, 1] <= ranges[:, 0])
+
+
+def batch_filter_datatime_lessthan(
+        segment, ranges, threshold=1, data_pts_threshold=4):
+    """Batch version of filter_datatime_lessthan"""
+    timestamps = segment.getdata(TIMESENSOR)
+    data_indices = processing.all_sci_indices(segment)
+    positions, offsets = indices_in_ranges(data_indices, ranges)
+
+    remove_profile = np.diff(offsets) < data_pts_threshold
+
+    sci_time = timestamps[data_indices[positions]]
+    minutes_of_data = cum_data_time_sums(sci_time, offsets) / 60.
+
+    return remove_profile | (minutes_of_data < threshold)
+
+
+def batch_filter_no_data_at_profile_start(segment, ranges, threshold=1):
+    """Batch version of filter_no_data_at_profile_start.  The timestamps
+    must be increasing.  A profile of less than 10 rows uses the first
+    `threshold` minutes as its start."""
+    remove_profile = np.zeros(len(ranges), dtype=bool)
+    if 'rtime' in segment.source_file:
+        return remove_profile
+    timestamps = segment.getdata(TIMESENSOR)
+    starts, stops = ranges.T
+    tenths = (stops - starts) // 10
+    first_portion_ends = starts + tenths
+    time_len = (
+        timestamps[np.maximum(first_portion_ends - 1, starts)]
+        - timestamps[np.minimum(starts, len(timestamps) - 1)])
+    # use the amount of time that is greater, the first 10% of the dive,
+    # or at least `threshold` minutes
+    short = (time_len / 60. < threshold) | (tenths == 0)
+    threshold_ends = np.searchsorted(
+        timestamps,
+        timestamps[np.minimum(starts, len(timestamps) - 1)] + 60 * threshold)
+    first_portion_ends[short] = np.minimum(threshold_ends, stops)[short]
+    first_portions = np.column_stack(
+        [starts, np.maximum(starts, first_portion_ends)])
+
+    data_indices = processing.all_sci_indices(segment)
+    # ToDo: change explicit pressure here to a PRESSURESENSOR variable
+    pressure_ii = segment.finite_indices('sci_water_pressure')
+    _, pressure_offsets = indices_in_ranges(pressure_ii, first_portions)
+    _, data_offsets = indices_in_ranges(data_indices, first_portions)
+    remove_profile |= np.diff(pressure_offsets) == 0
+    remove_profile |= np.diff(data_offsets) == 0
+
+    return remove_profile
+
+
+def batch_filter_small_data_depth_ratio(
+        segment, ranges, threshold=.1, data_pts_threshold=4):
+    """Batch version of filter_small_data_depth_ratio"""
+    depth = segment.getdata('m_depth')
+    total_profile_depth = (
+        reduce_ranges(np.fmax, depth, ranges)
+        - reduce_ranges(np.fmin, depth, ranges))
+    pres_ii, pres = segment.getfinite('llat_pressure')
+    positions, offsets = indices_in_ranges(pres_ii, ranges)
+
+    with np.errstate(invalid='ignore'):
+        enough_data = (
+            (np.diff(offsets) > data_pts_threshold)
+            & (total_profile_depth > 0))
+        sum_pres_depth = abs(cum_depth_sums(pres[positions], offsets))
+        depth_ratio = sum_pres_depth / total_profile_depth
+
+    return ~enough_data | (depth_ratio < threshold)
+
+
+def _nonempty_ranges(ranges):
+    """`ranges` with the empty ranges replaced by the first row, for
+    indexing the first and last rows of the profiles"""
+    ranges = np.array(ranges).reshape(-1, 2)
+    ranges[ranges[:, 1] <= ranges[:, 0]] = [0, 1]
+    return ranges
+
+
 def cum_data_time_sum(sci_timestamps):
     """To eliminate the case where a small amount of science data points are at
     the beginning of a profile, and a small amount exists at the end of a
@@ -221,3 +365,87 @@ def cum_depth_sum(pressure):
 
     cum_depth = np.sum(diff_pres[no_gaps])
     return cum_depth
+
+
+def cum_data_time_sums(sci_timestamps, offsets):
+    """cum_data_time_sum of each group of science timestamps, where group
+    `ii` is `sci_timestamps[offsets[ii]:offsets[ii + 1]]`
+
+    :param sci_timestamps: concatenated timestamps of non-nan science data
+        records of the groups, e.g. profiles
+    :param offsets: first element of each group and the total number of
+        elements
+    :return: array of the cumulative sum of data sample time of each group
+    """
+    sci_dt, dt_offsets = _group_diffs(sci_timestamps, offsets)
+    sci_dt_median = _group_medians(sci_dt, dt_offsets)
+    with np.errstate(invalid='ignore'):
+        no_gaps_ii = sci_dt < 3 * np.repeat(sci_dt_median, np.diff(dt_offsets))
+    return _group_sums(sci_dt, dt_offsets, no_gaps_ii)
+
+
+def cum_depth_sums(pressure, offsets):
+    """cum_depth_sum of each group of pressures, where group `ii` is
+    `pressure[offsets[ii]:offsets[ii + 1]]`"""
+    finites = np.isfinite(pressure)
+    pres = pressure[finites]
+    offsets = np.concatenate(([0], np.cumsum(_group_sums(
+        finites.astype(np.intp), offsets, empty=0))))
+    diff_pres, offsets = _group_diffs(pres, offsets)
+    non_zero = abs(diff_pres) > 0.0
+    offsets = np.concatenate(([0], np.cumsum(_group_sums(
+        non_zero.astype(np.intp), offsets, empty=0))))
+    diff_pres = diff_pres[non_zero]
+    counts = np.diff(offsets)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = _group_sums(diff_pres, offsets, empty=np.nan) / counts
+        deviation = diff_pres - np.repeat(mean, counts)
+        std = np.sqrt(
+            _group_sums(deviation * deviation, offsets, empty=np.nan) / counts)
+
+        # exclude any large jumps in depth which are considered gaps
+        no_gaps = abs(diff_pres) < np.repeat(abs(mean) + 3*std, counts)
+
+    return _group_sums(diff_pres, offsets, no_gaps)
+
+
+def _group_diffs(values, offsets):
+    """np.diff of each group of `values` and the offsets of the groups in
+    the differences"""
+    counts = np.diff(offsets)
+    diffs = np.diff(values)
+    # drop the differences between the last value of a group and the first
+    # of the next one
+    group_starts = offsets[1:-1]
+    between = group_starts[(group_starts > 0) & (group_starts < len(values))]
+    within = np.ones(len(diffs), dtype=bool)
+    within[between - 1] = False
+    diff_counts = np.maximum(counts - 1, 0)
+    return diffs[within], np.concatenate(([0], np.cumsum(diff_counts)))
+
+
+def _group_medians(values, offsets):
+    """np.median of each group of `values`, NaN for empty groups"""
+    counts = np.diff(offsets)
+    groups = np.repeat(np.arange(len(counts)), counts)
+    ordered = values[np.lexsort((values, groups))]
+    medians = np.full(len(counts), np.nan)
+    middles = offsets[:-1] + counts // 2
+    odd = counts % 2 == 1
+    even = (counts > 0) & ~odd
+    medians[odd] = ordered[middles[odd]]
+    medians[even] = (ordered[middles[even] - 1] + ordered[middles[even]]) / 2
+    return medians
+
+
+def _group_sums(values, offsets, selected=None, empty=0.):
+    """Sum of each group of `values`, only of the `selected` values if
+    given"""
+    if selected is not None:
+        groups = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        counts = np.bincount(groups[selected], minlength=len(offsets) - 1)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        values = values[selected]
+    return reduce_ranges(
+        np.add, values, np.column_stack([offsets[:-1], offsets[1:]]), empty)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+from ooidac.data_classes import GliderData, DbaData
+
+
+def main(args):
+    """Time adding derived sensors to a GliderData instance with
+    GliderData.add_data against appending columns to the full data table with
+    np.append, which copies the whole table for every added sensor"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    if args.data_file:
+        dba = DbaData(args.data_file)
+        if dba.N == 0:
+            logging.error('No data in {:s}'.format(args.data_file))
+            return 1
+        table = dba._data
+        sensor_names = list(dba.sensor_names)
+    else:
+        rng = np.random.default_rng(0)
+        table = rng.normal(size=(args.rows, args.columns))
+        table[:, 0] = 1.5e9 + np.arange(args.rows)
+        sensor_names = ['m_present_time'] + [
+            'sensor_{:d}'.format(ii) for ii in range(1, args.columns)]
+    num_rows, num_columns = table.shape
+    new_columns = [
+        np.full(num_rows, float(ii)) for ii in range(args.num_sensors)]
+
+    best_add = np.inf
+    best_append = np.inf
+    for _ in range(args.repeat):
+        gldata = GliderData(
+            {}, list(sensor_names),
+            {name: {'sensor_name': name, 'attrs': {}}
+             for name in sensor_names},
+            table)
+        t0 = time.perf_counter()
+        for ii, column in enumerate(new_columns):
+            gldata.add_data({'sensor_name': 'derived_{:d}'.format(ii),
+                             'attrs': {}, 'data': column})
+        best_add = min(best_add, time.perf_counter() - t0)
+
+        data = table
+        t0 = time.perf_counter()
+        for column in new_columns:
+            data = np.append(data, column.reshape((num_rows, 1)), axis=1)
+        best_append = min(best_append, time.perf_counter() - t0)
+
+    sys.stdout.write(
+        '{:d} rows x {:d} columns, {:d} sensors added\n'
+        '    add_data:  {:8.4f} s\n'
+        '    np.append: {:8.4f} s ({:0.0f}x)\n'.format(
+            num_rows, num_columns, args.num_sensors, best_add, best_append,
+            best_append / best_add))
+
+    return 0
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('data_file',
+                            help=(
+                                'Optional dba or binary data file to use '
+                                'instead of a synthetic table'),
+                            nargs='?')
+
+    arg_parser.add_argument('-n', '--rows',
+                            help='Number of rows of the synthetic table',
+                            type=int,
+                            default=10000)
+
+    arg_parser.add_argument('-c', '--columns',
+                            help='Number of columns of the synthetic table',
+                            type=int,
+                            default=1800)
+
+    arg_parser.add_argument('-s', '--num_sensors',
+                            help='Number of sensors to add',
+                            type=int,
+                            default=15)
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to run each method',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+from ooidac.profiles import next_depth_changes, chain_mask
+
+
+def main(args):
+    """Time removing the false inflections of a long random sawtooth depth
+    series with small wiggles at the surface, at the bottom of the dives and
+    mid profile, with the vectorized search of Profiles.adjust_inflections
+    against the nested while loops it replaced.  The comparison of the two
+    on many random series is in tests/test_profiles.py."""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    rng = np.random.default_rng(args.seed)
+
+    # the depths of the inflections are interpolated the same way by both,
+    # so time the removal of the false inflections from them
+    time_, depth, inflections = _synthetic_inflections(rng, args.yos)
+    inflection_depths = np.interp(
+        inflections, time_[np.isfinite(depth)], depth[np.isfinite(depth)])
+    loop_seconds = np.inf
+    vectorized_seconds = np.inf
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        expected = _loop_keep_mask(inflection_depths, args.min_depth_change)
+        loop_seconds = min(loop_seconds, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        inflx_to_keep = chain_mask(
+            next_depth_changes(inflection_depths, args.min_depth_change))
+        vectorized_seconds = min(
+            vectorized_seconds, time.perf_counter() - t0)
+    if not np.array_equal(inflx_to_keep, expected):
+        logging.error('The vectorized search keeps different inflections')
+        return 1
+    sys.stdout.write(
+        '{:d} inflections of {:d} yos, {:d} kept before the trend check\n'
+        '    while loops:  {:8.4f} s\n'
+        '    vectorized:   {:8.4f} s ({:0.1f}x)\n'.format(
+            len(inflections), args.yos, int(np.count_nonzero(expected)),
+            loop_seconds, vectorized_seconds,
+            loop_seconds / vectorized_seconds))
+
+    return 0
+
+
+def _loop_keep_mask(inflection_depths, min_depth_change):
+    """The nested while loops removing the inflections within
+    `min_depth_change` of the last good inflection"""
+    inflx_ii = 0
+    fwd_counter = 1
+    inflx_to_keep = np.full(len(inflection_depths), True)
+    while inflx_ii < len(inflection_depths):
+        ii_depth = inflection_depths[inflx_ii]
+        if inflx_ii + fwd_counter >= len(inflection_depths):
+            break
+        while abs(inflection_depths[inflx_ii + fwd_counter]
+                  - ii_depth) < min_depth_change:
+            inflx_to_keep[inflx_ii + fwd_counter] = False
+            fwd_counter += 1
+            if inflx_ii + fwd_counter >= len(inflection_depths):
+                break
+        inflx_ii = inflx_ii + fwd_counter
+        fwd_counter = 1
+    return inflx_to_keep
+
+
+def _synthetic_inflections(rng, num_yos):
+    """Return the timestamps and depths of a random sawtooth depth series of
+    `num_yos` dives and climbs with wiggles of random sizes, and the times of
+    all of its depth inflections"""
+    corners = [rng.uniform(0., 3.)]
+    for _ in range(num_yos):
+        # a few wiggles at the surface, then a dive, a few wiggles at the
+        # bottom and mid profile, and a climb
+        for _ in range(int(rng.integers(0, 4))):
+            corners.append(corners[-1] + rng.uniform(-2.5, 2.5))
+        bottom = rng.uniform(1., 200.)
+        for _ in range(int(rng.integers(0, 3))):
+            corners.append(rng.uniform(min(corners[-1], bottom), bottom))
+            corners.append(corners[-1] - rng.uniform(0., 3.))
+        corners.append(bottom)
+        for _ in range(int(rng.integers(0, 4))):
+            corners.append(corners[-1] + rng.uniform(-2.5, 2.5))
+        corners.append(rng.uniform(0., 3.))
+    corners = np.maximum(corners, .1)
+    # depths on integer centimeters produce exact 2 m differences
+    if rng.random() < .5:
+        corners = np.round(corners, 2)
+
+    corner_times = 1.5e9 + np.cumsum(
+        rng.uniform(5., 600., len(corners)))
+    time_ = np.arange(corner_times[0], corner_times[-1] + 1., 2.)
+    depth = np.interp(time_, corner_times, corners)
+    # missing depths, but not at the ends
+    depth[1:-1][rng.random(len(depth) - 2) < .05] = np.nan
+    # the inflections are at the corners, plus the series ends
+    inflections = np.concatenate(([time_[0]], corner_times, [time_[-1]]))
+    inflections = inflections[inflections <= time_[-1]]
+    return time_, depth, inflections
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('-y', '--yos',
+                            help='Number of yos of the depth series',
+                            type=int,
+                            default=5000)
+
+    arg_parser.add_argument('-d', '--min_depth_change',
+                            help='Smallest depth change between inflections',
+                            type=float,
+                            default=2.)
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to run each method',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-s', '--seed',
+                            help='Seed of the random depth series',
+                            type=int,
+                            default=0)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
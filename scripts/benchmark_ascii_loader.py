@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import numpy as np
+
+from ooidac.readers.slocum import parse_dba
+
+
+def main(args):
+    """Measure the throughput of the ascii dba loader in rows/s and MB/s on
+    synthetic dba files and compare the parsed table against np.loadtxt,
+    for all of the sensors and for a whitelist of `--sensors` sensors
+    (projected) against np.loadtxt with usecols"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    sys.stdout.write(
+        '{:>8s} {:>6s} {:>8s} {:>9s} {:>10s} {:>12s} {:>8s} {:>12s} '
+        '{:>6s}\n'.format(
+            'rows', 'cols', 'MB', 'sensors', 'parse (s)', 'rows/s', 'MB/s',
+            'loadtxt (s)', 'equal'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_columns in args.columns:
+            dba_file = os.path.join(
+                tmp_dir, 'synthetic_{:d}.dba'.format(num_columns))
+            num_header_lines = _write_synthetic_dba(
+                dba_file, args.rows, num_columns, args.nan_fraction)
+            size_mb = os.path.getsize(dba_file) / 1e6
+
+            # every sensor, then a whitelist of sensors spread over the
+            # columns
+            usecols = np.unique(np.linspace(
+                0, num_columns - 1, min(args.sensors, num_columns)).astype(
+                    int))
+            sensors = ['m_present_time'] + [
+                'sensor_{:d}'.format(i) for i in usecols[1:]]
+            for whitelist, columns in [(None, None), (sensors, usecols)]:
+                parse_time, dba = _time_call(
+                    parse_dba, args.repeat, dba_file, sensors=whitelist)
+                loadtxt_time, ref = _time_call(
+                    np.loadtxt, 1, dba_file, skiprows=num_header_lines,
+                    usecols=columns, ndmin=2)
+                equal = np.array_equal(dba['data'], ref, equal_nan=True)
+                sys.stdout.write(
+                    '{:8d} {:6d} {:8.1f} {:>9s} {:10.3f} {:12.0f} {:8.1f} '
+                    '{:12.3f} {:>6s}\n'.format(
+                        args.rows, num_columns, size_mb,
+                        'all' if whitelist is None else str(len(columns)),
+                        parse_time, args.rows / parse_time,
+                        size_mb / parse_time, loadtxt_time, str(equal)))
+
+    return 0
+
+
+def _write_synthetic_dba(dba_file, num_rows, num_columns, nan_fraction):
+    """Write a dba file with `num_rows` x `num_columns` random values, a
+    `nan_fraction` of which are NaN, and return the number of lines before
+    the data table"""
+    sensors = ['m_present_time'] + [
+        'sensor_{:d}'.format(i) for i in range(1, num_columns)]
+    header = [
+        'dbd_label: DBD_ASC(dinkum_binary_data_ascii)file',
+        'encoding_ver: 2',
+        'num_ascii_tags: 14',
+        'all_sensors: 0',
+        'filename: synthetic',
+        'the8x3_filename: 00000000',
+        'filename_extension: dbd',
+        'filename_label: synthetic-dbd(00000000)',
+        'mission_name: synthetic.mi',
+        'fileopen_time: Thu_Jan__1_00:00:00_1970',
+        'sensors_per_cycle: {:d}'.format(num_columns),
+        'num_label_lines: 3',
+        'num_segments: 1',
+        'segment_filename_0: synthetic',
+        ' '.join(sensors),
+        ' '.join(['nodim'] * num_columns),
+        ' '.join(['8'] + ['4'] * (num_columns - 1)),
+    ]
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(num_rows, num_columns)) * 100
+    data[:, 0] = 1.5e9 + np.arange(num_rows) * 2.0
+    data[:, 1:][rng.random((num_rows, num_columns - 1)) < nan_fraction] = (
+        np.nan)
+    with open(dba_file, 'w') as fid:
+        fid.write('\n'.join(header) + '\n')
+        np.savetxt(fid, data, fmt='%.6g')
+
+    return 17
+
+
+def _time_call(func, repeat, *args, **kwargs):
+    """Return the best time of `repeat` calls and the last output"""
+    best = np.inf
+    output = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        output = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, output
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('-n', '--rows',
+                            help='Number of rows in each synthetic file',
+                            type=int,
+                            default=100000)
+
+    arg_parser.add_argument('-c', '--columns',
+                            help='Number of columns of the synthetic files',
+                            type=int,
+                            nargs='+',
+                            default=[20, 100])
+
+    arg_parser.add_argument('-s', '--sensors',
+                            help=(
+                                'Number of sensors of the projected parse '
+                                'whitelist'),
+                            type=int,
+                            default=40)
+
+    arg_parser.add_argument('--nan_fraction',
+                            help='Fraction of NaN values in the tables',
+                            type=float,
+                            default=0.8)
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to parse each file',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
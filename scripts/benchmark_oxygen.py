@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import time
+import logging
+import argparse
+import numpy as np
+
+import ooidac.processing as processing
+from ooidac.data_classes import GliderData, DbaData
+from ooidac.constants import SCI_CTD_SENSORS
+
+# example SVU foil and concentration coefficients from do2_SVU
+SVU_CAL = {
+    'calculation_type': 'SVU',
+    'cal_coefs': {
+        'SVUFoilCoef': [0.002848, 0.000114, 1.51e-6, 70.42301, -0.10302,
+                        -12.9462, 1.265377],
+        'ConcCoef': [0.0, 1.0]}}
+
+
+def main(args):
+    """Time recalculating oxygen from calphase and compensating it for
+    salinity and pressure with processing.oxygen_product against
+    processing.check_and_recalc_o2 followed by processing.o2_s_and_p_comp,
+    and report the largest relative difference of the results"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    if args.cal_file:
+        with open(args.cal_file, 'r') as fid:
+            cal = json.load(fid)
+    else:
+        cal = SVU_CAL
+    calc_type = cal['calculation_type']
+    cal_dict = cal['cal_coefs']
+
+    if args.data_file:
+        gldata = DbaData(args.data_file)
+        if gldata.N == 0:
+            logging.error('No data in {:s}'.format(args.data_file))
+            return 1
+        gldata = processing.create_llat_sensors(gldata)
+        if gldata is not None:
+            gldata = processing.ctd_data(gldata, SCI_CTD_SENSORS)
+        if gldata is None:
+            logging.error(
+                'Could not process the CTD data of {:s}'.format(
+                    args.data_file))
+            return 1
+    else:
+        gldata = _synthetic_data(args.rows)
+
+    best_chain = np.inf
+    best_fused = np.inf
+    for _ in range(args.repeat):
+        chain = gldata.slicedata(indices=slice(None))
+        t0 = time.perf_counter()
+        chain = processing.check_and_recalc_o2(chain, calc_type, cal_dict)
+        chain = processing.o2_s_and_p_comp(chain, 'corrected_oxygen')
+        chain_l2 = chain.getdata('oxygen')
+        best_chain = min(best_chain, time.perf_counter() - t0)
+
+        fused = gldata.slicedata(indices=slice(None))
+        t0 = time.perf_counter()
+        fused = processing.oxygen_product(fused, calc_type, cal_dict)
+        fused_l2 = fused.getdata('oxygen')
+        best_fused = min(best_fused, time.perf_counter() - t0)
+
+    differences = []
+    for chain_data, fused_data in [
+            (chain.getdata('corrected_oxygen'),
+             fused.getdata('corrected_oxygen')),
+            (chain_l2, fused_l2)]:
+        if not np.array_equal(
+                np.isfinite(chain_data), np.isfinite(fused_data)):
+            logging.error('The finite oxygen samples differ')
+            return 1
+        finites = np.isfinite(chain_data)
+        differences.append(np.max(
+            np.abs(fused_data[finites] - chain_data[finites])
+            / np.abs(chain_data[finites]), initial=0.))
+
+    sys.stdout.write(
+        '{:d} rows, {:d} oxygen samples, {:s} calculation\n'
+        '    check_and_recalc_o2 + o2_s_and_p_comp: {:8.4f} s\n'
+        '    oxygen_product:                        {:8.4f} s ({:0.1f}x)\n'
+        '    max relative difference L1: {:0.2e}, L2: {:0.2e}\n'.format(
+            gldata.N, int(np.count_nonzero(np.isfinite(fused_l2))),
+            calc_type, best_chain, best_fused, best_chain / best_fused,
+            differences[0], differences[1]))
+
+    return 0
+
+
+def _synthetic_data(num_rows):
+    """Return a GliderData instance with the sensors used by the oxygen
+    processing, with a science sample every other row and an optode sample
+    every fourth row"""
+    rng = np.random.default_rng(0)
+    timestamps = 1.5e9 + np.arange(num_rows, dtype=float)
+    depth = 500. * (1 - np.abs(1 - 2 * (np.arange(num_rows) % 4000) / 4000.))
+    sci = np.arange(num_rows) % 2 == 1
+    oxy = np.arange(num_rows) % 4 == 1
+
+    def sampled(values, rows):
+        return np.where(rows, values, np.nan)
+
+    temp = 12 - 8 * (1 - np.exp(-depth / 100)) + rng.normal(0, .01, num_rows)
+    columns = {
+        'm_present_time': timestamps,
+        'm_depth': depth,
+        'sci_m_present_time': sampled(timestamps - .3, sci),
+        'sci_water_temp': sampled(temp, sci),
+        'salinity': sampled(
+            32 + 2 * (1 - np.exp(-depth / 200)), sci),
+        'llat_pressure': sampled(depth * 1.01, sci),
+        'llat_latitude': np.full(num_rows, 44.6),
+        'llat_longitude': np.full(num_rows, -124.5),
+        'sci_oxy4_calphase': sampled(
+            30 + 10 * (1 - np.exp(-depth / 300)), oxy),
+        'sci_oxy4_temp': sampled(temp + .05, oxy),
+        'sci_oxy4_oxygen': sampled(280 - 150 * (1 - np.exp(-depth / 300)),
+                                   oxy)}
+    sensor_names = list(columns)
+    return GliderData(
+        {}, sensor_names,
+        {name: {'sensor_name': name, 'attrs': {}} for name in sensor_names},
+        [columns[name] for name in sensor_names])
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('data_file',
+                            help=(
+                                'Optional dba or binary data file with '
+                                'optode and CTD data to use instead of '
+                                'synthetic data'),
+                            nargs='?')
+
+    arg_parser.add_argument('--cal_file',
+                            help=(
+                                'JSON file with the optode '
+                                '"calculation_type" and "cal_coefs", as in '
+                                'the corrected_oxygen attributes of '
+                                'sensor_defs.json. Defaults to example SVU '
+                                'coefficients'))
+
+    arg_parser.add_argument('-n', '--rows',
+                            help='Number of rows of the synthetic data',
+                            type=int,
+                            default=1000000)
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to run each method',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
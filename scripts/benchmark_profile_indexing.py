@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+from ooidac.data_classes import GliderData, DbaData
+from ooidac.profiles import Profiles, time_ranges_to_rows
+from configuration import DATA_CONFIG_LIST
+
+
+def main(args):
+    """Time building the profile row ranges of a recovered data file with
+    searchsorted (ooidac.profiles.time_ranges_to_rows) against comparing the
+    timestamps to every profile time range, for the profiles found by depth
+    and by depth state, and check that the profile rows are the same"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    if args.data_file:
+        gldata = DbaData(args.data_file)
+        if gldata.N == 0:
+            logging.error('No data in {:s}'.format(args.data_file))
+            return 1
+    else:
+        gldata = _synthetic_data(args.yos)
+    timestamps = gldata.getdata('m_present_time')
+
+    profiles = Profiles(gldata)
+    t0 = time.perf_counter()
+    profiles.find_profiles_by_depth()
+    find_seconds = time.perf_counter() - t0
+    if profiles.inflection_times is None:
+        logging.error('No profiles found')
+        return 1
+    switch_times = profiles.inflection_times
+
+    # profiles by depth include the rows at both ends of the time range,
+    # profiles by depth state only the rows at the end
+    state_times = None
+    if 'm_depth_state' in gldata.sensor_names:
+        state_profiles = Profiles(gldata)
+        if 'llat_time' not in gldata.sensor_names:
+            state_profiles.dba = gldata.slicedata(indices=slice(None))
+            state_profiles.dba.add_data({
+                'sensor_name': 'llat_time', 'attrs': {},
+                'data': timestamps})
+        state_profiles.find_profiles_by_depth_state()
+        state_times = state_profiles.inflection_times
+
+    sys.stdout.write('{:d} rows, {:d} profiles by depth\n'.format(
+        gldata.N, len(switch_times) - 1))
+    sys.stdout.write(
+        '    find_profiles_by_depth:        {:8.4f} s\n'.format(find_seconds))
+
+    cases = [('depth', switch_times[:-1], switch_times[1:], True)]
+    if state_times is not None:
+        boundaries = np.concatenate([[-np.inf], state_times, [np.inf]])
+        cases.append(
+            ('depth state', boundaries[:-1], boundaries[1:], False))
+
+    for name, start_times, end_times, include_start in cases:
+        best_masked = np.inf
+        best_ranges = np.inf
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            masked = _masked_profile_indices(
+                timestamps, start_times, end_times, include_start)
+            best_masked = min(best_masked, time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            ranges = time_ranges_to_rows(
+                timestamps, start_times, end_times, include_start)
+            best_ranges = min(best_ranges, time.perf_counter() - t0)
+
+        same = len(masked) == len(ranges) and all(
+            np.array_equal(profile_ii, np.arange(start, stop))
+            for profile_ii, (start, stop) in zip(masked, ranges))
+        if not same:
+            logging.error('The {:s} profile rows differ'.format(name))
+            return 1
+        sys.stdout.write(
+            '{:s} profile rows of {:d} profiles\n'
+            '    masked per profile:            {:8.4f} s\n'
+            '    searchsorted:                  {:8.4f} s ({:0.1f}x)\n'.format(
+                name.capitalize(), len(ranges), best_masked, best_ranges,
+                best_masked / best_ranges))
+
+    return 0
+
+
+def _masked_profile_indices(timestamps, start_times, end_times,
+                            include_start):
+    """Row indices of every profile time range found by comparing all of the
+    timestamps to the range"""
+    profile_indices = []
+    for pstart, pend in zip(start_times, end_times):
+        if include_start:
+            after_start = timestamps >= pstart
+        else:
+            after_start = timestamps > pstart
+        profile_indices.append(
+            np.flatnonzero(np.logical_and(after_start, timestamps <= pend)))
+    return profile_indices
+
+
+def _synthetic_data(num_yos, max_depth=100., rate=0.15):
+    """Return a GliderData instance of a recovered data file of `num_yos`
+    dives and climbs to `max_depth` at `rate` m/s, with a flight row every
+    second and a science sample every other row"""
+    rng = np.random.default_rng(0)
+    yo_rows = int(2 * max_depth / rate)
+    surface_rows = 300
+    num_rows = 2 * surface_rows + num_yos * yo_rows
+    timestamps = 1.5e9 + np.arange(num_rows, dtype=float)
+    phase = (np.arange(num_rows) - surface_rows) % yo_rows / yo_rows
+    underwater = np.zeros(num_rows, dtype=bool)
+    underwater[surface_rows:num_rows - surface_rows] = True
+    depth = np.where(
+        underwater, max_depth * (1 - np.abs(1 - 2 * phase)) + 0.2, 0.)
+    depth = np.maximum(depth + rng.normal(0, .05, num_rows), 0)
+    depth_state = np.where(underwater, np.where(phase < .5, 2., 1.), 99.)
+    sci = np.arange(num_rows) % 2 == 1
+
+    columns = {
+        'm_present_time': timestamps,
+        'm_depth': depth,
+        'm_depth_state': depth_state,
+        'llat_time': timestamps}
+    for sensor in DATA_CONFIG_LIST:
+        columns[sensor] = np.where(sci, depth / 10., np.nan)
+    sensor_names = list(columns)
+    return GliderData(
+        {}, sensor_names,
+        {name: {'sensor_name': name, 'attrs': {}} for name in sensor_names},
+        [columns[name] for name in sensor_names])
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('data_file',
+                            help=(
+                                'Optional dba or binary data file to use '
+                                'instead of synthetic data'),
+                            nargs='?')
+
+    arg_parser.add_argument('-y', '--yos',
+                            help='Number of yos of the synthetic data',
+                            type=int,
+                            default=200)
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to run each method',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
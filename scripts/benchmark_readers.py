@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+import numpy as np
+
+from ooidac.readers.slocum import parse_dba, parse_dba_header
+from ooidac.readers.slocum_binary import parse_binary, parse_binary_header
+
+
+def main(args):
+    """Compare the parse time of Slocum binary data files with the parse time
+    of the ascii dba files converted from the same segments with dbd2asc"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    binary_files = glob.glob(args.binary_files)
+    dba_files = glob.glob(os.path.join(args.dba_dir, '*'))
+    if not binary_files:
+        logging.error('No binary files found: {:s}'.format(args.binary_files))
+        return 1
+
+    # match the ascii and binary versions of a segment by the 8x3 filename
+    # and file type in the header
+    dba_index = {}
+    for dba_file in dba_files:
+        header = parse_dba_header(dba_file)
+        if not header or 'the8x3_filename' not in header:
+            continue
+        key = (header['the8x3_filename'], header['filename_extension'])
+        dba_index[key] = dba_file
+
+    sys.stdout.write(
+        '{:40s} {:>8s} {:>6s} {:>10s} {:>10s} {:>8s} {:>6s}\n'.format(
+            'segment', 'rows', 'cols', 'ascii (s)', 'binary (s)',
+            'speedup', 'equal'))
+    total_ascii = 0.
+    total_binary = 0.
+    for binary_file in sorted(binary_files):
+        header = parse_binary_header(binary_file)
+        if not header:
+            continue
+        key = (header['the8x3_filename'], header['filename_extension'])
+        if key not in dba_index:
+            logging.warning('No matching dba file for {:s}'.format(
+                binary_file))
+            continue
+        dba_file = dba_index[key]
+
+        ascii_time, dba = _time_parse(parse_dba, dba_file, args.repeat)
+        binary_time, dbd = _time_parse(
+            parse_binary, binary_file, args.repeat, cac_dir=args.cac_dir)
+        if dba is None or dbd is None:
+            logging.warning('Failed to parse {:s}'.format(binary_file))
+            continue
+        total_ascii += ascii_time
+        total_binary += binary_time
+
+        # dbd2asc writes a limited number of significant digits, so compare
+        # with a relative tolerance
+        equal = (
+            dba['sensor_names'] == dbd['sensor_names']
+            and np.allclose(
+                dba['data'], dbd['data'], rtol=1e-6, equal_nan=True)
+        )
+        sys.stdout.write(
+            '{:40s} {:8d} {:6d} {:10.3f} {:10.3f} {:7.1f}x {:>6s}\n'.format(
+                os.path.basename(binary_file), dbd['data'].shape[0],
+                dbd['data'].shape[1], ascii_time, binary_time,
+                ascii_time / binary_time, str(equal)))
+
+    if total_binary > 0:
+        sys.stdout.write(
+            'Total: ascii {:0.3f} s, binary {:0.3f} s, speedup {:0.1f}x\n'.format(
+                total_ascii, total_binary, total_ascii / total_binary))
+
+    return 0
+
+
+def _time_parse(parser, data_file, repeat, **kwargs):
+    """Return the best time of `repeat` parses and the parsed output"""
+    best = np.inf
+    parsed = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        parsed = parser(data_file, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, parsed
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('binary_files',
+                            help='Slocum binary data files (glob expression)')
+
+    arg_parser.add_argument('dba_dir',
+                            help=(
+                                'Directory of the dba files converted from '
+                                'the binary files with dbd2asc'))
+
+    arg_parser.add_argument('--cac_dir',
+                            help=(
+                                'Directory of the .cac sensor list cache '
+                                'files for binary files with factored sensor '
+                                'lists'))
+
+    arg_parser.add_argument('-r', '--repeat',
+                            help='Number of times to parse each file',
+                            type=int,
+                            default=3)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import sys
+import timeit
+import logging
+import argparse
+import numpy as np
+
+from ooidac.data_classes import GliderData, DbaData
+
+
+def main(args):
+    """Time the per-call cost of the GliderData sensor accessors (getdata,
+    getdataslice, update_data and slicedata) against resolving the sensor
+    name with a linear list.index scan of the sensor names"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    if args.data_file:
+        gldata = DbaData(args.data_file)
+        if gldata.N == 0:
+            logging.error('No data in {:s}'.format(args.data_file))
+            return 1
+    else:
+        rng = np.random.default_rng(0)
+        table = rng.normal(size=(args.rows, args.columns))
+        sensor_names = ['m_present_time'] + [
+            'sensor_{:d}'.format(ii) for ii in range(1, args.columns)]
+        gldata = GliderData(
+            {}, sensor_names,
+            {name: {'sensor_name': name, 'attrs': {}}
+             for name in sensor_names},
+            table)
+
+    # the sensors at the end of the list are the worst case for a linear scan
+    names = gldata.sensor_names[-args.num_sensors:]
+    row = np.array([0])
+    calls = {
+        'list.index': lambda: [
+            gldata.sensor_names.index(name) for name in names],
+        'getdata': lambda: [gldata.getdata(name) for name in names],
+        'getdataslice': lambda: gldata.getdataslice(names),
+        'update_data': lambda: gldata.update_data(names, row, 0.),
+        'slicedata': lambda: gldata.slicedata(sensors=names, indices=row),
+    }
+
+    sys.stdout.write('{:d} rows x {:d} columns, {:d} sensors per call\n'.format(
+        gldata.N, gldata.m, len(names)))
+    for name, call in calls.items():
+        best = min(timeit.repeat(call, number=args.number, repeat=3))
+        sys.stdout.write('    {:14s} {:8.2f} us per sensor\n'.format(
+            name, best / args.number / len(names) * 1e6))
+
+    return 0
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('data_file',
+                            help=(
+                                'Optional dba or binary data file to use '
+                                'instead of a synthetic table'),
+                            nargs='?')
+
+    arg_parser.add_argument('-n', '--rows',
+                            help='Number of rows of the synthetic table',
+                            type=int,
+                            default=1000)
+
+    arg_parser.add_argument('-c', '--columns',
+                            help='Number of columns of the synthetic table',
+                            type=int,
+                            default=1800)
+
+    arg_parser.add_argument('-s', '--num_sensors',
+                            help='Number of sensors looked up per call',
+                            type=int,
+                            default=20)
+
+    arg_parser.add_argument('--number',
+                            help='Number of calls per timing',
+                            type=int,
+                            default=1000)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+import ooidac
+
+# importing the package must not import SciPy
+SCIPY_IMPORTED = 'scipy' in sys.modules
+
+
+def main(args):
+    """Check that the NumPy smoothers of the ooidac package give the same
+    results as SciPy: boxcar_smooth_dataset against signal.convolve with a
+    boxcar window, median_smooth_dataset against signal.medfilt and
+    savgol_smooth_dataset against signal.savgol_filter, and time them"""
+
+    # Set up logger
+    log_level = getattr(logging, args.loglevel.upper())
+    log_format = '%(module)s:%(levelname)s:%(message)s [line %(lineno)d]'
+    logging.basicConfig(format=log_format, level=log_level)
+
+    if SCIPY_IMPORTED:
+        logging.error('Importing ooidac imported SciPy')
+        return 1
+    from scipy import signal
+
+    if args.data_file:
+        from ooidac.data_classes import DbaData
+        dba = DbaData(args.data_file)
+        if dba.N == 0 or 'm_depth' not in dba.sensor_names:
+            logging.error('No m_depth data in {:s}'.format(args.data_file))
+            return 1
+        depth = dba.getdata('m_depth')
+        timestamps = dba.getdata('m_present_time')
+        finites = np.isfinite(depth)
+        itime = np.arange(timestamps[0], timestamps[-1], 2.)
+        dataset = np.interp(itime, timestamps[finites], depth[finites])
+    else:
+        dataset = _synthetic_depth(args.points)
+
+    def scipy_boxcar(data, window_size):
+        window = signal.windows.boxcar(window_size)
+        return signal.convolve(data, window, 'same') / window_size
+
+    checks = [
+        ('boxcar', ooidac.boxcar_smooth_dataset, scipy_boxcar,
+         args.windows),
+        ('median', ooidac.median_smooth_dataset, signal.medfilt,
+         [size for size in args.windows if size % 2 == 1]),
+        ('savgol', ooidac.savgol_smooth_dataset,
+         lambda data, size: signal.savgol_filter(data, size, 2),
+         [size for size in args.windows if size % 2 == 1 and size > 2])]
+
+    # the cumulative sum of the running mean rounds to the sum of the
+    # absolute values
+    scale = max(np.sum(np.abs(dataset)), 1.)
+    failed = False
+    sys.stdout.write('{:d} points\n'.format(len(dataset)))
+    for name, smoother, reference, window_sizes in checks:
+        for window_size in window_sizes:
+            t0 = time.perf_counter()
+            smoothed = smoother(dataset, window_size)
+            seconds = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            expected = reference(dataset, window_size)
+            reference_seconds = time.perf_counter() - t0
+
+            difference = np.max(np.abs(smoothed - expected), initial=0.)
+            same = (
+                smoothed.shape == expected.shape
+                and difference <= args.tolerance * scale)
+            failed = failed or not same
+            sys.stdout.write(
+                '    {:<6s} window {:3d}: numpy {:8.4f} s, scipy {:8.4f} s, '
+                'max difference {:0.2e} {:s}\n'.format(
+                    name, window_size, seconds, reference_seconds,
+                    difference, 'ok' if same else 'FAILED'))
+
+    return 1 if failed else 0
+
+
+def _synthetic_depth(num_points, yo_points=700, max_depth=100.):
+    """Noisy sawtooth depth series of dives and climbs"""
+    rng = np.random.default_rng(0)
+    phase = np.arange(num_points) % yo_points / yo_points
+    depth = max_depth * (1 - np.abs(1 - 2 * phase))
+    return depth + rng.normal(0, .1, num_points)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description=main.__doc__,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    arg_parser.add_argument('data_file',
+                            help=(
+                                'Optional dba or binary data file whose '
+                                'm_depth, interpolated every 2 seconds, is '
+                                'smoothed instead of a synthetic depth '
+                                'series'),
+                            nargs='?')
+
+    arg_parser.add_argument('-n', '--points',
+                            help='Number of points of the synthetic data',
+                            type=int,
+                            default=200000)
+
+    arg_parser.add_argument('-w', '--windows',
+                            help='Window sizes to check',
+                            type=int,
+                            nargs='+',
+                            default=[1, 2, 5, 10, 11, 12, 51])
+
+    arg_parser.add_argument('-t', '--tolerance',
+                            help=(
+                                'Largest difference allowed, relative to the '
+                                'sum of the absolute values of the data'),
+                            type=float,
+                            default=1e-14)
+
+    arg_parser.add_argument('-l', '--loglevel',
+                            help='Verbosity level',
+                            type=str,
+                            choices=[
+                                'debug', 'info', 'warning',
+                                'error', 'critical'],
+                            default='warning')
+
+    parsed_args = arg_parser.parse_args()
+
+    sys.exit(main(parsed_args))
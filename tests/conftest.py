@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+DBA_HEADER = """dbd_label: DBD_ASC(dinkum_binary_data_ascii)file
+encoding_ver: 2
+num_ascii_tags: 14
+all_sensors: 0
+filename: test-2019-123-1-{segment:d}
+the8x3_filename: 0123{segment:04d}
+filename_extension: dbd
+filename_label: test-2019-123-1-{segment:d}-dbd(0123{segment:04d})
+mission_name: TEST.MI
+fileopen_time: Thu_Jul_25_15:31:44_2019
+sensors_per_cycle: {num_sensors:d}
+num_label_lines: 3
+num_segments: 1
+segment_filename_0: test-2019-123-1-{segment:d}
+"""
+
+SEGMENT_SENSORS = [
+    ('m_present_time', 'timestamp', 8), ('m_depth', 'm', 4),
+    ('m_depth_state', 'enum', 1), ('m_initial_water_vx', 'm/s', 4),
+    ('m_initial_water_vy', 'm/s', 4), ('m_final_water_vx', 'm/s', 4),
+    ('m_final_water_vy', 'm/s', 4)]
+
+
+def write_segment_dba(dba_file, segment, columns):
+    """Write the `columns` dictionary of SEGMENT_SENSORS names and data as
+    dba file number `segment` of a test mission"""
+    sensors = [sensor for sensor in SEGMENT_SENSORS if sensor[0] in columns]
+    with open(dba_file, 'w') as fid:
+        fid.write(DBA_HEADER.format(
+            segment=segment, num_sensors=len(sensors)))
+        for ii in range(3):
+            fid.write(' '.join(str(sensor[ii]) for sensor in sensors) + '\n')
+        np.savetxt(
+            fid, np.column_stack([columns[sensor[0]] for sensor in sensors]),
+            fmt='%.9g')
+
+
+@pytest.fixture
+def segment_files(tmp_path):
+    """Paths of 3 dba files of consecutive segments of a mission.  The
+    m_final_water_vx/vy of the first file are updated in the second file,
+    and the last file has neither them nor m_depth_state."""
+    rng = np.random.default_rng(0)
+    dba_files = []
+    start = 1.5e9
+    final_uv = [(.1, -.05), (.12, -.04)]
+    for segment, num_rows in enumerate([40, 25, 30]):
+        columns = {
+            'm_present_time': start + 4. * np.arange(num_rows),
+            'm_depth': np.abs(30. * np.sin(np.arange(num_rows) / 6.)),
+            'm_depth_state': np.where(
+                np.arange(num_rows) % 5 == 0, 2., np.nan),
+            'm_initial_water_vx': np.full(num_rows, np.nan),
+            'm_initial_water_vy': np.full(num_rows, np.nan),
+            'm_final_water_vx': np.full(num_rows, np.nan),
+            'm_final_water_vy': np.full(num_rows, np.nan)}
+        start = columns['m_present_time'][-1] + 60.
+        columns['m_initial_water_vx'][num_rows // 2] = rng.normal(0, .1)
+        columns['m_initial_water_vy'][num_rows // 2] = rng.normal(0, .1)
+        if segment > 0:
+            # the value of the previous segment, then its update
+            columns['m_final_water_vx'][[1, 10]] = final_uv[segment - 1][0]
+            columns['m_final_water_vy'][[1, 10]] = final_uv[segment - 1][1]
+        if segment < len(final_uv):
+            columns['m_final_water_vx'][-3] = final_uv[segment][0]
+            columns['m_final_water_vy'][-3] = final_uv[segment][1]
+        else:
+            for sensor in [
+                    'm_depth_state', 'm_final_water_vx', 'm_final_water_vy']:
+                columns.pop(sensor)
+        dba_file = tmp_path / 'test-2019-123-1-{:d}.dba'.format(segment)
+        write_segment_dba(str(dba_file), segment, columns)
+        dba_files.append(str(dba_file))
+    return dba_files
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from ooidac.data_classes import (
+    DbaData, DeploymentData, GliderData, SensorError)
+
+
+def _sensor_defs():
+    return {
+        'm_present_time': {'sensor_name': 'm_present_time',
+                           'attrs': {'bytes': 8}},
+        'm_depth': {'sensor_name': 'm_depth', 'attrs': {'bytes': 4}},
+        'm_depth_state': {'sensor_name': 'm_depth_state',
+                          'attrs': {'bytes': 1}}}
+
+
+def _columns(num_rows=100):
+    depth_state = np.full(num_rows, np.nan)
+    depth_state[::10] = 2.
+    return [1.5e9 + np.arange(num_rows, dtype=float),
+            np.linspace(0., 50., num_rows), depth_state]
+
+
+def test_compact_types_do_not_change_shared_sensor_defs():
+    sensor_defs = _sensor_defs()
+    sensor_names = list(sensor_defs)
+    compact = GliderData(
+        {}, list(sensor_names), sensor_defs, _columns(), compact=True)
+    assert compact.sensors['m_depth']['type'] == 'f4'
+    assert compact.sensors['m_depth_state']['type'] == 'i1'
+    assert all('type' not in sensor_def
+               for sensor_def in sensor_defs.values())
+
+    # a later instance of the same definitions stores float64
+    dense = GliderData({}, list(sensor_names), sensor_defs, _columns())
+    assert all('type' not in sensor_def
+               for sensor_def in dense.sensors.values())
+
+
+
+def test_compact_storage_keeps_calculated_sensors_float64():
+    compact = GliderData(
+        {}, list(_sensor_defs()), _sensor_defs(), _columns(), compact=True)
+    # calculated sensors copy the definition of their source, with its
+    # `bytes` attribute and compact storage type
+    offset = compact['m_depth']
+    offset['sensor_name'] = 'depth_offset'
+    offset['data'] = offset['data'] + 1.
+    compact.add_data(offset)
+    scaled = compact['m_depth']
+    scaled.pop('data')
+    scaled['sensor_name'] = 'depth_scaled'
+    compact.add_derived(
+        scaled, lambda gldata: gldata.getdata('m_depth') / 3., ['m_depth'])
+    for sensor in ['depth_offset', 'depth_scaled']:
+        assert compact.getdata(sensor).dtype == np.float64
+        assert 'type' not in compact.sensors[sensor]
+    assert compact.getdata('m_depth').dtype == np.float32
+    assert compact.sensors['m_depth']['type'] == 'f4'
+
+    # and in slices of the instance
+    sliced = compact.slicedata(indices=slice(10, 20))
+    assert sliced.compact
+    assert sliced.getdata('depth_offset').dtype == np.float64
+    assert sliced.getdata('depth_scaled').dtype == np.float64
+    np.testing.assert_array_equal(
+        sliced.getdata('depth_scaled'), compact.getdata('depth_scaled')[10:20])
+
+    # updating the data keeps the storage types
+    compact.update_data(['m_depth', 'depth_offset'], [0, 1], 5.)
+    assert compact.getdata('m_depth').dtype == np.float32
+    assert compact.getdata('depth_offset').dtype == np.float64
+    assert compact.getdata('depth_scaled')[0] == np.float32(5.) / 3.
+
+
+@pytest.mark.parametrize('storage', [{}, {'compact': True, 'sparse': True}])
+def test_deployment_segments_match_their_data_files(segment_files, storage):
+    deployment = DeploymentData(segment_files, **storage)
+    dbas = [DbaData(dba_file, **storage) for dba_file in segment_files]
+    assert deployment.num_segments == len(segment_files)
+    assert deployment.sensor_names == dbas[0].sensor_names
+    assert len(deployment) == sum(len(dba) for dba in dbas)
+
+    first_row = 0
+    for ii, dba in enumerate(dbas):
+        rows = deployment.segment_rows(ii)
+        assert (rows.start, rows.stop) == (first_row, first_row + len(dba))
+        assert np.all(deployment.row_segments(
+            np.arange(rows.start, rows.stop)) == ii)
+        first_row = rows.stop
+
+        segment = deployment.segment(ii)
+        assert len(segment) == len(dba)
+        assert segment.source_file == dba.source_file
+        assert segment.file_metadata['the8x3_filename'] == (
+            dba.file_metadata['the8x3_filename'])
+        for sensor in deployment.sensor_names:
+            if sensor in dba.sensor_names:
+                expected = dba.getdata(sensor)
+            else:
+                expected = np.full(len(dba), np.nan)
+            np.testing.assert_array_equal(segment.getdata(sensor), expected)
+            np.testing.assert_array_equal(
+                deployment.getdata(sensor)[rows], expected)
+
+
+def test_wrap_derived_replaces_the_calculation_function():
+    gldata = GliderData({}, list(_sensor_defs()), _sensor_defs(), _columns())
+    gldata.add_derived(
+        {'sensor_name': 'depth_scaled', 'attrs': {}},
+        lambda data: data.getdata('m_depth') * 2., ['m_depth'])
+    assert gldata.derived_sensors() == ['depth_scaled']
+
+    calls = []
+
+    def wrapper(function):
+        def wrapped(data):
+            calls.append(1)
+            return function(data)
+        return wrapped
+
+    gldata.wrap_derived('depth_scaled', wrapper)
+    np.testing.assert_array_equal(
+        gldata.getdata('depth_scaled'), gldata.getdata('m_depth') * 2.)
+    gldata.getdata('depth_scaled')
+    assert calls == [1]
+    with pytest.raises(SensorError):
+        gldata.wrap_derived('m_depth', wrapper)
@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+
+from ooidac.data_classes import GliderData
+from ooidac.pipeline import ProcessingStep, ProcessingPipeline
+
+
+def _gldata(num_rows=10):
+    sensor_defs = {'m_present_time': {'sensor_name': 'm_present_time',
+                                      'attrs': {}}}
+    return GliderData(
+        {}, ['m_present_time'], sensor_defs,
+        [1.5e9 + np.arange(num_rows, dtype=float)])
+
+
+def _slow_double(gldata):
+    time.sleep(.05)
+    return 2 * gldata.getdata('m_present_time')
+
+
+def _add_doubled(gldata):
+    gldata.add_derived(
+        {'sensor_name': 'doubled', 'attrs': {}}, _slow_double,
+        ['m_present_time'])
+    return gldata
+
+
+def _add_quadrupled(gldata):
+    gldata.add_data({'sensor_name': 'quadrupled', 'attrs': {},
+                     'data': 2 * gldata.getdata('doubled')})
+    return gldata
+
+
+def test_derived_sensor_time_is_charged_to_the_registering_step():
+    pipeline = ProcessingPipeline([
+        ProcessingStep('doubled', _add_doubled, inputs=['m_present_time'],
+                       outputs=['doubled']),
+        ProcessingStep('quadrupled', _add_quadrupled, inputs=['doubled'],
+                       outputs=['quadrupled'])])
+    gldata = pipeline.run(_gldata())
+
+    np.testing.assert_array_equal(
+        gldata.getdata('quadrupled'), 4 * gldata.getdata('m_present_time'))
+    doubled = pipeline.stats['doubled']
+    quadrupled = pipeline.stats['quadrupled']
+    assert doubled['runs'] == 1 and doubled['derived'] == 1
+    assert doubled['seconds'] >= .05
+    assert quadrupled['seconds'] < .05
+    assert 'derived' in pipeline.report()
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import ooidac.processing as processing
+from ooidac.ctd import CTD_PRODUCTS
+from ooidac.data_classes import DbaData, DeploymentData, GliderData
+
+CTD_SENSORS = ['sci_water_cond', 'sci_water_temp', 'llat_pressure',
+               'llat_latitude', 'llat_longitude']
+
+
+def _ctd_gldata(num_rows=1000, **storage):
+    """GliderData instance of a CTD sampling every fourth row"""
+    rng = np.random.default_rng(0)
+    sampled = np.arange(num_rows) % 4 == 1
+    pres = np.linspace(0., 100., num_rows)
+    columns = {
+        'm_present_time': 1.5e9 + np.arange(num_rows, dtype=float),
+        'sci_water_cond': np.where(
+            sampled, 4. + rng.normal(0, .01, num_rows), np.nan),
+        'sci_water_temp': np.where(sampled, 12. - pres / 20., np.nan),
+        'llat_pressure': np.where(sampled, pres, np.nan),
+        'llat_latitude': np.full(num_rows, 44.6),
+        'llat_longitude': np.full(num_rows, -124.5)}
+    sensor_defs = {
+        name: {'sensor_name': name, 'attrs': {'bytes': 4}}
+        for name in columns}
+    sensor_defs['m_present_time']['attrs']['bytes'] = 8
+    return GliderData(
+        {}, list(columns), sensor_defs, list(columns.values()), **storage)
+
+
+@pytest.mark.parametrize('storage', [
+    {}, {'sparse': True}, {'compact': True},
+    {'compact': True, 'sparse': True}])
+def test_ctd_products_are_calculated_once(monkeypatch, storage):
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return calculate_ctd_products(*args, **kwargs)
+    calculate_ctd_products = processing.calculate_ctd_products
+    monkeypatch.setattr(processing, 'calculate_ctd_products', counted)
+
+    gldata = processing.ctd_data(_ctd_gldata(**storage), CTD_SENSORS)
+    products = {product: gldata.getdata(product) for product in CTD_PRODUCTS}
+    for product in CTD_PRODUCTS:
+        gldata.getdata(product)
+    assert len(calls) == 1
+
+    # calculated again after an input changes
+    gldata.update_data(['sci_water_temp'], np.array([1]), np.array([[11.]]))
+    for product in CTD_PRODUCTS:
+        gldata.getdata(product)
+    assert len(calls) == 2
+
+    expected = calculate_ctd_products(
+        *[_ctd_gldata().getdata(sensor) for sensor in CTD_SENSORS[:3]],
+        44.6, -124.5)
+    for product in CTD_PRODUCTS:
+        finites = np.isfinite(expected[product])
+        np.testing.assert_array_equal(
+            np.isfinite(products[product]), finites)
+        if not storage.get('compact'):
+            np.testing.assert_array_equal(
+                products[product][finites], expected[product][finites])
+
+
+def test_deployment_uv_matches_each_data_file(segment_files):
+    deployment = DeploymentData(segment_files)
+    u_list, v_list = processing.get_u_and_v(deployment)
+    assert len(u_list) == len(v_list) == len(segment_files)
+
+    sources = []
+    for ii, dba_file in enumerate(segment_files):
+        u, v = processing.get_u_and_v(
+            DbaData(dba_file), check_files=segment_files[ii + 1:ii + 3])
+        for expected, velocity in [(u, u_list[ii]), (v, v_list[ii])]:
+            assert velocity['nc_var_name'] == expected['nc_var_name']
+            assert velocity['data'] == expected['data']
+            assert velocity['attrs'] == expected['attrs']
+        sources.append(u['attrs']['source_sensor'])
+    # only the first file's final velocities are updated in a later file
+    assert sources == [
+        'm_final_water_vx', 'm_initial_water_vx', 'm_initial_water_vx']
@@ -0,0 +1,117 @@
+import warnings
+
+import numpy as np
+import pytest
+
+import profile_filters
+from configuration import DATA_CONFIG_LIST, TIMESENSOR
+from ooidac.data_classes import GliderData
+
+BATCH_FILTERS = sorted(
+    name[len('batch_'):] for name in dir(profile_filters)
+    if name.startswith('batch_filter_'))
+
+# profile lengths, with the empty and very short profiles and those around
+# the 10 rows of filter_no_data_at_profile_start
+SHORT_LENGTHS = [0, 1, 2, 3, 4, 5, 6, 9, 10, 11]
+
+
+def _segment(seed, num_rows=3000):
+    """GliderData instance of a segment of dives and climbs with the
+    science sensors sampling every few rows, in on and off periods, and
+    sensors missing for some of the on periods"""
+    rng = np.random.default_rng(seed)
+    steps = rng.uniform(1., 6., num_rows)
+    steps[rng.random(num_rows) < .005] = 600.
+    timestamps = 1.5e9 + np.cumsum(steps)
+    phase = np.arange(num_rows) % 400 / 400.
+    depth = 80. * (1 - np.abs(1 - 2 * phase)) + rng.normal(0, .2, num_rows)
+
+    sampling = np.zeros(num_rows, dtype=bool)
+    row = 0
+    while row < num_rows:
+        period = rng.integers(1, 300)
+        sampling[row:row + period] = rng.random() < .7
+        row += period
+    sampling &= rng.random(num_rows) < .4
+
+    columns = {TIMESENSOR: timestamps,
+               'm_depth': np.where(rng.random(num_rows) < .1, np.nan, depth)}
+    for sensor in DATA_CONFIG_LIST:
+        sampled = sampling.copy()
+        for start in rng.integers(0, num_rows, 3):
+            sampled[start:start + rng.integers(1, 400)] = False
+        if sensor == 'sci_water_pressure':
+            values = depth / 1.1 + rng.normal(0, .05, num_rows)
+        else:
+            values = rng.normal(10., 1., num_rows)
+        columns[sensor] = np.where(sampled, values, np.nan)
+    columns['llat_pressure'] = columns['sci_water_pressure'] * 10.
+
+    sensor_defs = {name: {'sensor_name': name, 'attrs': {}}
+                   for name in columns}
+    return GliderData(
+        {}, list(columns), sensor_defs, list(columns.values()))
+
+
+def _ranges(rng, num_rows, num_profiles=150):
+    """Random profile row ranges, a third of them empty or very short"""
+    starts = rng.integers(0, num_rows + 1, num_profiles)
+    lengths = rng.integers(0, 600, num_profiles)
+    short = rng.random(num_profiles) < 1. / 3
+    lengths[short] = rng.choice(SHORT_LENGTHS, np.count_nonzero(short))
+    return np.column_stack([starts, np.minimum(starts + lengths, num_rows)])
+
+
+def _remove_profile(name, profile_data):
+    """The result of filter `name` for one profile.  The start of a profile
+    of less than 10 rows, for which filter_no_data_at_profile_start fails,
+    is its first minute, as for the other profiles with a shorter first
+    10%."""
+    if name == 'filter_no_data_at_profile_start' and len(profile_data) < 10:
+        timestamps = profile_data.getdata(TIMESENSOR)
+        start = np.flatnonzero(timestamps < timestamps[0] + 60.)
+        data = np.concatenate([
+            profile_data.finite_indices(sensor)
+            for sensor in DATA_CONFIG_LIST])
+        return (
+            len(np.intersect1d(
+                profile_data.finite_indices('sci_water_pressure'),
+                start)) == 0
+            or len(np.intersect1d(data, start)) == 0)
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        # NaN statistics of profiles without data
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return getattr(profile_filters, name)(profile_data)
+
+
+def test_every_filter_with_a_batch_version_is_tested():
+    assert len(BATCH_FILTERS) == 6
+    for name in BATCH_FILTERS:
+        assert callable(getattr(profile_filters, name))
+
+
+@pytest.mark.parametrize('name', BATCH_FILTERS)
+@pytest.mark.parametrize('seed', range(5))
+def test_batch_filter_matches_filter(name, seed):
+    segment = _segment(seed)
+    ranges = _ranges(np.random.default_rng(seed + 100), len(segment))
+    batch_function = getattr(profile_filters, 'batch_' + name)
+
+    removed = batch_function(segment, ranges)
+    assert removed.dtype == bool and removed.shape == (len(ranges),)
+
+    expected = []
+    for start, stop in ranges:
+        if stop <= start:
+            # nothing to keep in an empty profile
+            expected.append(True)
+        else:
+            expected.append(bool(_remove_profile(
+                name, segment.slicedata(indices=slice(start, stop)))))
+    np.testing.assert_array_equal(removed, expected)
+
+    # a batch of no profiles, and of each profile on its own
+    assert batch_function(segment, ranges[:0]).shape == (0,)
+    for ii in np.flatnonzero(ranges[:, 1] - ranges[:, 0] < 12):
+        assert batch_function(segment, ranges[ii:ii + 1])[0] == expected[ii]
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from ooidac.profiles import Profiles, next_depth_changes, chain_mask
+
+
+def _loop_adjust_inflections(inflections, depth, time_, min_depth_change):
+    """The good inflections found by the nested while loops that
+    Profiles.adjust_inflections used before, with its 2 m threshold
+    replaced by `min_depth_change`"""
+    inflection_depths = np.interp(
+        inflections, time_[np.isfinite(depth)],
+        depth[np.isfinite(depth)]
+    )
+    inflx_ii = 0
+    fwd_counter = 1
+    inflx_to_keep = np.full(len(inflections), True)
+    while inflx_ii < len(inflections):
+        ii_depth = inflection_depths[inflx_ii]
+        if inflx_ii + fwd_counter >= len(inflections):
+            break
+        while abs(inflection_depths[inflx_ii + fwd_counter]
+                  - ii_depth) < min_depth_change:
+            inflx_to_keep[inflx_ii + fwd_counter] = False
+            fwd_counter += 1
+            if inflx_ii + fwd_counter >= len(inflections):
+                break
+        inflx_ii = inflx_ii + fwd_counter
+        fwd_counter = 1
+
+    good_inflx_ii = np.flatnonzero(inflx_to_keep)
+    trends = np.diff(inflection_depths[good_inflx_ii])
+    same_trends = np.flatnonzero(np.diff(np.sign(trends)) == 0) + 1
+    good_inflx_ii = np.delete(good_inflx_ii, same_trends)
+    return inflections[good_inflx_ii]
+
+
+def _sawtooth_inflections(rng, num_yos):
+    """Return the timestamps and depths of a random sawtooth depth series of
+    `num_yos` dives and climbs with wiggles of random sizes at the surface,
+    at the bottom and mid profile, and the times of all of its inflections"""
+    corners = [rng.uniform(0., 3.)]
+    for _ in range(num_yos):
+        for _ in range(int(rng.integers(0, 4))):
+            corners.append(corners[-1] + rng.uniform(-2.5, 2.5))
+        bottom = rng.uniform(1., 200.)
+        for _ in range(int(rng.integers(0, 3))):
+            corners.append(rng.uniform(min(corners[-1], bottom), bottom))
+            corners.append(corners[-1] - rng.uniform(0., 3.))
+        corners.append(bottom)
+        for _ in range(int(rng.integers(0, 4))):
+            corners.append(corners[-1] + rng.uniform(-2.5, 2.5))
+        corners.append(rng.uniform(0., 3.))
+    corners = np.maximum(corners, .1)
+    # depths on integer centimeters produce exact 2 m differences
+    if rng.random() < .5:
+        corners = np.round(corners, 2)
+
+    corner_times = 1.5e9 + np.cumsum(rng.uniform(5., 600., len(corners)))
+    time_ = np.arange(corner_times[0], corner_times[-1] + 1., 2.)
+    depth = np.interp(time_, corner_times, corners)
+    # missing depths, but not at the ends
+    depth[1:-1][rng.random(len(depth) - 2) < .05] = np.nan
+    inflections = np.concatenate(([time_[0]], corner_times, [time_[-1]]))
+    inflections = inflections[inflections <= time_[-1]]
+    return time_, depth, inflections
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_adjust_inflections_matches_nested_loops(seed):
+    rng = np.random.default_rng(seed)
+    profiles = Profiles(None)
+    for trial in range(50):
+        # few inflections in half of the trials, to reach the edge cases
+        num_yos = int(rng.integers(1, 4 if trial % 2 else 60))
+        min_depth_change = float(rng.choice([2., rng.uniform(0., 5.)]))
+        time_, depth, inflections = _sawtooth_inflections(rng, num_yos)
+
+        expected = _loop_adjust_inflections(
+            inflections, depth, time_, min_depth_change)
+        profiles.inflection_times = inflections
+        adjusted = profiles.adjust_inflections(depth, time_, min_depth_change)
+        np.testing.assert_array_equal(adjusted, expected)
+        np.testing.assert_array_equal(profiles.inflection_times, expected)
+
+
+def test_chain_of_next_depth_changes():
+    depths = np.array([0., 1., 1.9, 2., 5., 4., 3.5, 1., 7.])
+    next_ii = next_depth_changes(depths, 2.)
+    np.testing.assert_array_equal(next_ii, [3, 4, 4, 4, 7, 7, 7, 8, 9])
+    np.testing.assert_array_equal(
+        chain_mask(next_ii), [1, 0, 0, 1, 1, 0, 0, 1, 1])
+    assert len(chain_mask(next_depth_changes(np.empty(0), 2.))) == 0
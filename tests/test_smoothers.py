@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from scipy import signal
+
+import ooidac
+
+
+def _depth(num_points):
+    """Noisy sawtooth depth series of dives and climbs"""
+    rng = np.random.default_rng(num_points)
+    phase = np.arange(num_points) % 700 / 700.
+    return 100. * (1 - np.abs(1 - 2 * phase)) + rng.normal(0, .1, num_points)
+
+
+@pytest.mark.parametrize('num_points', [1, 5, 11, 12, 1000, 20000])
+@pytest.mark.parametrize('window_size', [1, 2, 5, 10, 11, 12, 51])
+def test_boxcar_matches_scipy_convolve(num_points, window_size):
+    dataset = _depth(num_points)
+    expected = signal.convolve(
+        dataset, signal.windows.boxcar(window_size), 'same') / window_size
+    smoothed = ooidac.boxcar_smooth_dataset(dataset, window_size)
+    assert smoothed.shape == expected.shape
+    # the cumulative sum of the long windows rounds to the sum of the
+    # absolute values
+    np.testing.assert_allclose(
+        smoothed, expected, rtol=0,
+        atol=1e-14 * np.sum(np.abs(dataset)))
+
+
+@pytest.mark.parametrize('window_size', [1, 3, 5, 11, 51])
+def test_median_matches_scipy_medfilt(window_size):
+    dataset = _depth(20000)
+    np.testing.assert_array_equal(
+        ooidac.median_smooth_dataset(dataset, window_size),
+        signal.medfilt(dataset, window_size))
+
+
+@pytest.mark.parametrize('window_size', [3, 5, 11, 51])
+def test_savgol_matches_scipy_savgol_filter(window_size):
+    dataset = _depth(20000)
+    np.testing.assert_allclose(
+        ooidac.savgol_smooth_dataset(dataset, window_size),
+        signal.savgol_filter(dataset, window_size, 2), rtol=0, atol=1e-10)
+
+
+def test_import_does_not_import_scipy():
+    imported = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, ooidac; sys.exit("scipy" in sys.modules)'],
+        cwd=os.path.dirname(os.path.dirname(ooidac.__file__)))
+    assert imported.returncode == 0